@@ -15,6 +15,10 @@ from enum import IntEnum
 import cobra
 from optlang.symbolics import Zero
 from optlang_enumerator.cobra_cnapy import CNApyModel
+from cnapy.flux_coupling import FluxCouplingResult
+from cnapy.flux_optimization import OptimizationLPCache
+from cnapy.fva import FVAState
+from cnapy.thermodynamics import CobrakModelCache
 from qtpy.QtCore import Qt, Signal, QObject, QStringListModel
 from qtpy.QtGui import QColor, QFont
 from qtpy.QtWidgets import QMessageBox
@@ -58,6 +62,13 @@ class AppData(QObject):
             pathlib.Path.home(), "CNApy-projects"))
         self.use_results_cache = False
         self.results_cache_dir: pathlib.Path = pathlib.Path(".")
+        self.efmtool_scratch_dir = "" # empty means the system temporary directory
+        self.computation_log_dir = "" # empty means that the output of computations is not saved
+        # strain design computations write checkpoints from which they can be resumed after a crash or abort
+        self.use_sd_checkpoints = True
+        self.sd_checkpoint_dir = "" # empty means default_sd_checkpoint_dir
+        self.default_sd_checkpoint_dir = os.path.join(appdirs.user_data_dir(
+            "cnapy", roaming=True, appauthor=False), "strain-design-checkpoints")
         self.last_scen_directory = str(os.path.join(
             pathlib.Path.home(), "CNApy-projects"))
         self.temp_dir = TemporaryDirectory()
@@ -69,6 +80,7 @@ class AppData(QObject):
         self.scenario_future = []
         self.recent_cna_files = []
         self.auto_fba = False
+        self.loopless = False # remove loops from FBA solutions and compute loopless FVA ranges
         self.is_in_dark_mode = False
 
     def scen_values_set(self, reaction: str, values: Tuple[float, float]):
@@ -146,6 +158,12 @@ class AppData(QObject):
             flux_text = self.format_flux_value(vl) + ", " + self.format_flux_value(vu)
         return flux_text, background_color, as_one
 
+    def sd_checkpoint_directory(self) -> str:
+        """The directory of the strain design checkpoints; it is created if it does not exist yet."""
+        directory = self.sd_checkpoint_dir if self.sd_checkpoint_dir else self.default_sd_checkpoint_dir
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
     def save_cnapy_config(self):
         try:
             fp = open(self.conf_path, "w")
@@ -167,6 +185,10 @@ class AppData(QObject):
         parser.set('cnapy-config', 'abs_tol', str(self.abs_tol))
         parser.set('cnapy-config', 'use_results_cache', str(self.use_results_cache))
         parser.set('cnapy-config', 'results_cache_directory', str(self.results_cache_dir))
+        parser.set('cnapy-config', 'efmtool_scratch_directory', self.efmtool_scratch_dir)
+        parser.set('cnapy-config', 'computation_log_directory', self.computation_log_dir)
+        parser.set('cnapy-config', 'use_sd_checkpoints', str(self.use_sd_checkpoints))
+        parser.set('cnapy-config', 'sd_checkpoint_directory', self.sd_checkpoint_dir)
         parser.set('cnapy-config', 'recent_cna_files', str(self.recent_cna_files))
         parser.set('cnapy-config', 'is_in_dark_mode', str(self.is_in_dark_mode))
         parser.write(fp)
@@ -220,6 +242,7 @@ class AppData(QObject):
 
     def unsaved_scenario_changes(self):
         self.project.scen_values.has_unsaved_changes = True
+        self.project.flux_coupling = None # refers to the previous scenario
         self.unsavedScenarioChanges.emit()
 
     unsavedScenarioChanges = Signal()
@@ -256,6 +279,20 @@ class Scenario(Dict[str, Tuple[float, float]]):
         self.has_unsaved_changes = False
 
     def load(self, filename: str, appdata: AppData, merge=False) -> Tuple[List[str], List, List]:
+        flux_values, unknown_ids, incompatible_constraints, skipped_scenario_reactions = \
+            self.read(filename, appdata.project.cobra_py_model.reactions.list_attr("id"), merge=merge)
+        for reac_id, val in flux_values.items():
+            appdata.project.comp_values[reac_id] = (val[0], val[1])
+        appdata.scen_values_set_multiple(list(flux_values.keys()), list(flux_values.values()))
+
+        return unknown_ids, incompatible_constraints, skipped_scenario_reactions
+
+    def read(self, filename: str, model_reaction_ids: List[str], merge=False) -> Tuple[Dict, List[str], List, List]:
+        """
+        Reads the scenario file into this scenario except for the flux values which are returned
+        so that the caller can decide how to set them.
+        """
+        model_reaction_ids = set(model_reaction_ids)
         unknown_ids: List(str)= []
         incompatible_constraints = []
         skipped_scenario_reactions = []
@@ -269,14 +306,14 @@ class Scenario(Dict[str, Tuple[float, float]]):
                      'objective_coefficients', 'use_scenario_objective', 'version'}.issubset(json_dict.keys()):
                     flux_values = json_dict['fluxes']
                     for reac_id in json_dict['pinned_reactions']:
-                        if reac_id in appdata.project.cobra_py_model.reactions:
+                        if reac_id in model_reaction_ids:
                             self.pinned_reactions.add(reac_id)
                         else:
                             unknown_ids.append(reac_id)
                     if not merge:
                         self.description = json_dict['description']
                         self.objective_direction = json_dict['objective_direction']
-                        all_reaction_ids = set(appdata.project.cobra_py_model.reactions.list_attr("id"))
+                        all_reaction_ids = set(model_reaction_ids)
                         if json_dict['version'] > 1:
                             self.reactions = json_dict['reactions']
                             for reac_id in self.reactions:
@@ -317,25 +354,21 @@ class Scenario(Dict[str, Tuple[float, float]]):
                         except Exception:
                             print("Could not parse line ", line)
 
-        reactions = []
-        scen_values = []
+        scen_values = {}
         for reac_id, val in flux_values.items():
             found_reac_id = False
-            if reac_id in appdata.project.cobra_py_model.reactions:
+            if reac_id in model_reaction_ids:
                 found_reac_id = True
             elif reac_id.startswith("R_"):
                 reac_id = reac_id[2:]
-                if reac_id in appdata.project.cobra_py_model.reactions:
+                if reac_id in model_reaction_ids:
                     found_reac_id = True
             if found_reac_id:
-                reactions.append(reac_id)
-                scen_values.append(val)
-                appdata.project.comp_values[reac_id] = (val[0], val[1])
+                scen_values[reac_id] = val
             else:
                 unknown_ids.append(reac_id)
-        appdata.scen_values_set_multiple(reactions, scen_values)
 
-        return unknown_ids, incompatible_constraints, skipped_scenario_reactions
+        return scen_values, unknown_ids, incompatible_constraints, skipped_scenario_reactions
 
     def add_scenario_reactions_to_model(self, model: cobra.Model):
         if len(self.reactions) > 0:
@@ -354,6 +387,62 @@ class Scenario(Dict[str, Tuple[float, float]]):
                 reaction.add_metabolites(metabolites)
                 reaction.set_hash_value()
 
+    def load_into_model(self, model: cobra.Model):
+        for x in self:
+            try:
+                y = model.reactions.get_by_id(x)
+            except KeyError:
+                print('reaction', x, 'not found!')
+            else:
+                y.bounds = self[x]
+                y.set_hash_value()
+
+        self.add_scenario_reactions_to_model(model)
+
+        if self.use_scenario_objective:
+            model.objective = model.problem.Objective(
+                Zero, direction=self.objective_direction)
+            for reac_id, coeff in self.objective_coefficients.items():
+                try:
+                    reaction: cobra.Reaction = model.reactions.get_by_id(reac_id)
+                except KeyError:
+                    print('reaction', reac_id, 'not found!')
+                else:
+                    model.objective.set_linear_coefficients(
+                        {reaction.forward_variable: coeff, reaction.reverse_variable: -coeff})
+
+        for (expression, constraint_type, rhs) in self.constraints:
+            if constraint_type == '=':
+                lb = rhs
+                ub = rhs
+            elif constraint_type == '<=':
+                lb = None
+                ub = rhs
+            elif constraint_type == '>=':
+                lb = rhs
+                ub = None
+            else:
+                print("Skipping constraint of unknown type", constraint_type)
+                continue
+            try:
+                reactions = model.reactions.get_by_any(list(expression))
+            except KeyError:
+                print("Skipping constraint containing a reaction that is not in the model:", expression)
+                continue
+            constr = model.problem.Constraint(Zero, lb=lb, ub=ub)
+            model.add_cons_vars(constr)
+            for (reaction, coeff) in zip(reactions, expression.values()):
+                constr.set_linear_coefficients({reaction.forward_variable: coeff, reaction.reverse_variable: -coeff})
+
+        reaction_ids = [reaction.id for reaction in model.reactions]
+        for annotation in self.annotations:
+            if "reaction_id" not in annotation.keys():
+                continue
+            if annotation["reaction_id"] not in reaction_ids:
+                continue
+            reaction: cobra.Reaction = model.reactions.get_by_id(annotation["reaction_id"])
+            reaction.annotation[annotation["key"]] = annotation["value"]
+
     def clear_flux_values(self):
         super().clear()
 
@@ -435,66 +524,17 @@ class ProjectData:
         self.comp_values: Dict[str, Tuple[float, float]] = {}
         self.comp_values_type = 0 # 0: simple flux vector, 1: bounds/FVA result
         self.fva_values: Dict[str, Tuple[float, float]] = {} # store FVA results persistently
+        self.fva_state = FVAState() # allows to reuse the previous FVA after scenario changes
+        self.flux_coupling: FluxCouplingResult = None # shown as coloring of the reaction list
         self.conc_values: Dict[str, float] = {} # Metabolite concentrations
         self.df_values: Dict[str, float] = {} # Driving forces
+        self.cobrak_model_cache = CobrakModelCache() # prepared model for the thermodynamic analyses
+        self.optimization_lp_cache = OptimizationLPCache() # LPs of the flux and yield optimization dialogs
         self.modes = []
         self.meta_data = {}
 
     def load_scenario_into_model(self, model: cobra.Model):
-        for x in self.scen_values:
-            try:
-                y = model.reactions.get_by_id(x)
-            except KeyError:
-                print('reaction', x, 'not found!')
-            else:
-                y.bounds = self.scen_values[x]
-                y.set_hash_value()
-
-        self.scen_values.add_scenario_reactions_to_model(model)
-
-        if self.scen_values.use_scenario_objective:
-            model.objective = model.problem.Objective(
-                Zero, direction=self.scen_values.objective_direction)
-            for reac_id, coeff in self.scen_values.objective_coefficients.items():
-                try:
-                    reaction: cobra.Reaction = model.reactions.get_by_id(reac_id)
-                except KeyError:
-                    print('reaction', reac_id, 'not found!')
-                else:
-                    model.objective.set_linear_coefficients(
-                        {reaction.forward_variable: coeff, reaction.reverse_variable: -coeff})
-
-        for (expression, constraint_type, rhs) in self.scen_values.constraints:
-            if constraint_type == '=':
-                lb = rhs
-                ub = rhs
-            elif constraint_type == '<=':
-                lb = None
-                ub = rhs
-            elif constraint_type == '>=':
-                lb = rhs
-                ub = None
-            else:
-                print("Skipping constraint of unknown type", constraint_type)
-                continue
-            try:
-                reactions = model.reactions.get_by_any(list(expression))
-            except KeyError:
-                print("Skipping constraint containing a reaction that is not in the model:", expression)
-                continue
-            constr = model.problem.Constraint(Zero, lb=lb, ub=ub)
-            model.add_cons_vars(constr)
-            for (reaction, coeff) in zip(reactions, expression.values()):
-                constr.set_linear_coefficients({reaction.forward_variable: coeff, reaction.reverse_variable: -coeff})
-
-        reaction_ids = [reaction.id for reaction in model.reactions]
-        for annotation in self.scen_values.annotations:
-            if "reaction_id" not in annotation.keys():
-                continue
-            if annotation["reaction_id"] not in reaction_ids:
-                continue
-            reaction: cobra.Reaction = model.reactions.get_by_id(annotation["reaction_id"])
-            reaction.annotation[annotation["key"]] = annotation["value"]
+        self.scen_values.load_into_model(model)
 
     def collect_default_scenario_values(self) -> Tuple[List[str], List[Tuple[float, float]]]:
         reactions = []
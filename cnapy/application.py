@@ -303,6 +303,14 @@ class Application:
                     'use_results_cache', fallback=self.appdata.use_results_cache)
             self.appdata.results_cache_dir = Path(config_parser.get('cnapy-config',
                     'results_cache_directory', fallback=self.appdata.results_cache_dir))
+            self.appdata.efmtool_scratch_dir = config_parser.get('cnapy-config',
+                    'efmtool_scratch_directory', fallback=self.appdata.efmtool_scratch_dir)
+            self.appdata.computation_log_dir = config_parser.get('cnapy-config',
+                    'computation_log_directory', fallback=self.appdata.computation_log_dir)
+            self.appdata.use_sd_checkpoints = config_parser.getboolean('cnapy-config',
+                    'use_sd_checkpoints', fallback=self.appdata.use_sd_checkpoints)
+            self.appdata.sd_checkpoint_dir = config_parser.get('cnapy-config',
+                    'sd_checkpoint_directory', fallback=self.appdata.sd_checkpoint_dir)
 
         except NoSectionError:
             print("Could not find section cnapy-config in cnapy-config.txt")
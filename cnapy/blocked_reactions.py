@@ -0,0 +1,246 @@
+"""Detection of dead-end and blocked reactions"""
+
+import hashlib
+import json
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+import numpy
+import cobra
+from cobra.util.array import create_stoichiometric_matrix
+from optlang.symbolics import Zero
+
+# blocked reactions per network hash, shared by all analyses of a session
+_blocked_reactions_cache: Dict[str, List[str]] = {}
+
+
+def network_hash(model: cobra.Model, extra: bytes = b"") -> str:
+    """
+    Hash of the stoichiometry, the reaction bounds and the additional constraints of the model
+    (e.g. those from a scenario that has been loaded into the model).
+    """
+    network = [(r.id, sorted((m.id, float(c)) for m, c in r.metabolites.items()), r.lower_bound, r.upper_bound)
+               for r in model.reactions]
+    constraints = sorted((c.name, str(c.expression), c.lb, c.ub) for c in model.constraints
+                         if c.name not in model.metabolites)
+    hash_object = hashlib.md5(pickle.dumps((network, constraints)))
+    hash_object.update(extra)
+    return hash_object.hexdigest()
+
+
+def find_dead_end_reactions(model: cobra.Model) -> List[str]:
+    """
+    Iteratively removes reactions that involve a metabolite which can only be produced
+    or only be consumed by the remaining reactions.
+    """
+    stoich_mat = create_stoichiometric_matrix(model, array_type='lil').tocsr()
+    lb = numpy.array([r.lower_bound for r in model.reactions])
+    ub = numpy.array([r.upper_bound for r in model.reactions])
+    active = (lb < 0) | (ub > 0)
+    # sign of each reaction in a direction in which it can operate
+    fwd = (ub > 0).astype(float)
+    bwd = (lb < 0).astype(float)
+    pos = stoich_mat.multiply(stoich_mat > 0).tocsr()
+    neg = -stoich_mat.multiply(stoich_mat < 0).tocsr()
+    involved = (stoich_mat != 0).astype(float).tocsr()
+    while True:
+        act = active.astype(float)
+        # a metabolite can be produced if some active reaction produces it in an admissible direction
+        can_produce = pos @ (fwd * act) + neg @ (bwd * act) > 0
+        can_consume = neg @ (fwd * act) + pos @ (bwd * act) > 0
+        dead_mets = numpy.where((can_produce != can_consume) | (involved @ act == 1))[0]
+        if len(dead_mets) == 0:
+            break
+        dead_reac = numpy.unique(stoich_mat[dead_mets, :].nonzero()[1])
+        dead_reac = dead_reac[active[dead_reac]]
+        if len(dead_reac) == 0:
+            break
+        active[dead_reac] = False
+    return [model.reactions[i].id for i in numpy.where(~active)[0]]
+
+
+class BlockedReactionsLP:
+    """
+    Extends the model by variables z_f <= v and z_b <= -v with an upper bound of 1 for all reactions
+    so that the number of reactions that carry flux can be maximized by an LP (as in FASTCC).
+    Afterwards only objective coefficients are changed which means that this LP can be reused with
+    different reaction bounds. Use within a model context or on a copy of the model.
+    """
+
+    def __init__(self, model: cobra.Model, tolerance: float = 1e-9):
+        self.model = model
+        self.tolerance = tolerance
+        self.num_lp = 0
+        reactions = model.reactions
+        # z is free below so that these constraints do not restrict v
+        self.z_f = [model.problem.Variable("blocked_z_f_"+r.id, lb=None, ub=1) for r in reactions]
+        self.z_b = [model.problem.Variable("blocked_z_b_"+r.id, lb=None, ub=1) for r in reactions]
+        cons_f = [model.problem.Constraint(Zero, ub=0, name="blocked_f_"+r.id) for r in reactions]
+        cons_b = [model.problem.Constraint(Zero, ub=0, name="blocked_b_"+r.id) for r in reactions]
+        model.add_cons_vars(self.z_f + self.z_b + cons_f + cons_b)
+        model.solver.update()
+        for i, r in enumerate(reactions):
+            cons_f[i].set_linear_coefficients({self.z_f[i]: 1.0, r.forward_variable: -1.0, r.reverse_variable: 1.0})
+            cons_b[i].set_linear_coefficients({self.z_b[i]: 1.0, r.forward_variable: 1.0, r.reverse_variable: -1.0})
+        var_idx = {v.name: i for i, v in enumerate(model.variables)}
+        self.fwd_idx = numpy.array([var_idx[r.forward_variable.name] for r in reactions])
+        self.rev_idx = numpy.array([var_idx[r.reverse_variable.name] for r in reactions])
+        # the objective of the solver is modified directly which avoids expensive expression handling
+        model.solver.objective = model.problem.Objective(Zero, direction='max')
+
+    def fluxes(self) -> numpy.ndarray:
+        primals = numpy.array(self.model.solver._get_primal_values())
+        return primals[self.fwd_idx] - primals[self.rev_idx]
+
+    def find_blocked(self, candidates: List[int], solution_callback=None, print_func=print) -> List[int]:
+        """
+        Returns the candidates (reaction indices) that cannot carry flux with the current bounds.
+        The flux through all candidates in one direction is maximized simultaneously and those that
+        carry flux in a solution are dropped from the objective until no further candidate carries flux.
+        This is exact for the irreversible candidates; the reversible ones that are left over are then
+        checked individually, again using each solution to prune the candidates.
+        Each solution is passed to solution_callback. Returns None if an LP could not be solved.
+        """
+        reactions = self.model.reactions
+        unknown = set(candidates)
+        def prune():
+            fluxes = self.fluxes()
+            if solution_callback is not None:
+                solution_callback(fluxes)
+            carry_flux = [i for i in unknown if abs(fluxes[i]) > self.tolerance]
+            unknown.difference_update(carry_flux)
+            return len(carry_flux)
+
+        # forward and backward directions alternate because z_f + z_b <= 0
+        objective = self.model.solver.objective
+        objective.direction = 'max'
+        z_obj = {}
+        rounds_without_progress = 0
+        direction = 0
+        while len(unknown) > 0 and rounds_without_progress < 2:
+            objective.set_linear_coefficients({z: 0.0 for z in z_obj})
+            if direction == 0:
+                z_obj = {self.z_f[i]: 1.0 for i in unknown if reactions[i].upper_bound > 0}
+            else:
+                z_obj = {self.z_b[i]: 1.0 for i in unknown if reactions[i].lower_bound < 0}
+            direction = 1 - direction
+            if len(z_obj) == 0:
+                rounds_without_progress += 1
+                continue
+            objective.set_linear_coefficients(z_obj)
+            self.model.slim_optimize()
+            self.num_lp += 1
+            if self.model.solver.status != 'optimal':
+                objective.set_linear_coefficients({z: 0.0 for z in z_obj})
+                print_func("LP for blocked reactions could not be solved, status: "+self.model.solver.status)
+                return None
+            if prune() > 0:
+                rounds_without_progress = 0
+            else:
+                rounds_without_progress += 1
+        objective.set_linear_coefficients({z: 0.0 for z in z_obj})
+
+        # irreversible candidates that are still unknown are blocked
+        blocked = {i for i in unknown if reactions[i].lower_bound >= 0 or reactions[i].upper_bound <= 0}
+        unknown.difference_update(blocked)
+        while len(unknown) > 0:
+            i = min(unknown)
+            flux_vars = (reactions[i].forward_variable, reactions[i].reverse_variable)
+            objective.set_linear_coefficients({flux_vars[0]: 1.0, flux_vars[1]: -1.0})
+            found = False
+            for direction in ('max', 'min'):
+                objective.direction = direction
+                self.model.slim_optimize()
+                self.num_lp += 1
+                if self.model.solver.status == 'optimal' and prune() > 0:
+                    found = True
+                    break
+            objective.set_linear_coefficients({flux_vars[0]: 0.0, flux_vars[1]: 0.0})
+            objective.direction = 'max'
+            if not found:
+                blocked.add(i)
+                unknown.discard(i)
+        return sorted(blocked)
+
+
+def find_blocked_reactions(model: cobra.Model, tolerance: float = 1e-9, print_func=print) -> List[str]:
+    """
+    Finds the reactions that cannot carry flux in the current model. Dead-end reactions are
+    removed first, then the remaining candidates are checked with a BlockedReactionsLP.
+    """
+    dead_ends = set(find_dead_end_reactions(model))
+    print_func("Found "+str(len(dead_ends))+" dead-end reactions.")
+    with model as model:
+        for r in dead_ends:
+            model.reactions.get_by_id(r).bounds = (0, 0)
+        lp = BlockedReactionsLP(model, tolerance=tolerance)
+        blocked = lp.find_blocked([i for i, r in enumerate(model.reactions) if r.id not in dead_ends],
+                                  print_func=print_func)
+    if blocked is None:
+        return None
+    blocked = dead_ends.union(model.reactions[i].id for i in blocked)
+    print_func("Found "+str(len(blocked))+" blocked reactions with "+str(lp.num_lp)+" LPs.")
+    return [r.id for r in model.reactions if r.id in blocked]
+
+
+def get_blocked_reactions(model: cobra.Model, reversibility_only: bool = False, results_cache_dir: Path = None,
+                          print_func=print) -> List[str]:
+    """
+    Returns the blocked reactions of the model (with the scenario that may have been loaded into it)
+    and caches them per network hash in memory and optionally in results_cache_dir.
+    With reversibility_only all reaction bounds are relaxed to their sign as is appropriate for EFMs.
+    """
+    with model as model:
+        if reversibility_only:
+            for r in model.reactions:
+                r.bounds = (-1000.0 if r.lower_bound < 0 else 0.0, 1000.0 if r.upper_bound > 0 else 0.0)
+        key = network_hash(model)
+        blocked = _blocked_reactions_cache.get(key, None)
+        if blocked is not None:
+            return blocked
+        if results_cache_dir is not None:
+            file_path = Path(results_cache_dir) / ("blocked_reactions_"+key+".json")
+            if file_path.exists():
+                try:
+                    with open(file_path, 'r') as fp:
+                        blocked = json.load(fp)
+                    print_func("Loaded blocked reactions from "+str(file_path))
+                except (OSError, ValueError):
+                    blocked = None
+        if blocked is None:
+            blocked = find_blocked_reactions(model, print_func=print_func)
+            if blocked is None:
+                return []
+            if results_cache_dir is not None:
+                try:
+                    with open(file_path, 'w') as fp:
+                        json.dump(blocked, fp)
+                except OSError:
+                    print_func("Failed to save blocked reactions to "+str(file_path))
+        _blocked_reactions_cache[key] = blocked
+    return blocked
+
+
+def referenced_reactions(text: str, reaction_ids: Iterable[str]) -> Set[str]:
+    """
+    The IDs from reaction_ids that occur in text (e.g. target/desired regions or a strain design setup
+    as JSON) as whole words, delimited by white space, quotes, brackets, separators or operators.
+    """
+    words = set()
+    for part in text.split():
+        words.add(part.strip("\"'()[]{},:;"))
+        words.update(re.split(r"[\"'()\[\]{},:;+\-*/<>=]+", part))
+    return words.intersection(reaction_ids)
+
+
+def remove_blocked_reactions(model: cobra.Model, blocked: List[str], protected: Iterable[str] = ()):
+    """
+    Removes the blocked reactions from the model except the protected ones (e.g. those that are
+    referenced in target/desired regions). Use within a model context to revert this later.
+    """
+    protected = set(protected)
+    remove = [r for r in blocked if r not in protected]
+    model.remove_reactions(remove)
+    return remove
@@ -1,10 +1,14 @@
 """UI independent computations"""
 
 import itertools
+import re
+import tempfile
+import time
 from collections import defaultdict
 from typing import Dict, Tuple, List
 from collections import Counter
 import numpy
+import psutil
 import cobra
 from cobra.util.array import create_stoichiometric_matrix
 from cobra.core.dictlist import DictList
@@ -18,8 +22,58 @@ from cnapy.appdata import Scenario
 organic_elements = ['C', 'O', 'H', 'N', 'P', 'S']
 
 
+def efmtool_resources(reserved_memory: int = 1024) -> Tuple[int, int]:
+    """
+    JVM heap size (in MB) and number of threads for EFMtool, based on the RAM that is currently
+    available (minus reserved_memory MB) and the number of processes configured for cobrapy
+    (at most the default of efmtool_link because EFMtool does not profit from more threads).
+    """
+    jvm_memory = max(psutil.virtual_memory().available//(1024**2) - reserved_memory, 128)
+    threads = max(1, min(cobra.Configuration().processes, efmtool_extern.default_threads))
+    return jvm_memory, threads
+
+
+class ScratchTempfile:
+    """Stands in for the tempfile module and creates the temporary directories in scratch_dir"""
+
+    def __init__(self, scratch_dir: str):
+        self.scratch_dir = scratch_dir
+
+    def TemporaryDirectory(self, *args, **kwargs):
+        kwargs.setdefault('dir', self.scratch_dir)
+        return tempfile.TemporaryDirectory(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(tempfile, name)
+
+
+class EFMtoolProgress:
+    """Extracts the iteration progress from the EFMtool log and estimates the remaining time"""
+    iteration_pattern = re.compile(r"iteration\s+(\d+)\s*/\s*(\d+)\s*:\s*(\d+)\s+modes")
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+
+    def parse(self, line: str):
+        """
+        Returns (iteration, number of iterations, intermediate modes, estimated remaining seconds)
+        or None if line does not report an iteration. The estimate extrapolates the average time per
+        iteration so far; because the intermediate modes usually grow it tends to be too optimistic.
+        """
+        match = self.iteration_pattern.search(line)
+        if match is None:
+            return None
+        iteration, num_iterations, modes = (int(x) for x in match.groups())
+        elapsed = time.monotonic() - self.start_time
+        eta = elapsed * (num_iterations - iteration) / max(iteration, 1)
+        return iteration, num_iterations, modes, eta
+
+
 def efm_computation(model: cobra.Model, scen_values: Dict[str, Tuple[float, float]], constraints: bool,
-                    print_progress_function=print, abort_callback=None):
+                    print_progress_function=print, abort_callback=None, blocked_reactions: List[str] = None,
+                    scratch_dir: str = None):
+    # blocked_reactions are removed from the network because they cannot occur in any EFM
+    # scratch_dir is the directory (e.g. on a fast local disk) in which EFMtool stores its temporary files
     stdf = create_stoichiometric_matrix(
         model, array_type='DataFrame')
     reversible, irrev_backwards_idx = efmtool4cobra.get_reversibility(
@@ -38,11 +92,28 @@ def efm_computation(model: cobra.Model, scen_values: Dict[str, Tuple[float, floa
                 if len(irrev_backwards_idx) > 0:
                     irrev_back = numpy.delete(irrev_back, r_idx)
                 scenario[r] = (0, 0)
+    if blocked_reactions is not None:
+        for r in blocked_reactions:
+            if r in stdf.columns:
+                r_idx = stdf.columns.get_loc(r)
+                reversible = numpy.delete(reversible, r_idx)
+                del stdf[r]
+                if len(irrev_backwards_idx) > 0:
+                    irrev_back = numpy.delete(irrev_back, r_idx)
     if len(irrev_backwards_idx) > 0:
         irrev_backwards_idx = numpy.where(irrev_back)[0]
         stdf.values[:, irrev_backwards_idx] *= -1
-    work_dir = efmtool_extern.calculate_flux_modes(
-        stdf.values, reversible, return_work_dir_only=True, print_progress_function=print_progress_function, abort_callback=abort_callback)
+    jvm_memory, threads = efmtool_resources()
+    print_progress_function("Running EFMtool with "+str(jvm_memory)+" MB heap and "+str(threads)+" threads")
+    # efmtool_extern creates its working directory via tempfile; only there it is redirected
+    if scratch_dir:
+        efmtool_extern.tempfile = ScratchTempfile(scratch_dir)
+    try:
+        work_dir = efmtool_extern.calculate_flux_modes(
+            stdf.values, reversible, return_work_dir_only=True, jvm_max_memory=jvm_memory, max_threads=threads,
+            print_progress_function=print_progress_function, abort_callback=abort_callback)
+    finally:
+        efmtool_extern.tempfile = tempfile
     reac_id = stdf.columns.tolist()
     if work_dir is None:
         ems = None
@@ -67,6 +138,227 @@ def efm_computation(model: cobra.Model, scen_values: Dict[str, Tuple[float, floa
     return (ems, scenario)
 
 
+def kshortest_efm_computation(model: cobra.Model, scen_values: Dict[str, Tuple[float, float]], constraints: bool,
+                              max_efm_size: int = 0, max_efm_num: int = 0, big_m: float = 1000.0,
+                              print_progress_function=print, abort_callback=None, blocked_reactions: List[str] = None):
+    """
+    Enumerates the EFMs in order of increasing support size with a MILP (k-shortest EFMs).
+    The MILP is set up once with the solver interface of the model and after each solution
+    an integer cut that excludes this support (and all its supersets) is added to it.
+    A max_efm_size or max_efm_num of 0 means no limit.
+    """
+    if max_efm_size < 0 or max_efm_num < 0:
+        raise ValueError("max_efm_size and max_efm_num must not be negative.")
+    scenario = {}
+    reactions = []
+    blocked_reactions = set() if blocked_reactions is None else set(blocked_reactions)
+    for r in model.reactions:
+        if constraints and scen_values.get(r.id, (None, None)) == (0, 0):
+            scenario[r.id] = (0, 0)
+        elif r.id not in blocked_reactions:
+            reactions.append(r)
+    reac_id = [r.id for r in reactions]
+    reversible = numpy.array([r.lower_bound < 0 and r.upper_bound > 0 for r in reactions])
+
+    interface = model.problem
+    milp = interface.Model()
+    fwd = [None] * len(reactions)
+    bwd = [None] * len(reactions)
+    z_vars = []
+    for i, r in enumerate(reactions):
+        # the split variables are either 0 or in [1, big_m]
+        if r.upper_bound > 0:
+            fwd[i] = (interface.Variable("v_f_"+str(i), lb=0, ub=big_m),
+                      interface.Variable("z_f_"+str(i), type='binary'))
+            z_vars.append(fwd[i][1])
+        if r.lower_bound < 0:
+            bwd[i] = (interface.Variable("v_b_"+str(i), lb=0, ub=big_m),
+                      interface.Variable("z_b_"+str(i), type='binary'))
+            z_vars.append(bwd[i][1])
+    milp.add([v for pair in fwd + bwd if pair is not None for v in pair])
+    met_coeff = defaultdict(dict)
+    for i, r in enumerate(reactions):
+        for met, coeff in r.metabolites.items():
+            if fwd[i] is not None:
+                met_coeff[met.id][fwd[i][0]] = coeff
+            if bwd[i] is not None:
+                met_coeff[met.id][bwd[i][0]] = -coeff
+    cons = []
+    for met_id in met_coeff:
+        cons.append(interface.Constraint(Zero, lb=0, ub=0, name="mb_"+met_id))
+    for v, z in (pair for pair in fwd + bwd if pair is not None):
+        cons.append(interface.Constraint(v - big_m*z, ub=0))
+        cons.append(interface.Constraint(v - z, lb=0))
+    for i in numpy.where(reversible)[0]:
+        cons.append(interface.Constraint(fwd[i][1] + bwd[i][1], ub=1))
+    cons.append(interface.Constraint(Add(*z_vars), lb=1, ub=max_efm_size if max_efm_size > 0 else None,
+                                     name="efm_size"))
+    milp.add(cons)
+    milp.update()
+    for met_id, coeffs in met_coeff.items():
+        milp.constraints["mb_"+met_id].set_linear_coefficients(coeffs)
+    milp.objective = interface.Objective(Add(*z_vars), direction='min')
+
+    efms = []
+    while max_efm_num <= 0 or len(efms) < max_efm_num:
+        if abort_callback is not None and abort_callback():
+            print_progress_function("Computation aborted.")
+            return (None, scenario)
+        status = milp.optimize()
+        if status != 'optimal':
+            break
+        efm = numpy.zeros(len(reactions))
+        support = []
+        mirror = []
+        for i in range(len(reactions)):
+            if fwd[i] is not None and fwd[i][1].primal > 0.5:
+                efm[i] = fwd[i][0].primal
+                support.append(fwd[i][1])
+                mirror.append(bwd[i][1] if bwd[i] is not None else None)
+            elif bwd[i] is not None and bwd[i][1].primal > 0.5:
+                efm[i] = -bwd[i][0].primal
+                support.append(bwd[i][1])
+                mirror.append(fwd[i][1] if fwd[i] is not None else None)
+        efms.append(efm/numpy.min(numpy.abs(efm[efm != 0]))) # smallest flux scaled to 1
+        print_progress_function("EFM "+str(len(efms))+" with "+str(len(support))+" reactions")
+        cuts = [support]
+        if all(z is not None for z in mirror): # reversible EFM, also exclude its backward direction
+            cuts.append(mirror)
+        milp.add([interface.Constraint(Add(*cut), ub=len(cut) - 1) for cut in cuts])
+
+    print_progress_function("Found "+str(len(efms))+" EFMs.")
+    if len(efms) == 0:
+        fv_mat = numpy.zeros((0, len(reactions)))
+    else:
+        fv_mat = numpy.vstack(efms)
+    is_irrev_efm = numpy.any(fv_mat[:, ~reversible] != 0, axis=1)
+    return (FluxVectorContainer(fv_mat, reac_id=reac_id, irreversible=is_irrev_efm), scenario)
+
+
+def modes_in_region(fv_mat, leq_mat: numpy.ndarray, rhs: numpy.ndarray, reversible: numpy.ndarray = None) -> numpy.ndarray:
+    """
+    Returns a boolean vector that marks the modes (rows of fv_mat) of which a positive
+    multiple satisfies leq_mat * v <= rhs. For the modes that are marked in reversible
+    negative multiples are tested as well.
+    """
+    if hasattr(fv_mat, 'toarray'):
+        fv_mat = fv_mat.toarray()
+    fv_mat = numpy.asarray(fv_mat)
+    in_region = _positive_multiples_in_region(fv_mat, leq_mat, rhs)
+    if reversible is not None and numpy.any(reversible):
+        in_region[reversible] |= _positive_multiples_in_region(-fv_mat[reversible], leq_mat, rhs)
+    return in_region
+
+
+def _positive_multiples_in_region(fv_mat: numpy.ndarray, leq_mat: numpy.ndarray, rhs: numpy.ndarray) -> numpy.ndarray:
+    lhs = fv_mat @ leq_mat.T
+    lower = numpy.zeros(lhs.shape[0])
+    upper = numpy.full(lhs.shape[0], numpy.inf)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratio = rhs / lhs # the scaling factor at which each row becomes active
+        in_region = numpy.ones(lhs.shape[0], dtype=bool)
+        for j in range(lhs.shape[1]):
+            pos = lhs[:, j] > 0
+            neg = lhs[:, j] < 0
+            zero = ~(pos | neg)
+            if rhs[j] < 0:
+                in_region &= ~(pos | zero)
+                lower[neg] = numpy.maximum(lower[neg], ratio[neg, j])
+            else:
+                upper[pos] = numpy.minimum(upper[pos], ratio[pos, j])
+    return in_region & (lower <= upper) & (upper > 0)
+
+
+class NoTargetModes(Exception):
+    pass
+
+
+def minimal_hitting_sets(sets: List[int], max_size: int = 0, abort_callback=None) -> List[int]:
+    """
+    Berge's algorithm for the minimal hitting sets of a collection of sets that are given
+    as bitsets (Python integers). Hitting sets larger than max_size are discarded during
+    the computation (max_size = 0 means no limit).
+    """
+    sets = sorted(set(sets), key=lambda s: bin(s).count('1'))
+    if any(s == 0 for s in sets):
+        return []
+    # only the minimal sets matter because their supersets are hit automatically
+    minimal_sets = []
+    for s in sets:
+        if not any(m & s == m for m in minimal_sets):
+            minimal_sets.append(s)
+    hitting_sets = [0]
+    for s in minimal_sets:
+        if abort_callback is not None and abort_callback():
+            return None
+        hit = [h for h in hitting_sets if h & s]
+        not_hit = [h for h in hitting_sets if not h & s]
+        bits = [1 << i for i in range(s.bit_length()) if s >> i & 1]
+        for h in not_hit:
+            if max_size > 0 and bin(h).count('1') >= max_size:
+                continue
+            for b in bits:
+                c = h | b
+                # c is minimal iff it is not a superset of an already valid hitting set
+                if not any(k & c == k for k in hit):
+                    hit.append(c)
+        hitting_sets = hit
+    return hitting_sets
+
+
+def mcs_from_efms(efms: FluxVectorContainer, targets: List[Tuple[numpy.ndarray, numpy.ndarray]],
+                  desired: List[Tuple[numpy.ndarray, numpy.ndarray]], reac_id: List[str],
+                  max_mcs_size: int = 0, cuttable: List[str] = None, abort_callback=None) -> List[List[int]]:
+    """
+    Calculates (constrained) minimal cut sets as minimal hitting sets of the supports of the target modes
+    that leave at least one mode of each desired region intact. The regions are given as (leq_mat, rhs)
+    with columns that correspond to reac_id and the MCS are returned as lists of indices into reac_id.
+    Raises NoTargetModes if none of the modes lies in a target region.
+    """
+    col = [reac_id.index(r) for r in efms.reac_id]
+    def map_region(region):
+        return (region[0][:, col], region[1])
+    fv_mat = efms.fv_mat
+    if hasattr(fv_mat, 'toarray'):
+        fv_mat = fv_mat.toarray()
+    fv_mat = numpy.asarray(fv_mat)
+    # reversible EFMs are only stored in one direction
+    irreversible = numpy.asarray(efms.irreversible, dtype=bool)
+    if irreversible.shape == (fv_mat.shape[0],):
+        reversible = ~irreversible
+    else: # not known
+        reversible = None
+    is_target = numpy.zeros(fv_mat.shape[0], dtype=bool)
+    for t in targets:
+        is_target |= modes_in_region(fv_mat, *map_region(t), reversible)
+    if not numpy.any(is_target):
+        raise NoTargetModes("None of the modes lies in a target region.")
+    desired_modes = [modes_in_region(fv_mat, *map_region(d), reversible) for d in desired]
+
+    support = fv_mat != 0
+    if cuttable is not None:
+        cuttable = set(cuttable)
+        cut_mask = numpy.array([r in cuttable for r in efms.reac_id])
+    else:
+        cut_mask = numpy.ones(len(efms.reac_id), dtype=bool)
+    def to_bitset(row):
+        return int.from_bytes(numpy.packbits(row[::-1]).tobytes(), 'big') >> (-len(row) % 8)
+    target_sets = [to_bitset(row) for row in support[is_target][:, cut_mask]]
+    cut_idx = numpy.where(cut_mask)[0]
+    hitting_sets = minimal_hitting_sets(target_sets, max_size=max_mcs_size, abort_callback=abort_callback)
+    if hitting_sets is None:
+        return None
+
+    mcs = []
+    desired_supports = [support[d] for d in desired_modes]
+    for h in hitting_sets:
+        cut = cut_idx[[i for i in range(h.bit_length()) if h >> i & 1]]
+        if all(numpy.any(~numpy.any(s[:, cut], axis=1)) for s in desired_supports):
+            mcs.append([col[i] for i in cut])
+    mcs.sort(key=len)
+    return mcs
+
+
 class QPnotSupportedException(Exception):
     pass
 
@@ -0,0 +1,92 @@
+"""Dynamic FBA with one LP whose exchange bounds are updated in each time step"""
+
+from typing import Dict, Tuple
+
+import numpy
+import cobra
+
+from cnapy.flux_vector_container import DynamicFBAContainer
+
+
+def _biomass_integral(x: float, mu: float, dt: float) -> float:
+    # integral of the biomass x*exp(mu*t) over a step of length dt
+    return x*numpy.expm1(mu*dt)/mu if abs(mu) > 1e-12 else x*dt
+
+
+def dynamic_fba(model: cobra.Model, biomass: str, substrates: Dict[str, Tuple[float, float, float]],
+                initial_biomass: float, duration: float, num_steps: int, print_func=print,
+                progress_callback=None, abort_callback=None, max_uptake_iterations: int = 10) -> DynamicFBAContainer:
+    """
+    Static optimization approach of dynamic FBA with the model (with the scenario that may have been
+    loaded into it). substrates maps an exchange reaction (defined in export direction) to the initial
+    concentration [mmol/L], the maximal uptake rate [mmol/gDW/h] and the Michaelis constant [mmol/L]
+    of its substrate; its uptake bound follows from Michaelis-Menten kinetics in each step but is never
+    relaxed beyond the bound in the model. The concentrations of all exchanged metabolites and the
+    biomass [gDW/L] are integrated exactly for the constant fluxes within each step. The uptake of a
+    substrate is limited so that no more than its remaining amount is consumed in a step; when the
+    growth rate increases the LP is solved again with this limit (up to max_uptake_iterations times).
+    Only the bounds of the substrate exchanges are changed between the LPs so that the solver can
+    start from the basis of the previous step. The simulation stops early if the LP becomes infeasible.
+    progress_callback is called with the number of simulated steps.
+    Returns None if the computation was aborted.
+    """
+    dt = duration/num_steps
+    reac_id = model.reactions.list_attr("id")
+    var_idx = {v.name: i for i, v in enumerate(model.variables)}
+    fwd_idx = numpy.array([var_idx[r.forward_variable.name] for r in model.reactions])
+    rev_idx = numpy.array([var_idx[r.reverse_variable.name] for r in model.reactions])
+    exchanges = [r for r in model.reactions if r.boundary]
+    exchange_idx = numpy.array([model.reactions.index(r) for r in exchanges], dtype=int)
+    exchange_pos = {r.id: i for i, r in enumerate(exchanges)}
+    biomass_idx = reac_id.index(biomass)
+    substrate_reactions = [model.reactions.get_by_id(s) for s in substrates]
+    model_lb = numpy.array([r.lower_bound for r in substrate_reactions])
+    substrate_pos = numpy.array([exchange_pos[s] for s in substrates], dtype=int)
+    vmax = numpy.array([v for (_, v, _) in substrates.values()])
+    km = numpy.array([k for (_, _, k) in substrates.values()])
+
+    fluxes = numpy.zeros((num_steps, len(reac_id)))
+    concentrations = numpy.zeros((num_steps + 1, len(exchanges)))
+    concentrations[0, substrate_pos] = [c for (c, _, _) in substrates.values()]
+    biomass_conc = numpy.zeros(num_steps + 1)
+    biomass_conc[0] = initial_biomass
+    steps_done = 0
+    mu = 0.0 # growth rate of the previous step
+    with model as model:
+        for step in range(num_steps):
+            if abort_callback is not None and abort_callback():
+                return None
+            x = biomass_conc[step]
+            s = concentrations[step, substrate_pos]
+            kinetic_uptake = vmax*s/(km + s)
+            # the uptake is also limited by the amount that is still available; the consumption in the step is
+            # the flux times the integral of the biomass which is first estimated with the previous growth rate
+            integral = _biomass_integral(x, mu, dt)
+            for _ in range(max_uptake_iterations):
+                uptake = numpy.minimum(kinetic_uptake, s/integral if integral > 0 else numpy.inf)
+                for r, lb, u in zip(substrate_reactions, model_lb, uptake):
+                    r.lower_bound = min(max(lb, -u), r.upper_bound)
+                model.slim_optimize()
+                if model.solver.status != 'optimal':
+                    break
+                primals = numpy.array(model.solver._get_primal_values())
+                fluxes[step] = primals[fwd_idx] - primals[rev_idx]
+                mu = fluxes[step, biomass_idx]
+                step_integral = _biomass_integral(x, mu, dt)
+                if step_integral <= integral*(1 + 1e-9): # then no more than the available substrate is consumed
+                    break
+                integral = step_integral
+            if model.solver.status != 'optimal':
+                print_func("Stopping at t = "+str(round(step*dt, 6))+" because the LP is "+model.solver.status)
+                break
+            biomass_conc[step + 1] = x*numpy.exp(mu*dt)
+            # only rounding errors are clipped
+            concentrations[step + 1] = numpy.maximum(concentrations[step] + fluxes[step, exchange_idx]*step_integral, 0)
+            steps_done += 1
+            if progress_callback is not None and steps_done % 10 == 0:
+                progress_callback(steps_done)
+    print_func("Simulated "+str(steps_done)+" time steps, final biomass concentration "
+               +str(round(biomass_conc[steps_done], 6)))
+    return DynamicFBAContainer(fluxes[:steps_done], reac_id, numpy.arange(steps_done + 1)*dt,
+                               biomass_conc[:steps_done + 1], concentrations[:steps_done + 1],
+                               [r.id for r in exchanges])
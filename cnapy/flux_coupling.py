@@ -0,0 +1,262 @@
+"""Flux coupling analysis"""
+
+import time
+from typing import Dict, List
+
+import numpy
+import cobra
+from cobra.util import ProcessPool
+from optlang.symbolics import Zero
+
+from cnapy.blocked_reactions import BlockedReactionsLP, get_blocked_reactions
+
+
+class FluxCouplingResult:
+    """
+    coupled[i, j] is True if reaction i is directionally coupled to reaction j, i.e. every flux vector
+    with flux through i also has flux through j. Mutually coupled reactions are partially coupled or,
+    if their flux ratio is fixed, fully coupled which is indicated by the same fully_coupled_class.
+    Blocked reactions are in class -1.
+    """
+    BLOCKED = "blocked"
+    FULLY = "fully coupled"
+    PARTIALLY = "partially coupled"
+    DIRECTIONALLY = "directionally coupled"
+    DIRECTIONALLY_REVERSE = "directionally coupled (reverse)"
+    UNCOUPLED = "uncoupled"
+
+    def __init__(self, reac_id: List[str], coupled: numpy.ndarray, fully_coupled_class: numpy.ndarray):
+        self.reac_id = reac_id
+        self.reac_idx = {r: i for i, r in enumerate(reac_id)}
+        self.coupled = coupled
+        self.fully_coupled_class = fully_coupled_class
+        self.class_size = numpy.bincount(fully_coupled_class[fully_coupled_class >= 0], minlength=len(reac_id))
+
+    def coupling_type(self, reac1: str, reac2: str) -> str:
+        i = self.reac_idx[reac1]
+        j = self.reac_idx[reac2]
+        if self.fully_coupled_class[i] < 0 or self.fully_coupled_class[j] < 0:
+            return FluxCouplingResult.BLOCKED
+        if self.fully_coupled_class[i] == self.fully_coupled_class[j]:
+            return FluxCouplingResult.FULLY
+        if self.coupled[i, j]:
+            if self.coupled[j, i]:
+                return FluxCouplingResult.PARTIALLY
+            return FluxCouplingResult.DIRECTIONALLY
+        if self.coupled[j, i]:
+            return FluxCouplingResult.DIRECTIONALLY_REVERSE
+        return FluxCouplingResult.UNCOUPLED
+
+    def coupled_reactions(self, reac: str) -> Dict[str, List[str]]:
+        """The reactions that are coupled with reac grouped by the type of coupling."""
+        i = self.reac_idx[reac]
+        coupling = {FluxCouplingResult.FULLY: [], FluxCouplingResult.PARTIALLY: [],
+                    FluxCouplingResult.DIRECTIONALLY: [], FluxCouplingResult.DIRECTIONALLY_REVERSE: []}
+        if self.fully_coupled_class[i] >= 0:
+            for j in numpy.where(self.coupled[i, :] | self.coupled[:, i])[0]:
+                if j != i:
+                    coupling[self.coupling_type(reac, self.reac_id[j])].append(self.reac_id[j])
+        return coupling
+
+    def num_blocked(self) -> int:
+        return int(numpy.sum(self.fully_coupled_class < 0))
+
+
+def _init_worker(model: cobra.Model, tolerance: float):
+    global _lp
+
+    _lp = BlockedReactionsLP(model, tolerance=tolerance)
+
+
+def _coupled_to_step(args):
+    """
+    Finds those candidates that are blocked when the flux through reaction k is zero,
+    i.e. which are directionally coupled to k, by changing the bounds of k only.
+    """
+    (k, candidates) = args
+    reaction = _lp.model.reactions[k]
+    bounds = reaction.bounds
+    reaction.bounds = (0, 0)
+    solutions = []
+    num_lp = _lp.num_lp
+    coupled = _lp.find_blocked(candidates, solution_callback=solutions.append, print_func=lambda *txt: None)
+    reaction.bounds = bounds
+    return k, coupled, solutions, _lp.num_lp - num_lp
+
+
+def _ratio_step(args):
+    """
+    Determines which members have a fixed flux ratio with the reaction rep by fixing the flux
+    of rep to 1 (and -1 if it is reversible) and minimizing/maximizing the flux of the members.
+    """
+    (rep, members, ratio_tolerance) = args
+    model = _lp.model
+    reaction = model.reactions[rep]
+    bounds = reaction.bounds
+    ratios = {i: [] for i in members}
+    num_lp = 0
+    for rep_flux in (1.0, -1.0):
+        if (rep_flux > 0 and bounds[1] <= 0) or (rep_flux < 0 and bounds[0] >= 0):
+            continue
+        reaction.bounds = (rep_flux, rep_flux)
+        model.slim_optimize()
+        num_lp += 1
+        if model.solver.status != 'optimal': # rep cannot operate in this direction
+            reaction.bounds = bounds
+            continue
+        for i in members:
+            flux_vars = (model.reactions[i].forward_variable, model.reactions[i].reverse_variable)
+            model.solver.objective.set_linear_coefficients({flux_vars[0]: 1.0, flux_vars[1]: -1.0})
+            for direction in ('max', 'min'):
+                model.solver.objective.direction = direction
+                value = model.slim_optimize()
+                num_lp += 1
+                # an unbounded or infeasible LP cannot occur when i and rep are mutually coupled
+                ratios[i].append(value/rep_flux)
+            model.solver.objective.set_linear_coefficients({flux_vars[0]: 0.0, flux_vars[1]: 0.0})
+        reaction.bounds = bounds
+    model.solver.objective.direction = 'max'
+    return rep, [i for i in members if numpy.ptp(ratios[i]) <= ratio_tolerance*max(1, numpy.max(numpy.abs(ratios[i])))], num_lp
+
+
+def flux_coupling_analysis(model: cobra.Model, processes: int = None, tolerance: float = 1e-9,
+                           ratio_tolerance: float = 1e-6, max_solutions: int = 2000, print_func=print,
+                           abort_callback=None) -> FluxCouplingResult:
+    """
+    Flux coupling analysis of the model (with the scenario that may have been loaded into it) where
+    the reaction bounds are relaxed to their sign as usual for the flux cone.
+    All reactions that are directionally coupled to reaction k are found at once as those that become
+    blocked when k is switched off, which only requires bound changes in the LP that each worker keeps.
+    The candidates for k are pruned by transitivity (if k is coupled to j, all reactions coupled to k
+    are also coupled to j) and by the solutions of previous LPs (if some solution has flux through i but
+    not through k, then i is not coupled to k). Mutually coupled reactions are then tested for a fixed
+    flux ratio where again the previous solutions exclude many pairs.
+    Returns None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    reac_id = model.reactions.list_attr("id")
+    n = len(reac_id)
+    blocked = set(get_blocked_reactions(model, reversibility_only=True, print_func=print_func))
+    unblocked = numpy.array([r not in blocked for r in reac_id])
+    with model as model:
+        for r in model.reactions:
+            if r.id in blocked:
+                r.bounds = (0, 0)
+            else:
+                r.bounds = (-1000.0 if r.lower_bound < 0 else 0.0, 1000.0 if r.upper_bound > 0 else 0.0)
+        model.objective = Zero
+
+        coupled = numpy.zeros((n, n), dtype=bool)
+        computed = numpy.zeros(n, dtype=bool)
+        solutions = numpy.zeros((0, n))
+        support = numpy.zeros((0, n), dtype=numpy.float32)
+        num_lp = 0
+        def add_solutions(new_solutions):
+            nonlocal solutions, support
+            if len(new_solutions) > 0:
+                solutions = numpy.vstack([numpy.array(new_solutions), solutions])[:max_solutions]
+                support = (numpy.abs(solutions) > tolerance).astype(numpy.float32)
+
+        def candidates(k):
+            cand = unblocked.copy()
+            cand[k] = False
+            # i -> k and k -> j imply i -> j (or i = j)
+            for j in numpy.where(coupled[k, :] & computed)[0]:
+                cand_j = cand[j]
+                cand &= coupled[:, j]
+                cand[j] = cand_j
+            cand &= (1 - support[:, k]) @ support == 0
+            return list(numpy.where(cand)[0])
+
+        last_print = time.monotonic()
+        def collect(step_result):
+            nonlocal num_lp, last_print
+            (k, coupled_to_k, step_solutions, step_num_lp) = step_result
+            coupled[coupled_to_k, k] = True
+            computed[k] = True
+            add_solutions(step_solutions)
+            num_lp += step_num_lp
+            if time.monotonic() - last_print > 5:
+                print_func("Tested "+str(numpy.sum(computed))+" of "+str(numpy.sum(unblocked))+" reactions")
+                last_print = time.monotonic()
+
+        todo = list(numpy.where(unblocked)[0])
+        print_func("Testing the coupling of "+str(len(todo))+" unblocked reactions...")
+        if processes > 1:
+            pool = ProcessPool(processes, initializer=_init_worker, initargs=(model, tolerance))
+        else:
+            _init_worker(model, tolerance)
+        try:
+            if processes > 1:
+                # only a few steps are submitted at a time so that the later ones profit from the pruning
+                running = []
+                while len(todo) > 0 or len(running) > 0:
+                    while len(todo) > 0 and len(running) < 2*processes:
+                        k = todo.pop(0)
+                        cand = candidates(k)
+                        if len(cand) == 0:
+                            computed[k] = True
+                        else:
+                            running.append(pool.apply_async(_coupled_to_step, ((k, cand),)))
+                    if len(running) > 0:
+                        running[0].wait(timeout=1)
+                        if abort_callback is not None and abort_callback():
+                            pool.terminate()
+                            return None
+                        for result in [r for r in running if r.ready()]:
+                            running.remove(result)
+                            collect(result.get())
+            else:
+                for k in todo:
+                    if abort_callback is not None and abort_callback():
+                        return None
+                    cand = candidates(k)
+                    if len(cand) == 0:
+                        computed[k] = True
+                    else:
+                        collect(_coupled_to_step((k, cand)))
+            print_func("Directional coupling required "+str(num_lp)+" LPs.")
+
+            # mutual coupling is an equivalence relation whose classes are split into the fully coupled ones
+            mutual = coupled & coupled.T
+            fully_coupled_class = numpy.full(n, -1)
+            groups = []
+            for i in numpy.where(unblocked)[0]:
+                if fully_coupled_class[i] < 0:
+                    members = numpy.where(mutual[i, :])[0]
+                    members = members[members != i]
+                    fully_coupled_class[i] = i
+                    fully_coupled_class[members] = i
+                    if len(members) > 0:
+                        groups.append((i, list(members)))
+            num_ratio_lp = 0
+            while len(groups) > 0:
+                steps = []
+                for rep, members in groups:
+                    # previous solutions with different ratios exclude a fixed ratio
+                    sol = solutions[numpy.abs(solutions[:, rep]) > tolerance, :]
+                    ratios = sol[:, members] / sol[:, [rep]]
+                    same = numpy.ptp(ratios, axis=0) <= ratio_tolerance*numpy.maximum(1, numpy.max(numpy.abs(ratios), axis=0)) \
+                        if len(sol) > 0 else numpy.ones(len(members), dtype=bool)
+                    steps.append((rep, [m for m, s in zip(members, same) if s], ratio_tolerance))
+                if processes > 1:
+                    ratio_results = pool.map(_ratio_step, steps)
+                else:
+                    ratio_results = [_ratio_step(step) for step in steps]
+                next_groups = []
+                for (rep, members), (_, fully, step_num_lp) in zip(groups, ratio_results):
+                    num_ratio_lp += step_num_lp
+                    rest = [m for m in members if m not in set(fully)]
+                    if len(rest) > 0:
+                        fully_coupled_class[rest] = rest[0]
+                    if len(rest) > 1:
+                        next_groups.append((rest[0], rest[1:]))
+                groups = next_groups
+                if abort_callback is not None and abort_callback():
+                    return None
+            print_func("Testing for fully coupled reactions required "+str(num_ratio_lp)+" LPs.")
+        finally:
+            if processes > 1:
+                pool.close()
+    return FluxCouplingResult(reac_id, coupled, fully_coupled_class)
@@ -0,0 +1,192 @@
+"""Flux and yield optimization with LPs that are kept as long as the model and scenario do not change"""
+
+import logging
+import pickle
+from typing import List, Optional
+
+from numpy import inf, isinf, nan
+from scipy import sparse
+import cobra
+from cobra.util.array import create_stoichiometric_matrix
+from straindesign import MILP_LP, lineqlist2mat, linexpr2dict, linexprdict2mat, parse_constraints, select_solver
+from straindesign.names import INFEASIBLE, OPTIMAL, UNBOUNDED
+
+from cnapy.blocked_reactions import network_hash
+
+
+def _objective_vector(expression, reaction_ids: List[str]) -> sparse.csr_matrix:
+    if type(expression) is str:
+        expression = linexpr2dict(expression, reaction_ids)
+    return linexprdict2mat(expression, reaction_ids)
+
+
+def _base_problem(model: cobra.Model, constraints: List[list]):
+    # steady state and the scenario constraints as in straindesign's fba and yopt
+    reaction_ids = model.reactions.list_attr("id")
+    A_eq = sparse.csr_matrix(create_stoichiometric_matrix(model))
+    b_eq = [0.0] * len(model.metabolites)
+    A_ineq = sparse.csr_matrix((0, len(reaction_ids)))
+    b_ineq = []
+    if len(constraints) > 0:
+        A_ineq, b_ineq, A_eq_constr, b_eq_constr = lineqlist2mat(parse_constraints(constraints, reaction_ids), reaction_ids)
+        A_eq = sparse.vstack((A_eq, A_eq_constr), 'csr')
+        b_eq = b_eq + b_eq_constr
+    return A_ineq, b_ineq, A_eq, b_eq
+
+
+class FluxOptimizationLP:
+    """
+    The LP of a model with the constraints of a scenario for the optimization of linear flux expressions
+    like straindesign's fba. Only the objective changes between the solves so that the solver can start
+    from the previous basis.
+    """
+
+    def __init__(self, model: cobra.Model, constraints: List[list], solver: str):
+        self.reaction_ids = model.reactions.list_attr("id")
+        A_ineq, b_ineq, A_eq, b_eq = _base_problem(model, constraints)
+        self.lp = MILP_LP(c=[0.0] * len(self.reaction_ids), A_ineq=A_ineq, b_ineq=b_ineq, A_eq=A_eq, b_eq=b_eq,
+                          lb=model.reactions.list_attr("lower_bound"), ub=model.reactions.list_attr("upper_bound"),
+                          solver=solver)
+
+    def optimize(self, obj, obj_sense: str = 'maximize') -> Optional[cobra.Solution]:
+        """
+        Optimizes the flux expression obj (string or dict). Returns the solution or None when the objective is
+        unbounded; then straindesign's fba constructs an example flux vector.
+        """
+        c = _objective_vector(obj, self.reaction_ids).toarray()[0].tolist()
+        maximize = obj_sense not in ['min', 'minimize']
+        if maximize:
+            c = [-v for v in c]
+        self.lp.set_objective(c)
+        x, opt_cx, status = self.lp.solve()
+        if status == UNBOUNDED:
+            return None
+        if status != OPTIMAL:
+            return cobra.Solution(objective_value=nan, status=INFEASIBLE,
+                                  fluxes={r: nan for r in self.reaction_ids})
+        if not maximize:
+            opt_cx = -opt_cx
+        fluxes = {r: v if abs(v) >= 1e-11 else 0.0 for r, v in zip(self.reaction_ids, x)}
+        return cobra.Solution(objective_value=-opt_cx, status=status, fluxes=fluxes)
+
+
+class YieldOptimizationLP:
+    """
+    The LPs of a model with the constraints of a scenario for the optimization of yields like straindesign's
+    yopt: the LP for the range of the denominator and the Charnes-Cooper transformation of the yield
+    optimization. The denominator is fixed with two inequalities which are replaced for each yield so that
+    only the objective and these two rows change between the solves.
+    """
+
+    def __init__(self, model: cobra.Model, constraints: List[list], solver: str):
+        self.reaction_ids = model.reactions.list_attr("id")
+        A_ineq, b_ineq, A_eq, b_eq = _base_problem(model, constraints)
+        # the bounds become inequalities so that they are scaled in the transformed problem
+        lb = model.reactions.list_attr("lower_bound")
+        ub = model.reactions.list_attr("upper_bound")
+        real_lb = [i for i, v in enumerate(lb) if not isinf(v)]
+        real_ub = [i for i, v in enumerate(ub) if not isinf(v)]
+        sparse_lb = sparse.coo_matrix(([-1] * len(real_lb), (range(len(real_lb)), real_lb)), (len(real_lb), A_ineq.shape[1]))
+        sparse_ub = sparse.coo_matrix(([1] * len(real_ub), (range(len(real_ub)), real_ub)), (len(real_ub), A_ineq.shape[1]))
+        A_ineq = sparse.vstack((A_ineq, sparse_lb, sparse_ub), 'csr')
+        b_ineq = b_ineq + [-lb[i] for i in real_lb] + [ub[i] for i in real_ub]
+        self.den_lp = MILP_LP(c=[0.0] * len(self.reaction_ids), A_ineq=A_ineq, b_ineq=b_ineq, A_eq=A_eq, b_eq=b_eq,
+                              solver=solver)
+        # the last variable scales the right hand sides, the last two inequalities fix the denominator
+        self.den_rows = [A_ineq.shape[0], A_ineq.shape[0] + 1]
+        A_ineq_lfp = sparse.vstack((sparse.hstack((A_ineq, sparse.csr_matrix([-b for b in b_ineq]).transpose())),
+                                    sparse.csr_matrix((2, A_ineq.shape[1] + 1))), 'csr')
+        A_eq_lfp = sparse.hstack((A_eq, sparse.csr_matrix([-b for b in b_eq]).transpose()), 'csr')
+        self.lfp = MILP_LP(c=[0.0] * (len(self.reaction_ids) + 1), A_ineq=A_ineq_lfp, b_ineq=[0.0] * A_ineq_lfp.shape[0],
+                           A_eq=A_eq_lfp, b_eq=[0.0] * len(b_eq), solver=solver)
+
+    def optimize(self, obj_num, obj_den, obj_sense: str = 'maximize') -> Optional[cobra.Solution]:
+        """
+        Optimizes the yield obj_num/obj_den (strings or dicts). Returns the solution or None when the
+        yield is unbounded or undefined; then straindesign's yopt constructs an example flux vector.
+        """
+        obj_num = _objective_vector(obj_num, self.reaction_ids)
+        obj_den = _objective_vector(obj_den, self.reaction_ids)
+        maximize = obj_sense not in ['min', 'minimize']
+        if not maximize:
+            obj_num = -obj_num
+        den = obj_den.toarray()[0].tolist()
+        # signs which the denominator can take
+        den_sign = []
+        self.den_lp.set_objective(den)
+        _, min_denx, status = self.den_lp.solve()
+        if status not in [OPTIMAL, UNBOUNDED]:
+            return cobra.Solution(objective_value=nan, status=INFEASIBLE, fluxes={r: nan for r in self.reaction_ids})
+        if min_denx < 0:
+            den_sign.append(-1)
+        self.den_lp.set_objective([-v for v in den])
+        _, max_denx, _ = self.den_lp.solve()
+        if max_denx < 0:
+            den_sign.append(1)
+        if not den_sign:
+            logging.error('Denominator term can only take the value 0. Yield computation impossible.')
+            return cobra.Solution(objective_value=nan, status=INFEASIBLE, fluxes={r: nan for r in self.reaction_ids})
+
+        opt_cx = inf
+        x = None
+        status = INFEASIBLE
+        for d in den_sign:
+            self.lfp.set_ineq_constraint(self.den_rows[0], den + [0.0], d)
+            self.lfp.set_ineq_constraint(self.den_rows[1], [-v for v in den] + [0.0], -d)
+            self.lfp.set_objective((-d * obj_num).toarray()[0].tolist() + [0.0])
+            x_i, opt_i, status_i = self.lfp.solve()
+            if opt_i < opt_cx:
+                x = x_i
+                opt_cx = opt_i
+                status = status_i
+        if status != OPTIMAL:
+            return None if status == UNBOUNDED else \
+                cobra.Solution(objective_value=nan, status=INFEASIBLE, fluxes={r: nan for r in self.reaction_ids})
+        factor = x[-1] if x[-1] != 0 else 1 # scaling factor of the transformed problem
+        if maximize:
+            opt_cx = -opt_cx
+        sol = cobra.Solution(objective_value=opt_cx, status=status,
+                             fluxes={r: x[i] / factor for i, r in enumerate(self.reaction_ids)})
+        sol.scalable = x[-1] == 0
+        return sol
+
+
+class OptimizationLPCache:
+    """
+    The flux and yield optimization LPs of the model with the current scenario; they are
+    set up again only when the network, its bounds, the scenario constraints or the solver change.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.flux_lp: FluxOptimizationLP = None
+        self.yield_lp: YieldOptimizationLP = None
+
+    def clear(self):
+        self.key = None
+        self.flux_lp = None
+        self.yield_lp = None
+
+    def _update_key(self, model: cobra.Model, constraints: List[list], solver: str):
+        key = network_hash(model, pickle.dumps((constraints, solver)))
+        if key != self.key:
+            self.clear()
+            self.key = key
+
+    def get_flux_lp(self, model: cobra.Model, constraints: List[list], solver: str = None) -> FluxOptimizationLP:
+        """The flux optimization LP for the model into which the scenario with the constraints has been loaded."""
+        solver = select_solver(solver, model)
+        constraints = [list(c) for c in constraints]
+        self._update_key(model, constraints, solver)
+        if self.flux_lp is None:
+            self.flux_lp = FluxOptimizationLP(model, constraints, solver)
+        return self.flux_lp
+
+    def get_yield_lp(self, model: cobra.Model, constraints: List[list], solver: str = None) -> YieldOptimizationLP:
+        """The yield optimization LPs for the model into which the scenario with the constraints has been loaded."""
+        solver = select_solver(solver, model)
+        constraints = [list(c) for c in constraints]
+        self._update_key(model, constraints, solver)
+        if self.yield_lp is None:
+            self.yield_lp = YieldOptimizationLP(model, constraints, solver)
+        return self.yield_lp
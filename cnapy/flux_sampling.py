@@ -0,0 +1,235 @@
+"""Flux sampling with parallel hit-and-run chains that write their samples into a memory map"""
+
+import queue
+import tempfile
+import time
+
+import numpy
+import pandas
+import cobra
+from cobra.sampling.core import step
+from cobra.sampling.hr_sampler import HRSampler, shared_np_array
+from cobra.util import ProcessPool
+from optlang.symbolics import Zero
+
+from cnapy.blocked_reactions import get_blocked_reactions
+from cnapy.flux_vector_container import FluxSampleMemmap
+
+
+class FluxSampler(HRSampler):
+    """
+    Artificial centering hit-and-run sampler like cobra's OptGPSampler. Each chain is sampled
+    in blocks whose state is passed on to the next block of the chain so that the progress can
+    be monitored and the samples are written directly into a memory map instead of being collected.
+    """
+
+    def __init__(self, model: cobra.Model, thinning: int = 100, nproj: int = None, seed: int = None,
+                 print_func=print):
+        super().__init__(model, thinning, nproj=nproj, seed=seed)
+        self.generate_fva_warmup(print_func=print_func)
+        self.center = self.warmup.mean(axis=0)
+
+    def generate_fva_warmup(self, print_func=print):
+        """
+        Like HRSampler.generate_fva_warmup but blocked reactions are skipped, the solutions are read
+        in bulk from the solver and a reaction is skipped when a previous solution already attains its bound.
+        """
+        blocked = set(get_blocked_reactions(self.model, print_func=print_func))
+        lb = numpy.array([r.lower_bound for r in self.model.reactions])
+        ub = numpy.array([r.upper_bound for r in self.model.reactions])
+        done = {"min": (ub - lb < self.bounds_tol) | numpy.array([r.id in blocked for r in self.model.reactions])}
+        done["max"] = done["min"].copy()
+        self.model.objective = Zero
+        warmup = []
+        for sense in ("min", "max"):
+            self.model.objective_direction = sense
+            for i in range(len(self.model.reactions)):
+                if done[sense][i]:
+                    continue
+                coefficients = {self.model.variables[self.fwd_idx[i]]: 1, self.model.variables[self.rev_idx[i]]: -1}
+                self.model.objective.set_linear_coefficients(coefficients)
+                self.model.slim_optimize()
+                if self.model.solver.status == 'optimal':
+                    primals = numpy.array(self.model.solver._get_primal_values())
+                    warmup.append(primals)
+                    fluxes = primals[self.fwd_idx] - primals[self.rev_idx]
+                    done["min"] |= fluxes - lb < self.bounds_tol
+                    done["max"] |= ub - fluxes < self.bounds_tol
+                done[sense][i] = True
+                self.model.objective.set_linear_coefficients({v: 0 for v in coefficients})
+        if len(warmup) < 2:
+            raise ValueError("Flux cone only consists a single point.")
+        warmup = numpy.array(warmup)
+        warmup = warmup[numpy.logical_not(self._is_redundant(warmup)), :]
+        if warmup.shape[0] == 2:
+            if not self.problem.homogeneous:
+                raise ValueError("Cannot sample from an inhomogenous problem with only 2 search directions.")
+            warmup = numpy.vstack([warmup, warmup.T.dot([0.25, 0.25])])
+        self.n_warmup = warmup.shape[0]
+        self.warmup = shared_np_array(warmup.shape, warmup)
+
+    def sample(self, n: int, fluxes: bool = True) -> pandas.DataFrame:
+        """
+        Samples n points with a single chain in this process like HRSampler.sample;
+        use sample_fluxes for parallel chains and large samples.
+        """
+        samples, _, self.retries = _continue_chain(self, 0, n, None)
+        if fluxes:
+            return pandas.DataFrame(samples[:, self.fwd_idx] - samples[:, self.rev_idx],
+                                    columns=[r.id for r in self.model.reactions])
+        return pandas.DataFrame(samples, columns=[v.name for v in self.model.variables])
+
+    # the model is not needed in the workers
+    def __getstate__(self):
+        d = dict(self.__dict__)
+        del d["model"]
+        return d
+
+
+def _init_worker(sampler: FluxSampler, fname: str):
+    global _sampler
+    global _samples
+
+    _sampler = sampler
+    _samples = numpy.load(fname, mmap_mode='r+')
+
+
+def _continue_chain(sampler: FluxSampler, chain: int, n: int, state):
+    """
+    Continues a chain from its state (None for a new chain) and returns n samples of all
+    solver variables, the state of the chain after them and the number of retries.
+    """
+    if state is None:
+        rng = numpy.random.default_rng((sampler._seed + chain) % numpy.iinfo(numpy.int32).max)
+        numpy.random.seed(rng.integers(numpy.iinfo(numpy.int32).max)) # used by step
+        center = sampler.center.copy()
+        prev = sampler.warmup[rng.integers(sampler.n_warmup), :]
+        prev = step(sampler, center, prev - center, 0.95)
+        n_steps = 1
+    else:
+        (prev, center, n_steps, rng) = state
+        numpy.random.seed(rng.integers(numpy.iinfo(numpy.int32).max))
+    sampler.retries = 0
+    block = numpy.zeros((n, len(prev)))
+    for i in range(n):
+        for _ in range(sampler.thinning):
+            delta = sampler.warmup[rng.integers(sampler.n_warmup), :] - center
+            prev = step(sampler, prev, delta)
+            if sampler.problem.homogeneous and n_steps % sampler.nproj == 0:
+                prev = sampler._reproject(prev)
+                center = sampler._reproject(center)
+            center = (n_steps * center) / (n_steps + 1) + prev / (n_steps + 1)
+            n_steps += 1
+        block[i, :] = prev
+    return block, (prev, center, n_steps, rng), sampler.retries
+
+
+def _sample_block(args):
+    """
+    Continues a chain from its state and writes n samples into the rows start:start+n of the
+    memory map. Returns the state of the chain after the block.
+    """
+    (chain, start, n, state) = args
+    block, state, retries = _continue_chain(_sampler, chain, n, state)
+    _samples[start:start+n, :] = block[:, _sampler.fwd_idx] - block[:, _sampler.rev_idx]
+    _samples.flush()
+    return chain, start + n, state, retries
+
+
+def sample_fluxes(model: cobra.Model, num_samples: int, thinning: int = 100, processes: int = None,
+                  scratch_dir: str = None, seed: int = None, print_func=print, progress_callback=None,
+                  abort_callback=None) -> FluxSampleMemmap:
+    """
+    Samples the flux space of the model (with the scenario that may have been loaded into it)
+    with one hit-and-run chain per process. The samples are written into a memory map in a temporary
+    directory (in scratch_dir if given) that is deleted when the returned container is cleared.
+    progress_callback is called with the number of samples written so far.
+    Returns None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    processes = max(1, min(processes, num_samples))
+    print_func("Generating warmup points...")
+    sampler = FluxSampler(model, thinning=thinning, seed=seed, print_func=print_func)
+    print_func("Generated "+str(sampler.n_warmup)+" warmup points.")
+    reac_id = model.reactions.list_attr("id")
+    temp_dir = tempfile.TemporaryDirectory(dir=scratch_dir if scratch_dir else None)
+    samples = FluxSampleMemmap("flux_samples.npy", reac_id, num_samples=num_samples, containing_temp_dir=temp_dir)
+    # small blocks so that the progress is reported regularly
+    block_size = max(1, min(100, 2**21 // len(reac_id)))
+    chain_end = numpy.cumsum([len(c) for c in numpy.array_split(numpy.arange(num_samples), processes)])
+    chain_start = numpy.concatenate(([0], chain_end[:-1]))
+    def next_task(chain, start, state):
+        return (chain, start, min(block_size, chain_end[chain] - start), state)
+
+    num_done = 0
+    retries = 0
+    last_print = time.monotonic()
+    def receive_block(result):
+        nonlocal num_done, retries, last_print
+        (chain, end, state, block_retries) = result
+        num_done += end - next_start[chain]
+        next_start[chain] = end
+        retries += block_retries
+        if progress_callback is not None:
+            progress_callback(num_done)
+        if time.monotonic() - last_print > 5:
+            print_func(str(num_done)+" of "+str(num_samples)+" samples")
+            last_print = time.monotonic()
+        return chain, end, state
+
+    next_start = list(chain_start)
+    if processes == 1:
+        _init_worker(sampler, samples._memmap_fname)
+        state = None
+        while next_start[0] < num_samples:
+            if abort_callback is not None and abort_callback():
+                samples.clear()
+                return None
+            _, _, state = receive_block(_sample_block(next_task(0, next_start[0], state)))
+    else:
+        finished = queue.Queue()
+        with ProcessPool(processes, initializer=_init_worker, initargs=(sampler, samples._memmap_fname)) as pool:
+            def submit(task):
+                pool.apply_async(_sample_block, (task,), callback=finished.put, error_callback=finished.put)
+            for chain in range(processes):
+                submit(next_task(chain, chain_start[chain], None))
+            running = processes
+            while running > 0:
+                try:
+                    result = finished.get(timeout=1)
+                except queue.Empty:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        samples.clear()
+                        return None
+                    continue
+                if isinstance(result, Exception):
+                    pool.terminate()
+                    samples.clear()
+                    raise result
+                chain, end, state = receive_block(result)
+                if end < chain_end[chain]:
+                    submit(next_task(chain, end, state))
+                else:
+                    running -= 1
+    print_func("Sampled "+str(num_samples)+" flux vectors with "+str(processes)+" chains, "
+               +str(retries)+" retries due to numerical problems.")
+    return samples
+
+
+def sample_statistics(samples: FluxSampleMemmap, quantiles=(0.05, 0.5, 0.95),
+                      max_block_bytes: int = 2**28) -> pandas.DataFrame:
+    """
+    Mean, standard deviation and quantiles of the flux samples per reaction. The samples are
+    read in blocks of reactions so that only max_block_bytes of them are in memory at a time.
+    """
+    num_samples = max(1, len(samples))
+    block_size = max(1, max_block_bytes // (8*num_samples))
+    stats = []
+    for i in range(0, len(samples.reac_id), block_size):
+        block = numpy.asarray(samples.fv_mat[:, i:i+block_size])
+        stats.append(numpy.vstack([block.mean(axis=0), block.std(axis=0),
+                                   numpy.quantile(block, quantiles, axis=0)]).T)
+    return pandas.DataFrame(numpy.vstack(stats), index=samples.reac_id,
+                            columns=['mean', 'std'] + [str(q) for q in quantiles])
@@ -1,5 +1,6 @@
 import os
 import numpy
+import scipy.sparse
 from qtpy.QtWidgets import QMessageBox
 
 
@@ -47,6 +48,12 @@ class FluxVectorContainer:
     def __getitem__(self, idx):
         return{self.reac_id[i]: float(self.fv_mat[idx, i]) for i in range(len(self.reac_id)) if self.fv_mat[idx, i] != 0}
 
+    def row_blocks(self, selection=None, block_size=10000):
+        # the (selected) flux vectors in blocks of rows so that a memory map is never read completely
+        for i in range(0, len(self), block_size):
+            block = self.fv_mat[i:i+block_size]
+            yield block if selection is None else block[selection[i:i+block_size]]
+
     def save(self, fname):
         numpy.savez_compressed(fname, fv_mat=self.fv_mat, reac_id=self.reac_id, irreversible=self.irreversible,
                                unbounded=self.unbounded)
@@ -86,3 +93,138 @@ class FluxVectorMemmap(FluxVectorContainer):
 
     def __del__(self):
         del self.fv_mat  # lose the reference to the memmap so that the later implicit deletion of the temporary directory can proceed without problems
+
+
+class FluxSampleMemmap(FluxVectorMemmap):
+    '''
+    Flux samples in a float64 .npy file that is opened as a memory map. The file is stored column
+    by column so that the samples of each reaction can be read contiguously.
+    If num_samples is given a new file with this number of rows is created.
+    '''
+
+    def __init__(self, fname, reac_id, num_samples=None, containing_temp_dir=None):
+        if containing_temp_dir is not None:
+            self._containing_temp_dir = containing_temp_dir
+            self._memmap_fname = os.path.join(containing_temp_dir.name, fname)
+        else:
+            self._memmap_fname = fname
+            self._containing_temp_dir = None
+        if num_samples is None:
+            fv_mat = numpy.load(self._memmap_fname, mmap_mode='r+')
+        else:
+            fv_mat = numpy.lib.format.open_memmap(self._memmap_fname, mode='w+', dtype=numpy.float64,
+                                                  shape=(num_samples, len(reac_id)), fortran_order=True)
+        FluxVectorContainer.__init__(self, fv_mat, reac_id)
+
+    def is_integer_vector_rounded(self, idx, decimals=0):
+        return True # samples are not rescaled for display
+
+
+class KnockoutScreenContainer(FluxVectorContainer):
+    '''
+    The result of a knock-out screen. Each row of fv_mat (a sparse matrix) marks the reactions that
+    are knocked out by a deletion with -1 as for MCS. deleted holds the deleted reactions or genes
+    of each row and values the objective value and the fluxes named in value_names (NaN if infeasible).
+    '''
+
+    def __init__(self, matORfname, reac_id=None, deleted=None, values=None, value_names=None):
+        if type(matORfname) is str:
+            with numpy.load(matORfname) as l:
+                matORfname = scipy.sparse.csr_matrix((-numpy.ones(len(l['ko_indices'])), l['ko_indices'],
+                                                      l['ko_indptr']), shape=(len(l['values']), len(l['reac_id'])))
+                reac_id = l['reac_id'].tolist()
+                deleted = [tuple(d.split('\t')) for d in l['deleted'].tolist()]
+                values = l['values']
+                value_names = l['value_names'].tolist()
+        super().__init__(matORfname, reac_id)
+        self.deleted = deleted
+        self.values = values
+        self.value_names = value_names
+
+    def __getitem__(self, idx):
+        row = self.fv_mat.getrow(idx)
+        return {self.reac_id[i]: float(v) for i, v in zip(row.indices, row.data)}
+
+    def description(self, idx):
+        return ", ".join(self.deleted[idx]) + ": " + ", ".join(n + " " + str(round(float(v), 4))
+                                                               for n, v in zip(self.value_names, self.values[idx]))
+
+    def save(self, fname):
+        numpy.savez_compressed(fname, ko_indices=self.fv_mat.indices, ko_indptr=self.fv_mat.indptr,
+                               reac_id=self.reac_id, deleted=["\t".join(d) for d in self.deleted],
+                               values=self.values, value_names=self.value_names)
+
+    def clear(self):
+        super().clear()
+        self.deleted = []
+        self.values = numpy.zeros((0, 0))
+
+    @staticmethod
+    def is_knockout_screen_file(fname):
+        try:
+            with numpy.load(fname) as l:
+                return 'ko_indices' in l
+        except Exception:
+            return False
+
+
+class DynamicFBAContainer(FluxVectorContainer):
+    '''
+    The flux trajectory of a dynamic FBA: row i of fv_mat holds the fluxes during the time step that
+    starts at times[i]. biomass and concentrations (time points x exchanged metabolites named by the
+    exchange reactions in conc_id) have one more row for the end of the last step.
+    '''
+
+    def __init__(self, matORfname, reac_id=None, times=None, biomass=None, concentrations=None, conc_id=None):
+        if type(matORfname) is str:
+            with numpy.load(matORfname) as l:
+                matORfname = l['fv_mat']
+                reac_id = l['reac_id'].tolist()
+                times = l['times']
+                biomass = l['biomass']
+                concentrations = l['concentrations']
+                conc_id = l['conc_id'].tolist()
+        super().__init__(matORfname, reac_id)
+        self.times = times
+        self.biomass = biomass
+        self.concentrations = concentrations
+        self.conc_id = conc_id
+
+    def is_integer_vector_rounded(self, idx, decimals=0):
+        return True # the fluxes are not rescaled for display
+
+    def description(self, idx):
+        return "t = " + str(round(float(self.times[idx]), 4)) + ", biomass " + str(round(float(self.biomass[idx]), 4))
+
+    def save(self, fname):
+        numpy.savez_compressed(fname, fv_mat=self.fv_mat, reac_id=self.reac_id, irreversible=self.irreversible,
+                               unbounded=self.unbounded, times=self.times, biomass=self.biomass,
+                               concentrations=self.concentrations, conc_id=self.conc_id)
+
+    def clear(self):
+        super().clear()
+        self.times = numpy.zeros(0)
+        self.biomass = numpy.zeros(0)
+        self.concentrations = numpy.zeros((0, 0))
+        self.conc_id = []
+
+    def plot(self):
+        import matplotlib.pyplot as plt
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
+        ax1.plot(self.times, self.biomass)
+        ax1.set_ylabel("biomass [gDW/L]")
+        # only the metabolites that are present at some time
+        for i in numpy.where(numpy.any(self.concentrations > 1e-9, axis=0))[0]:
+            ax2.plot(self.times, self.concentrations[:, i], label=self.conc_id[i])
+        ax2.set_xlabel("time [h]")
+        ax2.set_ylabel("concentration [mmol/L]")
+        ax2.legend(fontsize='small')
+        plt.show()
+
+    @staticmethod
+    def is_dynamic_fba_file(fname):
+        try:
+            with numpy.load(fname) as l:
+                return 'times' in l
+        except Exception:
+            return False
@@ -0,0 +1,495 @@
+"""Flux variability analysis that reuses the information from all LP solutions"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+import hashlib
+import multiprocessing
+import pickle
+
+import numpy
+import pandas
+import cobra
+from cobra.util import ProcessPool
+from cobra.flux_analysis.loopless import find_cyclic_reactions
+from cobra.util.solver import check_solver_status
+from optlang.symbolics import Zero
+
+from cnapy.blocked_reactions import get_blocked_reactions
+from cnapy.loopless import CycleFreeLP
+
+
+class FVAState:
+    """
+    The extreme values of a previous FVA together with the LP solutions that attain them and,
+    where available, the dual solutions of the LPs as certificates of their optimality.
+    After a change of reaction bounds this allows to determine which extreme values are still valid.
+    """
+    # kinds of certificates besides (constant, reaction indices, reduced costs) of a dual solution
+    BOUND_ATTAINED = 'bound' # the reaction is at its own bound in the solution
+    BLOCKED = 'blocked'
+
+    def __init__(self):
+        self.key = None
+        self.lb = numpy.zeros(0)
+        self.ub = numpy.zeros(0)
+        self.reac_index: Dict[str, int] = {}
+        self.solutions: List[Tuple[numpy.ndarray, numpy.ndarray]] = [] # sparse flux vectors
+        # reaction ID -> (value, solution index, certificate)
+        self.extremes: Dict[str, Dict[str, tuple]] = {'max': {}, 'min': {}}
+
+    def valid_extremes(self, key: str, lb: numpy.ndarray, ub: numpy.ndarray, tolerance: float) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the extreme values that are still optimal with the bounds lb, ub. When the bounds
+        were only tightened this holds for all extremes whose solution is still feasible,
+        otherwise the certificate must also still bound the objective by the previous value.
+        """
+        valid = {'max': {}, 'min': {}}
+        if key != self.key:
+            return valid
+        tightened = numpy.all(lb >= self.lb) and numpy.all(ub <= self.ub)
+        not_zero = numpy.where((lb > tolerance) | (ub < -tolerance))[0]
+        feasible = [numpy.all(numpy.isin(not_zero, idx)) and numpy.all(val >= lb[idx] - tolerance)
+                    and numpy.all(val <= ub[idx] + tolerance) for idx, val in self.solutions]
+        for direction, sense in (('max', 1.0), ('min', -1.0)):
+            for r_id, (value, sol, cert) in self.extremes[direction].items():
+                if cert == FVAState.BLOCKED:
+                    is_valid = tightened
+                elif not feasible[sol]:
+                    is_valid = False
+                elif tightened:
+                    is_valid = True
+                elif cert == FVAState.BOUND_ATTAINED:
+                    r_idx = self.reac_index[r_id]
+                    is_valid = sense*((ub[r_idx] if sense > 0 else lb[r_idx]) - value) <= tolerance
+                elif cert is None:
+                    is_valid = False
+                else:
+                    (const, d_idx, d_val) = cert
+                    bound = const + _dual_bound(d_val, lb[d_idx], ub[d_idx], direction)
+                    is_valid = sense*(bound - value) <= tolerance*max(1.0, abs(value))
+                if is_valid:
+                    valid[direction][r_id] = value
+        return valid
+
+    def update(self, key: str, reac_id: List[str], lb: numpy.ndarray, ub: numpy.ndarray, valid, extremes, solutions):
+        """Keeps the valid extremes, adds the new ones and drops the solutions that are no longer referenced."""
+        if key != self.key:
+            self.extremes = {'max': {}, 'min': {}}
+            self.solutions = []
+        old_solutions = self.solutions
+        self.solutions = []
+        sol_map = {}
+        def renumber(sol, solution_list, offset):
+            if sol < 0:
+                return sol
+            if sol + offset not in sol_map:
+                sol_map[sol + offset] = len(self.solutions)
+                self.solutions.append(solution_list[sol])
+            return sol_map[sol + offset]
+        for direction in ('max', 'min'):
+            kept = {}
+            for r_id in valid[direction]:
+                (value, sol, cert) = self.extremes[direction][r_id]
+                kept[r_id] = (value, renumber(sol, old_solutions, 0), cert)
+            for r_id, (value, sol, cert) in extremes[direction].items():
+                kept[r_id] = (value, renumber(sol, solutions, len(old_solutions)), cert)
+            self.extremes[direction] = kept
+        self.key = key
+        self.reac_index = {r_id: i for i, r_id in enumerate(reac_id)}
+        self.lb = lb
+        self.ub = ub
+
+
+def _network_key(model: cobra.Model) -> str:
+    """Hash of everything except the reaction bounds that determines the FVA result."""
+    reaction_vars = set(model.reactions.list_attr("id")) | set(r.reverse_id for r in model.reactions)
+    network = [(r.id, sorted((m.id, float(c)) for m, c in r.metabolites.items())) for r in model.reactions]
+    constraints = [(c.name, str(c.expression), c.lb, c.ub) for c in model.constraints
+                   if c.name not in model.metabolites]
+    variables = [(v.name, v.lb, v.ub) for v in model.variables if v.name not in reaction_vars]
+    return hashlib.md5(pickle.dumps((network, constraints, variables, model.tolerance))).hexdigest()
+
+
+def _dual_bound(coefficients: numpy.ndarray, lb: numpy.ndarray, ub: numpy.ndarray, direction: str) -> float:
+    """Bound of coefficients @ x over lb <= x <= ub; an upper bound for 'max', a lower bound for 'min'."""
+    if direction == 'min':
+        lb, ub = ub, lb
+    with numpy.errstate(invalid='ignore'):
+        return numpy.sum(numpy.where(coefficients > 0, coefficients*ub, numpy.where(coefficients < 0, coefficients*lb, 0.0)))
+
+
+def _init_worker(model: cobra.Model, extreme_callback=None, abort_callback=None):
+    global _model
+    global _extreme_callback
+    global _abort_callback
+
+    _model = model
+    # the callbacks are only used when the steps run in the calling process
+    _extreme_callback = extreme_callback
+    _abort_callback = abort_callback
+
+
+def _fva_bounds_step(args) -> Tuple[Dict[str, tuple], Dict[str, tuple], List[Tuple[numpy.ndarray, numpy.ndarray]], int]:
+    """
+    Maximizes and minimizes the flux of the pending reactions. After each LP all pending reactions
+    whose flux is at its upper (lower) bound are resolved without solving an LP for them.
+    Two initial LPs that maximize/minimize the sum of the pending fluxes drive many reactions
+    to their bounds. Then the reactions are solved one after the other in network order so that
+    the range of each reaction is complete as early as possible.
+    In loopless mode cyclic holds the reactions that can be part of a loop in the 'max' and 'min'
+    direction. Only for these the LP optimum may not be loopless and their bounds are only taken
+    from solutions without loops, see _loopless_extreme.
+    Returns the extremes as (value, solution index, certificate) and the sparse LP solutions.
+    """
+    (max_ids, min_ids, tolerance, cyclic) = args
+    todo = {'max': dict.fromkeys(max_ids), 'min': dict.fromkeys(min_ids)}
+    result = {'max': {}, 'min': {}}
+    reac_id = list(dict.fromkeys(max_ids + min_ids))
+    reac_pos = {r_id: i for i, r_id in enumerate(reac_id)}
+    reactions = {r_id: _model.reactions.get_by_id(r_id) for r_id in reac_id}
+    step_idx = numpy.array([_model.reactions.index(r_id) for r_id in reac_id], dtype=int)
+    solutions = []
+    num_lp = 0
+
+    # the primal values of all variables are fetched at once (without the overhead of building the
+    # name dictionary of primal_values) and the bounds are checked vectorized
+    var_index = {name: i for i, name in enumerate(_model.solver.variables.keys())}
+    fwd_idx = numpy.array([var_index[r.id] for r in _model.reactions], dtype=int)
+    rev_idx = numpy.array([var_index[r.reverse_id] for r in _model.reactions], dtype=int)
+    reac_lb = numpy.array(_model.reactions.list_attr("lower_bound"))
+    reac_ub = numpy.array(_model.reactions.list_attr("upper_bound"))
+    ub = reac_ub[step_idx]
+    lb = reac_lb[step_idx]
+    pending = {'max': numpy.isin(reac_id, max_ids), 'min': numpy.isin(reac_id, min_ids)}
+    # bounds of the rows and the other variables for the dual certificates
+    row_lb = numpy.array([-numpy.inf if c.lb is None else c.lb for c in _model.solver.constraints])
+    row_ub = numpy.array([numpy.inf if c.ub is None else c.ub for c in _model.solver.constraints])
+    other_vars = numpy.setdiff1d(numpy.arange(len(var_index)), numpy.concatenate((fwd_idx, rev_idx)))
+    var_lb = numpy.array([-numpy.inf if v.lb is None else v.lb for v in _model.solver.variables])[other_vars]
+    var_ub = numpy.array([numpy.inf if v.ub is None else v.ub for v in _model.solver.variables])[other_vars]
+    if cyclic is not None:
+        cycle_free = CycleFreeLP(_model)
+        cyclic = {direction: numpy.isin(reac_id, list(cyclic[direction])) for direction in ('max', 'min')}
+
+    def set_result(direction, r_id, extreme):
+        result[direction][r_id] = extreme
+        del todo[direction][r_id]
+        if _extreme_callback is not None:
+            _extreme_callback(direction, r_id, extreme[0])
+
+    def inspect_solution(flux=None, loop_free=False):
+        if flux is None:
+            primal = numpy.fromiter(_model.solver._get_primal_values(), dtype=float, count=len(var_index))
+            flux = primal[fwd_idx] - primal[rev_idx]
+        sol = len(solutions)
+        nz = numpy.nonzero(flux)[0]
+        solutions.append((nz, flux[nz]))
+        flux = flux[step_idx]
+        for direction, attained, bound in (('max', flux >= ub - tolerance, ub), ('min', flux <= lb + tolerance, lb)):
+            if cyclic is not None and not loop_free:
+                # the flux of a reaction that cannot be in a loop does not change when the loops are removed
+                attained &= ~cyclic[direction]
+            for i in numpy.where(pending[direction] & attained)[0]:
+                set_result(direction, reac_id[i], (bound[i], sol, FVAState.BOUND_ATTAINED))
+            pending[direction] &= ~attained
+        return sol
+
+    def certificate(direction, value):
+        # the duals are only kept if they reproduce the optimal value (sign conventions differ between solvers)
+        y = numpy.fromiter(_model.solver._get_shadow_prices(), dtype=float, count=len(row_lb))
+        d = numpy.fromiter(_model.solver._get_reduced_costs(), dtype=float, count=len(var_index))
+        for sign in (1.0, -1.0):
+            const = _dual_bound(sign*y, row_lb, row_ub, direction) + \
+                    _dual_bound(sign*d[other_vars], var_lb, var_ub, direction)
+            d_reac = sign*d[fwd_idx]
+            d_idx = numpy.nonzero(d_reac)[0]
+            bound = const + _dual_bound(d_reac[d_idx], reac_lb[d_idx], reac_ub[d_idx], direction)
+            if abs(bound - value) <= tolerance*max(1.0, abs(value)):
+                return (const, d_idx, d_reac[d_idx])
+        return None
+
+    def set_objective(r_ids, coefficient):
+        _model.solver.objective.set_linear_coefficients(
+            {v: c for r_id in r_ids for (v, c) in ((reactions[r_id].forward_variable, coefficient),
+                                                   (reactions[r_id].reverse_variable, -coefficient))})
+
+    for direction in ('max', 'min'):
+        if len(todo[direction]) == 0:
+            continue
+        _model.solver.objective.direction = direction
+        r_ids = list(todo[direction])
+        set_objective(r_ids, 1.0)
+        _model.slim_optimize()
+        num_lp += 1
+        if _model.solver.status == 'optimal':
+            inspect_solution()
+        set_objective(r_ids, 0.0)
+
+    for r_id in reac_id:
+        for direction in ('max', 'min'):
+            if r_id not in todo[direction]:
+                continue
+            if _abort_callback is not None and _abort_callback():
+                return result['max'], result['min'], solutions, num_lp
+            _model.solver.objective.direction = direction
+            set_objective([r_id], 1.0)
+            _model.slim_optimize()
+            num_lp += 1
+            check_solver_status(_model.solver.status)
+            value = _model.solver.objective.value
+            pending[direction][reac_pos[r_id]] = False
+            if cyclic is not None and cyclic[direction][reac_pos[r_id]]:
+                flux = cycle_free.fluxes()
+                set_objective([r_id], 0.0)
+                (value, flux, step_num_lp) = _loopless_extreme(cycle_free, reactions[r_id], direction, value,
+                                                                flux, tolerance)
+                num_lp += step_num_lp
+                # the loopless solution need not attain the extreme, therefore no certificate
+                set_result(direction, r_id, (value, inspect_solution(flux, loop_free=True), None))
+            else:
+                cert = certificate(direction, value)
+                set_result(direction, r_id, (value, inspect_solution(), cert))
+                set_objective([r_id], 0.0)
+
+    return result['max'], result['min'], solutions, num_lp
+
+
+def _loopless_extreme(cycle_free: CycleFreeLP, reaction: cobra.Reaction, direction: str, value: float,
+                      flux: numpy.ndarray, tolerance: float) -> Tuple[float, numpy.ndarray, int]:
+    """
+    Takes the optimal solution flux for the flux of the reaction in the given direction and
+    returns the loopless extreme, a loopless flux vector that attains it and the number of LPs
+    that were solved. As long as the optimum does not persist when the loops are removed it is
+    recomputed without the reactions that only carry flux in loops through this reaction (as in
+    the loopless FVA of COBRApy). When no such reactions are left, the flux of the loopless
+    vector is returned, which may then fall short of the loopless extreme.
+    The objective of the model must already be zero again.
+    """
+    model = cycle_free.model
+    r_idx = model.reactions.index(reaction)
+    objective = model.solver.objective
+    blocked = {} # reaction index -> original bounds
+    num_lp = 0
+    try:
+        while True:
+            loopless_flux = cycle_free.remove_loops(flux)
+            num_lp += 1
+            if loopless_flux is None:
+                raise cobra.exceptions.OptimizationError("Could not remove the loops from the solution for "
+                                                         +reaction.id)
+            if abs(loopless_flux[r_idx] - value) < tolerance:
+                return value, loopless_flux, num_lp
+            almost_loopless_flux = cycle_free.remove_loops(flux, fixed=[r_idx])
+            num_lp += 1
+            if almost_loopless_flux is None:
+                break
+            in_loops = (numpy.abs(loopless_flux) < tolerance) & (numpy.abs(almost_loopless_flux) > tolerance)
+            in_loops[r_idx] = False
+            in_loops = [i for i in numpy.where(in_loops)[0] if i not in blocked]
+            if len(in_loops) == 0:
+                break
+            # the loopless flux does not use these reactions, hence the LP stays feasible
+            for i in in_loops:
+                r = model.reactions[i]
+                blocked[i] = r.bounds
+                r.bounds = (max(0, r.lower_bound), min(0, r.upper_bound))
+            objective.direction = direction
+            objective.set_linear_coefficients({reaction.forward_variable: 1.0, reaction.reverse_variable: -1.0})
+            model.slim_optimize()
+            num_lp += 1
+            check_solver_status(model.solver.status)
+            value = objective.value
+            flux = cycle_free.fluxes()
+            objective.set_linear_coefficients({reaction.forward_variable: 0.0, reaction.reverse_variable: 0.0})
+    finally:
+        objective.set_linear_coefficients({reaction.forward_variable: 0.0, reaction.reverse_variable: 0.0})
+        for i, b in blocked.items():
+            model.reactions[i].bounds = b
+    return loopless_flux[r_idx], loopless_flux, num_lp
+
+
+def fast_flux_variability_analysis(model: cobra.Model, reaction_list: List[str] = None, fraction_of_optimum=0.0,
+                                   processes: int = None, print_func=print, state: FVAState = None,
+                                   loopless: bool = False, result_callback=None,
+                                   abort_callback=None) -> pandas.DataFrame:
+    """
+    Same result as the COBRApy FVA but usually with much fewer LPs because each LP solution is
+    checked for other reactions that have already attained their upper or lower bound.
+    Blocked reactions are identified first because each of them would otherwise need two LPs;
+    this is skipped when only few reactions are analyzed.
+    With several processes the reactions are split into contiguous chunks.
+    If a state is given, the extreme values from the previous FVA that are still valid are reused
+    (e.g. after changing the bounds of a few reactions) and the state is updated with the result.
+    With loopless the ranges that can be attained without internal loops are computed with LPs only;
+    the state is then not used because the extremes come without certificates.
+    result_callback(reaction ID, minimum, maximum) is called as soon as the range of a reaction is known.
+    Returns None if the computation was aborted.
+    """
+    if loopless:
+        state = None
+    if processes is None:
+        processes = cobra.Configuration().processes
+    if reaction_list is None:
+        reaction_list = model.reactions.list_attr("id")
+    fva_result = pandas.DataFrame({"minimum": numpy.zeros(len(reaction_list)),
+                                   "maximum": numpy.zeros(len(reaction_list))}, index=reaction_list)
+    tolerance = model.tolerance
+    columns = {'max': "maximum", 'min': "minimum"}
+    other_direction = {'max': 'min', 'min': 'max'}
+    known = {'max': {}, 'min': {}}
+    def report(direction, r_id, value):
+        fva_result.at[r_id, columns[direction]] = value
+        known[direction][r_id] = value
+        if result_callback is not None and r_id in known[other_direction[direction]]:
+            result_callback(r_id, known['min'][r_id], known['max'][r_id])
+
+    with model:
+        if fraction_of_optimum > 0 or model.solver.objective.expression != Zero:
+            model.slim_optimize(error_value=None, message="There is no optimal solution for the chosen objective!")
+            if model.solver.objective.direction == "max":
+                fva_old_objective = model.problem.Variable("fva_old_objective",
+                                        lb=fraction_of_optimum * model.solver.objective.value)
+            else:
+                fva_old_objective = model.problem.Variable("fva_old_objective",
+                                        ub=fraction_of_optimum * model.solver.objective.value)
+            fva_old_obj_constraint = model.problem.Constraint(model.solver.objective.expression - fva_old_objective,
+                                        lb=0, ub=0, name="fva_old_objective_constraint")
+            model.add_cons_vars([fva_old_objective, fva_old_obj_constraint])
+        model.objective = Zero
+
+        reac_id = model.reactions.list_attr("id")
+        lb = numpy.array(model.reactions.list_attr("lower_bound"))
+        ub = numpy.array(model.reactions.list_attr("upper_bound"))
+        if state is not None:
+            key = _network_key(model)
+            valid = state.valid_extremes(key, lb, ub, tolerance)
+        else:
+            valid = {'max': {}, 'min': {}}
+
+        # fixed and still valid extremes do not need an LP
+        todo = {'max': [], 'min': []}
+        num_reused = 0
+        for r_id in reaction_list:
+            r = model.reactions.get_by_id(r_id)
+            for direction in ('max', 'min'):
+                if r.lower_bound == r.upper_bound:
+                    report(direction, r_id, r.lower_bound)
+                elif r_id in valid[direction]:
+                    report(direction, r_id, valid[direction][r_id])
+                    num_reused += 1
+                else:
+                    todo[direction].append(r_id)
+        if state is not None:
+            print_func("Reusing "+str(num_reused)+" extreme values from the previous FVA")
+
+        # blocked reactions do not need an LP either, they are only determined anew when this may save LPs
+        extremes = {'max': {}, 'min': {}}
+        previous = state.extremes if state is not None and state.key == key else {'max': {}, 'min': {}}
+        if 2*len(set(todo['max']).union(todo['min'])) >= len(reac_id) and \
+            any(previous[direction].get(r_id, (0, 0, FVAState.BLOCKED))[2] == FVAState.BLOCKED
+                for direction in ('max', 'min') for r_id in todo[direction]):
+            blocked = set(get_blocked_reactions(model, print_func=print_func))
+            for direction in ('max', 'min'):
+                for r_id in todo[direction]:
+                    if r_id in blocked:
+                        extremes[direction][r_id] = (0.0, -1, FVAState.BLOCKED)
+                        report(direction, r_id, 0.0)
+                todo[direction] = [r_id for r_id in todo[direction] if r_id not in blocked]
+
+        solutions = []
+        num_lp = 0
+        aborted = False
+        pending = list(dict.fromkeys(todo['max'] + todo['min']))
+        if len(pending) > 0:
+            processes = max(1, min(processes, len(pending)))
+            # smaller chunks let the results of the pool arrive earlier
+            num_chunks = processes if result_callback is None or processes == 1 else min(4*processes, len(pending))
+            max_ids = set(todo['max'])
+            min_ids = set(todo['min'])
+            cyclic = None
+            if loopless:
+                cyclic = {'max': set(), 'min': set()}
+                for r_id, (negative, positive) in zip(*find_cyclic_reactions(model)):
+                    if positive:
+                        cyclic['max'].add(r_id)
+                    if negative:
+                        cyclic['min'].add(r_id)
+                print_func(str(len(cyclic['max'] | cyclic['min']))+" reactions can be part of a loop")
+            steps = [([r_id for r_id in chunk if r_id in max_ids], [r_id for r_id in chunk if r_id in min_ids],
+                      tolerance, cyclic) for chunk in numpy.array_split(pending, num_chunks)]
+            def collect(step_result):
+                nonlocal num_lp, solutions
+                (maximum, minimum, step_solutions, step_num_lp) = step_result
+                for direction, step_extremes in (('max', maximum), ('min', minimum)):
+                    for r_id, (value, sol, cert) in step_extremes.items():
+                        extremes[direction][r_id] = (value, sol + len(solutions), cert)
+                        if result_callback is None or processes > 1: # otherwise already reported
+                            report(direction, r_id, value)
+                solutions += step_solutions
+                num_lp += step_num_lp
+            if processes > 1:
+                with ProcessPool(processes, initializer=_init_worker, initargs=(model,)) as pool:
+                    results = pool.imap_unordered(_fva_bounds_step, steps)
+                    while True:
+                        try:
+                            collect(results.next(timeout=1))
+                        except multiprocessing.TimeoutError:
+                            if abort_callback is not None and abort_callback():
+                                pool.terminate()
+                                aborted = True
+                                break
+                        except StopIteration:
+                            break
+            else:
+                _init_worker(model, extreme_callback=report if result_callback is not None else None,
+                             abort_callback=abort_callback)
+                for step in steps:
+                    collect(_fva_bounds_step(step))
+                aborted = abort_callback is not None and abort_callback()
+        if state is not None:
+            state.update(key, reac_id, lb, ub, valid, extremes, solutions)
+    print_func("FVA of "+str(len(reaction_list))+" reactions required "+str(num_lp)+" LPs")
+    if aborted:
+        return None
+    return fva_result
+
+
+def flux_variability_analysis(model: cobra.Model, fraction_of_optimum=0.0, processes: int = None,
+                              results_cache_dir: Path = None, fva_hash=None, print_func=print,
+                              state: FVAState = None, reaction_list: List[str] = None, loopless: bool = False,
+                              result_callback=None, abort_callback=None) -> pandas.DataFrame:
+    """
+    Runs fast_flux_variability_analysis and stores the result in results_cache_dir under the fva_hash.
+    The cache is only used when all reactions are analyzed. All bounds in the model must be finite.
+    """
+    model_stoichiometry_hash_object = model.stoichiometry_hash_object
+    model._stoichiometry_hash_object = None # in case model needs to be pickled
+    fva_result = None
+    if reaction_list is not None:
+        results_cache_dir = None
+    if results_cache_dir is not None:
+        fva_hash.update(pickle.dumps((loopless, fraction_of_optimum, model.tolerance)))
+        fva_hash.update(pickle.dumps(model.reactions.list_attr("objective_coefficient")))
+        fva_hash.update(model.objective_direction.encode())
+        file_path = results_cache_dir / (model.id+"_FVA_"+fva_hash.hexdigest())
+        if Path.exists(file_path):
+            try:
+                fva_result = pandas.read_pickle(file_path)
+                print_func("Loaded FVA result from "+str(file_path))
+            except Exception:
+                print_func("Loading FVA result from "+str(file_path)+" failed, running FVA.")
+        else:
+            print_func("No cached result available, running FVA...")
+    if fva_result is None:
+        fva_result = fast_flux_variability_analysis(model, reaction_list=reaction_list,
+                                fraction_of_optimum=fraction_of_optimum, processes=processes, print_func=print_func,
+                                state=state, loopless=loopless, result_callback=result_callback,
+                                abort_callback=abort_callback)
+        if results_cache_dir is not None and fva_result is not None:
+            try:
+                fva_result.to_pickle(file_path)
+                print_func("Saved FVA result to "+str(file_path))
+            except Exception:
+                print_func("Failed to write FVA result to "+str(file_path))
+    model.restore_stoichiometry_hash_object(model_stoichiometry_hash_object)
+    return fva_result
@@ -6,11 +6,12 @@ import cobra
 from qtconsole.inprocess import QtInProcessKernelManager
 from qtconsole.rich_jupyter_widget import RichJupyterWidget
 from qtpy.QtCore import Qt, Signal, Slot, QSignalBlocker
-from qtpy.QtGui import QColor, QBrush
+from qtpy.QtGui import QColor
 from qtpy.QtWidgets import (QCheckBox, QDialog, QHBoxLayout, QLabel, QLineEdit, QPushButton, QSplitter,
                             QTabWidget, QVBoxLayout, QWidget, QAction, QApplication, QComboBox, QFrame)
 
 from cnapy.appdata import AppData, CnaMap, ModelItemType, parse_scenario
+from cnapy.flux_sampling import sample_statistics
 from cnapy.gui_elements.map_view import MapView
 from cnapy.gui_elements.escher_map_view import EscherMapView
 from cnapy.gui_elements.metabolite_list import MetaboliteList
@@ -164,6 +165,7 @@ class CentralWidget(QWidget):
         self.mode_navigator.changedCurrentMode.connect(self.update_mode)
         self.mode_navigator.modeNavigatorClosed.connect(self.update)
         self.mode_navigator.reaction_participation_button.clicked.connect(self.reaction_participation)
+        self.mode_navigator.sample_ranges_button.clicked.connect(self.sample_ranges)
 
         self.mode_normalization_reaction = ""
 
@@ -183,6 +185,7 @@ class CentralWidget(QWidget):
 
     def handle_changed_reaction(self, previous_id: str, reaction: cobra.Reaction):
         self.parent.unsaved_changes()
+        self.appdata.project.flux_coupling = None # refers to the previous network
         reaction_has_box = False
         escher_map_present = False
         for mmap in self.appdata.project.maps:
@@ -206,6 +209,7 @@ class CentralWidget(QWidget):
         self.remove_top_item_history_entry()
 
         self.parent.unsaved_changes()
+        self.appdata.project.flux_coupling = None
         for mmap in self.appdata.project.maps:
             if reaction.id in self.appdata.project.maps[mmap]["boxes"].keys():
                 self.appdata.project.maps[mmap]["boxes"].pop(reaction.id)
@@ -218,6 +222,7 @@ class CentralWidget(QWidget):
     @Slot(cobra.Metabolite, object, str)
     def handle_changed_metabolite(self, metabolite: cobra.Metabolite, affected_reactions, previous_id: str):
         self.parent.unsaved_changes()
+        self.appdata.project.flux_coupling = None
         for reaction in affected_reactions: # only updates CNApy maps
             self.update_reaction_on_maps(reaction.id, reaction.id)
         for idx in range(0, self.map_tabs.count()):
@@ -481,25 +486,15 @@ class CentralWidget(QWidget):
                     else:
                         view.reaction_boxes[key].set_color(QColor.fromRgb(255, 255, 255))
                 if self.appdata.window.sd_sols and self.appdata.window.sd_sols.__weakref__: # if dialog exists
-                    self.mode_navigator.current
-                    for i in range(self.appdata.window.sd_sols.sd_table.rowCount()):
-                        if self.mode_navigator.current == int(self.appdata.window.sd_sols.sd_table.item(i,0).text())-1:
-                            self.appdata.window.sd_sols.sd_table.item(i,0).setBackground(QBrush(QColor(230,230,230)))
-                            self.appdata.window.sd_sols.sd_table.item(i,1).setBackground(QBrush(QColor(230,230,230)))
-                            if self.appdata.window.sd_sols.sd_table.columnCount() == 3:
-                                self.appdata.window.sd_sols.sd_table.item(i,2).setBackground(QBrush(QColor(230,230,230)))
-                        else:
-                            self.appdata.window.sd_sols.sd_table.item(i,0).setBackground(QBrush(QColor(255, 255, 255)))
-                            self.appdata.window.sd_sols.sd_table.item(i,1).setBackground(QBrush(QColor(255, 255, 255)))
-                            if self.appdata.window.sd_sols.sd_table.columnCount() == 3:
-                                self.appdata.window.sd_sols.sd_table.item(i,2).setBackground(QBrush(QColor(255, 255, 255)))
+                    self.appdata.window.sd_sols.sd_table_model.set_current(self.mode_navigator.current)
         self.mode_navigator.current_flux_values = self.appdata.project.comp_values.copy()
 
     def reaction_participation(self):
         self.appdata.project.comp_values.clear()
         self.parent.clear_status_bar()
         if self.appdata.window.centralWidget().mode_navigator.mode_type <=1:
-            relative_participation = numpy.sum(self.appdata.project.modes.fv_mat[self.mode_navigator.selection, :] != 0, axis=0)/self.mode_navigator.num_selected
+            relative_participation = sum(numpy.sum(block != 0, axis=0) for block in
+                self.appdata.project.modes.row_blocks(self.mode_navigator.selection))/self.mode_navigator.num_selected
             if isinstance(relative_participation, numpy.matrix): # numpy.sum returns a matrix with one row when fv_mat is scipy.sparse
                 relative_participation = relative_participation.A1 # flatten into 1D array
             self.appdata.project.comp_values = {r: (relative_participation[i], relative_participation[i]) for i,r in enumerate(self.appdata.project.modes.reac_id)}
@@ -519,6 +514,14 @@ class CentralWidget(QWidget):
         self.update()
         self.parent.set_heaton()
 
+    def sample_ranges(self):
+        self.appdata.project.comp_values.clear()
+        self.parent.clear_status_bar()
+        stats = sample_statistics(self.appdata.project.modes, quantiles=(0.05, 0.95))
+        self.appdata.project.comp_values = {r: (stats.iat[i, 2], stats.iat[i, 3]) for i, r in enumerate(stats.index)}
+        self.appdata.project.comp_values_type = 1
+        self.update()
+
     def update(self, rebuild_all_tabs=False):
         # use rebuild_all_tabs=True to rebuild all tabs when the model changes
         if len(self.appdata.project.modes) == 0:
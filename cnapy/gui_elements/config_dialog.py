@@ -140,6 +140,40 @@ class ConfigDialog(QDialog):
         h.addWidget(self.results_cache_directory)
         self.layout.addItem(h)
 
+        h = QHBoxLayout()
+        label = QLabel("Scratch directory (EFMtool, flux samples):")
+        h.addWidget(label)
+        self.efmtool_scratch_directory = QLineEdit(self.appdata.efmtool_scratch_dir)
+        self.efmtool_scratch_directory.setPlaceholderText("system temporary directory")
+        h.addWidget(self.efmtool_scratch_directory)
+        self.choose_efmtool_scratch = QPushButton("...")
+        self.choose_efmtool_scratch.setMaximumWidth(30)
+        h.addWidget(self.choose_efmtool_scratch)
+        self.layout.addItem(h)
+
+        h = QHBoxLayout()
+        label = QLabel("Save the output of EFM and strain design computations in:")
+        h.addWidget(label)
+        self.computation_log_directory = QLineEdit(self.appdata.computation_log_dir)
+        self.computation_log_directory.setPlaceholderText("not saved")
+        h.addWidget(self.computation_log_directory)
+        self.choose_computation_log = QPushButton("...")
+        self.choose_computation_log.setMaximumWidth(30)
+        h.addWidget(self.choose_computation_log)
+        self.layout.addItem(h)
+
+        h = QHBoxLayout()
+        self.use_sd_checkpoints = QCheckBox("Save checkpoints of strain design computations in:")
+        self.use_sd_checkpoints.setChecked(self.appdata.use_sd_checkpoints)
+        h.addWidget(self.use_sd_checkpoints)
+        self.sd_checkpoint_directory = QLineEdit(self.appdata.sd_checkpoint_dir)
+        self.sd_checkpoint_directory.setPlaceholderText(self.appdata.default_sd_checkpoint_dir)
+        h.addWidget(self.sd_checkpoint_directory)
+        self.choose_sd_checkpoint = QPushButton("...")
+        self.choose_sd_checkpoint.setMaximumWidth(30)
+        h.addWidget(self.choose_sd_checkpoint)
+        self.layout.addItem(h)
+
         self.dark_mode = QCheckBox("Dark mode (restart to fully apply changes)")
         self.dark_mode.setChecked(self.appdata.is_in_dark_mode)
         self.layout.addWidget(self.dark_mode)
@@ -163,6 +197,9 @@ class ConfigDialog(QDialog):
         self.spec2_color_btn.clicked.connect(self.choose_spec2_color)
         self.default_color_btn.clicked.connect(self.choose_default_color)
         self.results_cache_directory.clicked.connect(self.choose_results_cache_directory)
+        self.choose_efmtool_scratch.clicked.connect(self.choose_efmtool_scratch_directory)
+        self.choose_computation_log.clicked.connect(self.choose_computation_log_directory)
+        self.choose_sd_checkpoint.clicked.connect(self.choose_sd_checkpoint_directory)
         self.button.clicked.connect(self.apply)
 
         if first_start:
@@ -183,6 +220,27 @@ class ConfigDialog(QDialog):
             return
         self.results_cache_directory.setText(str(directory))
 
+    def choose_efmtool_scratch_directory(self):
+        dialog = QFileDialog(self, directory=self.efmtool_scratch_directory.text())
+        directory: str = dialog.getExistingDirectory()
+        if not directory or len(directory) == 0 or not os.path.exists(directory):
+            return
+        self.efmtool_scratch_directory.setText(directory)
+
+    def choose_computation_log_directory(self):
+        dialog = QFileDialog(self, directory=self.computation_log_directory.text())
+        directory: str = dialog.getExistingDirectory()
+        if not directory or len(directory) == 0 or not os.path.exists(directory):
+            return
+        self.computation_log_directory.setText(directory)
+
+    def choose_sd_checkpoint_directory(self):
+        dialog = QFileDialog(self, directory=self.sd_checkpoint_directory.text())
+        directory: str = dialog.getExistingDirectory()
+        if not directory or len(directory) == 0 or not os.path.exists(directory):
+            return
+        self.sd_checkpoint_directory.setText(directory)
+
     def choose_scen_color(self):
         palette = self.scen_color_btn.palette()
         initial = palette.color(QPalette.Button)
@@ -272,6 +330,16 @@ class ConfigDialog(QDialog):
         if not self.appdata.results_cache_dir.exists():
             self.use_results_cache.setChecked(False)
         self.appdata.use_results_cache = self.use_results_cache.isChecked()
+        if not os.path.isdir(self.efmtool_scratch_directory.text()):
+            self.efmtool_scratch_directory.setText("")
+        self.appdata.efmtool_scratch_dir = self.efmtool_scratch_directory.text()
+        if not os.path.isdir(self.computation_log_directory.text()):
+            self.computation_log_directory.setText("")
+        self.appdata.computation_log_dir = self.computation_log_directory.text()
+        if not os.path.isdir(self.sd_checkpoint_directory.text()):
+            self.sd_checkpoint_directory.setText("")
+        self.appdata.sd_checkpoint_dir = self.sd_checkpoint_directory.text()
+        self.appdata.use_sd_checkpoints = self.use_sd_checkpoints.isChecked()
 
         self.appdata.is_in_dark_mode = self.dark_mode.isChecked()
 
@@ -0,0 +1,192 @@
+"""The cnapy dynamic FBA dialog"""
+from qtpy.QtCore import Qt, QThread, Signal, Slot
+from qtpy.QtWidgets import (QDialog, QGridLayout, QHBoxLayout, QHeaderView, QLabel, QLineEdit, QMessageBox,
+                            QProgressBar, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QTextEdit)
+
+from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
+from cnapy.dynamic_fba import dynamic_fba
+import cnapy.utils as utils
+from cnapy.utils import QComplReceivLineEdit
+
+
+class DynamicFBADialog(QDialog):
+    """A dialog to simulate a batch culture with dynamic FBA in the current scenario"""
+
+    def __init__(self, appdata: AppData, central_widget):
+        QDialog.__init__(self)
+        self.setWindowTitle("Dynamic FBA")
+
+        self.appdata = appdata
+        self.central_widget = central_widget
+        model = self.appdata.project.cobra_py_model
+        self.reac_ids = model.reactions.list_attr("id")
+
+        self.layout = QVBoxLayout()
+        grid = QGridLayout()
+        grid.addWidget(QLabel("Biomass reaction"), 0, 0)
+        self.biomass = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        objective_reactions = [r.id for r in model.reactions if r.objective_coefficient != 0]
+        if len(objective_reactions) == 1:
+            self.biomass.setText(objective_reactions[0])
+        grid.addWidget(self.biomass, 0, 1)
+        grid.addWidget(QLabel("Initial biomass [gDW/L]"), 1, 0)
+        self.initial_biomass = QLineEdit("0.01")
+        grid.addWidget(self.initial_biomass, 1, 1)
+        grid.addWidget(QLabel("Duration [h]"), 2, 0)
+        self.duration = QLineEdit("10")
+        grid.addWidget(self.duration, 2, 1)
+        grid.addWidget(QLabel("Time steps"), 3, 0)
+        self.num_steps = QLineEdit("1000")
+        grid.addWidget(self.num_steps, 3, 1)
+        self.layout.addItem(grid)
+
+        self.layout.addWidget(QLabel("Substrates (exchange reactions in export direction)"))
+        self.substrates = QTableWidget(0, 4)
+        self.substrates.setHorizontalHeaderLabels(["Exchange reaction", "Initial conc. [mmol/L]",
+                                                   "Vmax [mmol/gDW/h]", "Km [mmol/L]"])
+        self.substrates.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.layout.addWidget(self.substrates)
+        l1 = QHBoxLayout()
+        self.add_substrate = QPushButton("Add substrate")
+        self.remove_substrate = QPushButton("Remove substrate")
+        l1.addWidget(self.add_substrate)
+        l1.addWidget(self.remove_substrate)
+        self.layout.addItem(l1)
+
+        self.text_field = QTextEdit("*** Dynamic FBA output ***")
+        self.text_field.setReadOnly(True)
+        self.text_field.setMaximumHeight(100)
+        self.layout.addWidget(self.text_field)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+
+        self.setLayout(self.layout)
+
+        self.add_substrate.clicked.connect(self.add_substrate_row)
+        self.remove_substrate.clicked.connect(self.remove_substrate_row)
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+
+        self.add_substrate_row()
+
+    def add_substrate_row(self):
+        row = self.substrates.rowCount()
+        self.substrates.insertRow(row)
+        self.substrates.setCellWidget(row, 0, QComplReceivLineEdit(self, self.reac_ids, check=False))
+        for column, value in ((1, "10"), (2, "10"), (3, "0.5")):
+            self.substrates.setItem(row, column, QTableWidgetItem(value))
+
+    def remove_substrate_row(self):
+        row = self.substrates.currentRow()
+        if row < 0:
+            row = self.substrates.rowCount() - 1
+        if row >= 0:
+            self.substrates.removeRow(row)
+
+    def compute(self):
+        try:
+            biomass = self.biomass.text().strip()
+            if biomass not in self.reac_ids:
+                raise ValueError("Unknown biomass reaction: "+biomass)
+            substrates = {}
+            for row in range(self.substrates.rowCount()):
+                reaction = self.substrates.cellWidget(row, 0).text().strip()
+                if reaction not in self.reac_ids:
+                    raise ValueError("Unknown substrate exchange reaction: "+reaction)
+                if not self.appdata.project.cobra_py_model.reactions.get_by_id(reaction).boundary:
+                    raise ValueError(reaction+" is not an exchange reaction.")
+                substrates[reaction] = tuple(float(self.substrates.item(row, column).text()) for column in (1, 2, 3))
+            initial_biomass = float(self.initial_biomass.text())
+            duration = float(self.duration.text())
+            num_steps = int(self.num_steps.text())
+            if num_steps < 1 or duration <= 0:
+                raise ValueError("Duration and number of time steps must be positive.")
+        except Exception as e:
+            QMessageBox.warning(self, 'Invalid input', str(e))
+            return
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            model = model.copy() # the simulation runs in the background
+        self.setCursor(Qt.BusyCursor)
+        self.progress_bar.setMaximum(num_steps)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.simulation = DynamicFBAThread(model, biomass, substrates, initial_biomass, duration, num_steps)
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.simulation.activate_abort)
+        self.rejected.connect(self.simulation.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.simulation.send_progress_text.connect(self.receive_progress_text)
+        self.simulation.send_progress.connect(self.progress_bar.setValue)
+        self.simulation.finished_computation.connect(self.conclude_computation)
+        self.simulation.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.simulation.abort:
+            self.accept()
+        elif self.simulation.result is None:
+            self.button.hide()
+            self.cancel.show()
+            if self.simulation.exception is not None:
+                utils.show_unknown_error_box(self.simulation.exception)
+        elif len(self.simulation.result) == 0:
+            self.button.hide()
+            self.cancel.show()
+            QMessageBox.information(self, 'No time course', 'The first time step is already infeasible.')
+        else:
+            self.accept()
+            self.appdata.project.modes.clear()
+            self.appdata.project.modes = self.simulation.result
+            self.central_widget.mode_navigator.current = 0
+            self.central_widget.mode_navigator.scenario = dict(self.appdata.project.scen_values)
+            self.central_widget.mode_navigator.set_to_efm()
+            self.central_widget.update_mode()
+
+    @Slot(str)
+    def receive_progress_text(self, text):
+        self.text_field.append(text)
+
+
+class DynamicFBAThread(QThread):
+    def __init__(self, model, biomass, substrates, initial_biomass, duration, num_steps):
+        super().__init__()
+        self.model = model
+        self.biomass = biomass
+        self.substrates = substrates
+        self.initial_biomass = initial_biomass
+        self.duration = duration
+        self.num_steps = num_steps
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.result = dynamic_fba(self.model, self.biomass, self.substrates, self.initial_biomass,
+                                      self.duration, self.num_steps, print_func=self.send_progress_text.emit,
+                                      progress_callback=self.send_progress.emit, abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+            self.send_progress_text.emit(self.exception)
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
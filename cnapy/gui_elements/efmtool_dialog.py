@@ -1,10 +1,15 @@
 """The cnapy elementary flux modes calculator dialog"""
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
 from qtpy.QtCore import Qt, QThread, Signal, Slot
-from qtpy.QtWidgets import (QCheckBox, QDialog, QHBoxLayout, QMessageBox,
-                            QPushButton, QVBoxLayout, QTextEdit)
+from qtpy.QtWidgets import (QButtonGroup, QCheckBox, QDialog, QHBoxLayout, QLabel,
+                            QLineEdit, QMessageBox, QPushButton, QRadioButton,
+                            QVBoxLayout)
 
 import cnapy.core
+from cnapy.blocked_reactions import get_blocked_reactions
 from cnapy.appdata import AppData
+from cnapy.gui_elements.log_view import LogChannel, LogView, new_log_file
 
 
 class EFMtoolDialog(QDialog):
@@ -23,12 +28,52 @@ class EFMtoolDialog(QDialog):
         self.constraints = QCheckBox("consider 0 in current scenario as off")
         self.constraints.setCheckState(Qt.Checked)
         l1.addWidget(self.constraints)
+        self.remove_blocked = QCheckBox("remove blocked reactions")
+        self.remove_blocked.setCheckState(Qt.Checked)
+        l1.addWidget(self.remove_blocked)
         self.layout.addItem(l1)
 
-        self.text_field = QTextEdit("*** EFMtool output ***")
-        self.text_field.setReadOnly(True)
+        l2 = QHBoxLayout()
+        self.backend = QButtonGroup()
+        self.use_efmtool = QRadioButton("All EFMs (EFMtool)")
+        self.use_efmtool.setChecked(True)
+        self.backend.addButton(self.use_efmtool)
+        l2.addWidget(self.use_efmtool)
+        self.use_kshortest = QRadioButton("Shortest EFMs (MILP)")
+        self.backend.addButton(self.use_kshortest)
+        l2.addWidget(self.use_kshortest)
+        self.layout.addItem(l2)
+
+        l3 = QHBoxLayout()
+        l3.addWidget(QLabel("Max. size"))
+        self.max_size = QLineEdit("inf")
+        self.max_size.setMaximumWidth(50)
+        l3.addWidget(self.max_size)
+        l3.addWidget(QLabel("Max. number"))
+        self.max_num = QLineEdit("100")
+        self.max_num.setMaximumWidth(50)
+        l3.addWidget(self.max_num)
+        self.layout.addItem(l3)
+        self.use_kshortest.toggled.connect(self.max_size.setEnabled)
+        self.use_kshortest.toggled.connect(self.max_num.setEnabled)
+        self.max_size.setEnabled(False)
+        self.max_num.setEnabled(False)
+
+        self.text_field = LogView("*** EFMtool output ***")
         self.layout.addWidget(self.text_field)
 
+        # live chart of the intermediate modes so that runs which explode can be aborted early
+        self.progress_label = QLabel()
+        self.layout.addWidget(self.progress_label)
+        self.progress_figure = Figure(figsize=(5, 2.5))
+        self.progress_axes = self.progress_figure.add_subplot()
+        self.progress_canvas = FigureCanvasQTAgg(self.progress_figure)
+        self.layout.addWidget(self.progress_canvas)
+        self.progress_label.hide()
+        self.progress_canvas.hide()
+        self.progress_iterations = []
+        self.progress_modes = []
+
         lx = QHBoxLayout()
         self.button = QPushButton("Compute")
         self.cancel = QPushButton("Close")
@@ -43,15 +88,43 @@ class EFMtoolDialog(QDialog):
         self.button.clicked.connect(self.compute)
 
     def compute(self):
+        if self.use_kshortest.isChecked():
+            def limit(text: str) -> int:
+                # 0 means no limit
+                text = text.strip()
+                if text == "inf":
+                    return 0
+                value = int(text)
+                if value <= 0:
+                    raise ValueError
+                return value
+            try:
+                max_size = limit(self.max_size.text())
+                max_num = limit(self.max_num.text())
+            except ValueError:
+                QMessageBox.warning(self, 'Invalid limits',
+                                    'Max. size and max. number must be positive integers or "inf".')
+                return
+        else:
+            max_size = None
+            max_num = None
         self.setCursor(Qt.BusyCursor)
-        self.efm_computation = EFMComputationThread(self.appdata.project.cobra_py_model, self.appdata.project.scen_values,
-                                                    self.constraints.checkState() == Qt.Checked)
+        self.log_channel = LogChannel(new_log_file(self.appdata.computation_log_dir, "efm_computation"))
+        self.efm_computation = EFMComputationThread(self.log_channel, self.appdata.project.cobra_py_model, self.appdata.project.scen_values,
+                                                    self.constraints.checkState() == Qt.Checked,
+                                                    max_size=max_size, max_num=max_num,
+                                                    remove_blocked=self.remove_blocked.checkState() == Qt.Checked,
+                                                    results_cache_dir=self.appdata.results_cache_dir
+                                                    if self.appdata.use_results_cache else None,
+                                                    scratch_dir=self.appdata.efmtool_scratch_dir)
         self.button.setText("Abort computation")
         self.button.clicked.disconnect(self.compute)
         self.button.clicked.connect(self.efm_computation.activate_abort)
         self.rejected.connect(self.efm_computation.activate_abort) # for the X button of the window frame
         self.cancel.hide()
-        self.efm_computation.send_progress_text.connect(self.receive_progress_text)
+        self.log_channel.text_batch.connect(self.text_field.append_text)
+        self.efm_computation.finished.connect(self.log_channel.close)
+        self.efm_computation.send_progress_data.connect(self.receive_progress_data)
         self.efm_computation.finished_computation.connect(self.conclude_computation)
         self.efm_computation.start()
 
@@ -78,17 +151,40 @@ class EFMtoolDialog(QDialog):
                     self.central_widget.mode_navigator.set_to_efm()
                     self.central_widget.update_mode()
 
-    @Slot(str)
-    def receive_progress_text(self, text):
-        self.text_field.append(text)
-        # self.central_widget.console._append_plain_text(text) # causes some kind of deadlock?!?
+    @Slot(object)
+    def receive_progress_data(self, progress):
+        (iteration, num_iterations, modes, eta) = progress
+        self.progress_label.setText("Iteration "+str(iteration)+"/"+str(num_iterations)+", "
+                                    +str(modes)+" intermediate modes, estimated remaining time: "
+                                    +str(round(eta))+" s (lower bound)")
+        self.progress_iterations.append(iteration)
+        self.progress_modes.append(max(modes, 1))
+        self.progress_axes.clear()
+        self.progress_axes.plot(self.progress_iterations, self.progress_modes, marker='.')
+        self.progress_axes.set_yscale('log')
+        self.progress_axes.set_xlim(0, num_iterations)
+        self.progress_axes.set_xlabel("iteration")
+        self.progress_axes.set_ylabel("intermediate modes")
+        self.progress_figure.tight_layout()
+        self.progress_canvas.draw_idle()
+        self.progress_label.show()
+        self.progress_canvas.show()
 
 class EFMComputationThread(QThread):
-    def __init__(self, model, scen_values, constraints):
+    def __init__(self, log_channel: LogChannel, model, scen_values, constraints, max_size=None, max_num=None,
+                 remove_blocked=False, results_cache_dir=None, scratch_dir=None):
         super().__init__()
+        self.log_channel = log_channel
         self.model = model
         self.scen_values = scen_values
         self.constraints = constraints
+        # when the limits are given the shortest EFMs are enumerated with a MILP instead of EFMtool
+        self.max_size = max_size
+        self.max_num = max_num
+        self.remove_blocked = remove_blocked
+        self.results_cache_dir = results_cache_dir
+        self.scratch_dir = scratch_dir
+        self.progress = cnapy.core.EFMtoolProgress()
         self.abort = False
         self.ems = None
         self.scenario = None
@@ -100,15 +196,41 @@ class EFMComputationThread(QThread):
         self.abort = True
 
     def run(self):
-        (self.ems, self.scenario) = cnapy.core.efm_computation(self.model, self.scen_values, self.constraints,
-                                        print_progress_function=self.print_progress_function, abort_callback=self.do_abort)
+        blocked_reactions = None
+        if self.remove_blocked:
+            with self.model as model:
+                if self.constraints:
+                    for r, (vl, vu) in self.scen_values.items():
+                        if vl == vu and vl == 0:
+                            model.reactions.get_by_id(r).bounds = (0, 0)
+                blocked_reactions = get_blocked_reactions(model, reversibility_only=True,
+                                        results_cache_dir=self.results_cache_dir, print_func=self.print_progress_function)
+        if self.max_size is None:
+            self.progress = cnapy.core.EFMtoolProgress() # start the clock for the remaining time estimate
+            (self.ems, self.scenario) = cnapy.core.efm_computation(self.model, self.scen_values, self.constraints,
+                                            print_progress_function=self.print_progress_function, abort_callback=self.do_abort,
+                                            blocked_reactions=blocked_reactions, scratch_dir=self.scratch_dir)
+        else:
+            try:
+                (self.ems, self.scenario) = cnapy.core.kshortest_efm_computation(self.model, self.scen_values, self.constraints,
+                                                max_efm_size=self.max_size, max_efm_num=self.max_num,
+                                                print_progress_function=self.print_progress_function, abort_callback=self.do_abort,
+                                                blocked_reactions=blocked_reactions)
+            except Exception as e: # e.g. the current solver cannot handle MILPs
+                self.print_progress_function(str(e))
         self.finished_computation.emit()
 
     def print_progress_function(self, text):
         print(text)
-        self.send_progress_text.emit(text)
-
-    # the output from efmtool needs to be passed as a signal because all Qt widgets must
-    # run on the main thread and their methods cannot be safely called from other threads
-    send_progress_text = Signal(str)
+        self.log_channel.write(text+"\n")
+        for line in text.splitlines(): # with abort_callback several log lines are passed at once
+            progress = self.progress.parse(line)
+            if progress is not None:
+                self.send_progress_data.emit(progress)
+
+    # the output from efmtool is passed on in batches by the log channel and the progress as a signal
+    # because all Qt widgets must run on the main thread and their methods cannot be safely called
+    # from other threads
+    # (iteration, number of iterations, intermediate modes, estimated remaining seconds)
+    send_progress_data = Signal(object)
     finished_computation = Signal()
@@ -89,9 +89,16 @@ class FluxOptimizationDialog(QDialog):
             solver = re.search('('+'|'.join(avail_solvers)+')',model.solver.interface.__name__)
             if solver is not None:
                 solver = solver[0]
-            sol = fba(model,
-                       obj=self.expr.text(),
-                       obj_sense=self.sense_combo.currentText())
+            # the LP is set up again only when the model or scenario have changed
+            sol = self.appdata.project.optimization_lp_cache.get_flux_lp(
+                model, self.appdata.project.scen_values.constraints, solver).optimize(
+                self.expr.text(), self.sense_combo.currentText())
+            if sol is None: # unbounded, straindesign constructs an example flux vector
+                sol = fba(model,
+                          obj=self.expr.text(),
+                          obj_sense=self.sense_combo.currentText(),
+                          constraints=[list(c) for c in self.appdata.project.scen_values.constraints],
+                          solver=solver)
             if sol.status == UNBOUNDED and isinf(sol.objective_value):
                 self.set_boxes(sol)
                 QMessageBox.warning(self, sense+' unbounded. ',
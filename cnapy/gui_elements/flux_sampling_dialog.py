@@ -0,0 +1,135 @@
+"""The cnapy flux sampling dialog"""
+from qtpy.QtCore import Qt, QThread, Signal, Slot
+from qtpy.QtWidgets import (QDialog, QHBoxLayout, QLabel, QLineEdit, QMessageBox,
+                            QProgressBar, QPushButton, QVBoxLayout, QTextEdit)
+
+from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
+from cnapy.flux_sampling import sample_fluxes
+import cnapy.utils as utils
+
+
+class FluxSamplingDialog(QDialog):
+    """A dialog to sample the flux space of the current scenario"""
+
+    def __init__(self, appdata: AppData, central_widget):
+        QDialog.__init__(self)
+        self.setWindowTitle("Flux Sampling")
+
+        self.appdata = appdata
+        self.central_widget = central_widget
+
+        self.layout = QVBoxLayout()
+
+        l1 = QHBoxLayout()
+        l1.addWidget(QLabel("Number of samples"))
+        self.num_samples = QLineEdit("1000")
+        self.num_samples.setMaximumWidth(80)
+        l1.addWidget(self.num_samples)
+        l1.addWidget(QLabel("Thinning"))
+        self.thinning = QLineEdit("100")
+        self.thinning.setToolTip("Number of hit-and-run steps between two samples of a chain")
+        self.thinning.setMaximumWidth(50)
+        l1.addWidget(self.thinning)
+        self.layout.addItem(l1)
+
+        self.text_field = QTextEdit("*** Flux sampling output ***")
+        self.text_field.setReadOnly(True)
+        self.layout.addWidget(self.text_field)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+
+        self.setLayout(self.layout)
+
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+
+    def compute(self):
+        try:
+            num_samples = int(self.num_samples.text())
+            thinning = int(self.thinning.text())
+            if num_samples < 1 or thinning < 1:
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, 'Invalid input',
+                                'Number of samples and thinning must be positive integers.')
+            return
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            model = model.copy() # the sampling runs in the background
+        self.setCursor(Qt.BusyCursor)
+        self.progress_bar.setMaximum(num_samples)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.sampling = FluxSamplingThread(model, num_samples, thinning, self.appdata.efmtool_scratch_dir)
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.sampling.activate_abort)
+        self.rejected.connect(self.sampling.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.sampling.send_progress_text.connect(self.receive_progress_text)
+        self.sampling.send_progress.connect(self.progress_bar.setValue)
+        self.sampling.finished_computation.connect(self.conclude_computation)
+        self.sampling.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.sampling.abort:
+            self.accept()
+        elif self.sampling.samples is None:
+            self.button.hide()
+            self.cancel.show()
+            if self.sampling.exception is not None:
+                utils.show_unknown_error_box(self.sampling.exception)
+        else:
+            self.accept()
+            self.appdata.project.modes.clear()
+            self.appdata.project.modes = self.sampling.samples
+            self.central_widget.mode_navigator.current = 0
+            self.central_widget.mode_navigator.scenario = dict(self.appdata.project.scen_values)
+            self.central_widget.mode_navigator.set_to_efm()
+            self.central_widget.update_mode()
+
+    @Slot(str)
+    def receive_progress_text(self, text):
+        self.text_field.append(text)
+
+
+class FluxSamplingThread(QThread):
+    def __init__(self, model, num_samples, thinning, scratch_dir):
+        super().__init__()
+        self.model = model
+        self.num_samples = num_samples
+        self.thinning = thinning
+        self.scratch_dir = scratch_dir
+        self.abort = False
+        self.samples = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.samples = sample_fluxes(self.model, self.num_samples, thinning=self.thinning,
+                                         scratch_dir=self.scratch_dir, print_func=self.send_progress_text.emit,
+                                         progress_callback=self.send_progress.emit, abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+            self.send_progress_text.emit(self.exception)
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
@@ -0,0 +1,148 @@
+"""The cnapy knock-out screen dialog"""
+from qtpy.QtCore import Qt, QThread, Signal, Slot
+from qtpy.QtWidgets import (QButtonGroup, QCheckBox, QDialog, QHBoxLayout, QLabel, QMessageBox,
+                            QProgressBar, QPushButton, QRadioButton, QVBoxLayout, QTextEdit)
+
+from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
+from cnapy.knockout_screen import knockout_screen
+import cnapy.utils as utils
+from cnapy.utils import QComplReceivLineEdit
+
+
+class KnockoutScreenDialog(QDialog):
+    """A dialog to evaluate all single or double knock-outs of the current scenario"""
+
+    def __init__(self, appdata: AppData, central_widget):
+        QDialog.__init__(self)
+        self.setWindowTitle("Knock-out screen")
+
+        self.appdata = appdata
+        self.central_widget = central_widget
+        self.reac_ids = self.appdata.project.cobra_py_model.reactions.list_attr("id")
+
+        self.layout = QVBoxLayout()
+
+        l1 = QHBoxLayout()
+        self.target_group = QButtonGroup()
+        self.reactions = QRadioButton("Reactions")
+        self.reactions.setChecked(True)
+        self.genes = QRadioButton("Genes")
+        self.target_group.addButton(self.reactions)
+        self.target_group.addButton(self.genes)
+        l1.addWidget(QLabel("Delete"))
+        l1.addWidget(self.reactions)
+        l1.addWidget(self.genes)
+        self.double = QCheckBox("Double deletions")
+        self.double.setToolTip("Also evaluate all pairs of targets whose single deletion is viable")
+        l1.addWidget(self.double)
+        self.layout.addItem(l1)
+
+        l2 = QHBoxLayout()
+        l2.addWidget(QLabel("Product reactions"))
+        self.products = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        self.products.setPlaceholderText("Comma-separated reaction IDs (optional)")
+        l2.addWidget(self.products)
+        self.layout.addItem(l2)
+
+        self.text_field = QTextEdit("*** Knock-out screen output ***")
+        self.text_field.setReadOnly(True)
+        self.layout.addWidget(self.text_field)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+
+        self.setLayout(self.layout)
+
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+
+    def compute(self):
+        products = [p.strip() for p in self.products.text().split(",") if len(p.strip()) > 0]
+        unknown = [p for p in products if p not in self.reac_ids]
+        if len(unknown) > 0:
+            QMessageBox.warning(self, 'Invalid input', 'Unknown reaction IDs: '+", ".join(unknown))
+            return
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            model = model.copy() # the screen runs in the background
+        model._stoichiometry_hash_object = None # not needed and cannot be pickled for the worker processes
+        self.setCursor(Qt.BusyCursor)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.screen = KnockoutScreenThread(model, self.genes.isChecked(), self.double.isChecked(), products)
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.screen.activate_abort)
+        self.rejected.connect(self.screen.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.screen.send_progress_text.connect(self.receive_progress_text)
+        self.screen.send_progress.connect(self.receive_progress)
+        self.screen.finished_computation.connect(self.conclude_computation)
+        self.screen.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.screen.abort:
+            self.accept()
+        elif self.screen.result is None:
+            self.button.hide()
+            self.cancel.show()
+            if self.screen.exception is not None:
+                utils.show_unknown_error_box(self.screen.exception)
+        else:
+            self.accept()
+            self.appdata.project.modes.clear()
+            self.appdata.project.modes = self.screen.result
+            self.central_widget.mode_navigator.current = 0
+            self.central_widget.mode_navigator.scenario = dict(self.appdata.project.scen_values)
+            self.central_widget.mode_navigator.set_to_mcs()
+            self.central_widget.update_mode()
+
+    @Slot(str)
+    def receive_progress_text(self, text):
+        self.text_field.append(text)
+
+    @Slot(int, int)
+    def receive_progress(self, num_done, num_required):
+        self.progress_bar.setMaximum(num_required)
+        self.progress_bar.setValue(num_done)
+
+
+class KnockoutScreenThread(QThread):
+    def __init__(self, model, genes, double, products):
+        super().__init__()
+        self.model = model
+        self.genes = genes
+        self.double = double
+        self.products = products
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.result = knockout_screen(self.model, genes=self.genes, double=self.double, products=self.products,
+                                          print_func=self.send_progress_text.emit,
+                                          progress_callback=self.send_progress.emit, abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+            self.send_progress_text.emit(self.exception)
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int, int)
+    finished_computation = Signal()
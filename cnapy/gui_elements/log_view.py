@@ -0,0 +1,92 @@
+"""Buffered output of long-running computations"""
+import os
+import threading
+import time
+from typing import Optional
+
+from qtpy.QtCore import QObject, QTimer, Signal, Slot
+from qtpy.QtWidgets import QPlainTextEdit
+
+
+def new_log_file(directory: str, name: str) -> Optional[str]:
+    """A new log file name in the directory or None if no directory is set."""
+    if not directory or not os.path.isdir(directory):
+        return None
+    return os.path.join(directory, name+time.strftime("_%Y%m%d_%H%M%S")+".log")
+
+
+class LogChannel(QObject):
+    """
+    Collects the text that a computation writes from any thread and emits it in batches of complete lines
+    with text_batch every interval ms so that the computation does not wait for the GUI. With a log_file
+    the complete output is also written there. Must be created in the GUI thread.
+    """
+
+    def __init__(self, log_file: str = None, interval: int = 200):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.log_file = open(log_file, 'w', encoding='utf-8') if log_file else None
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def write(self, text: str):
+        with self.lock:
+            self.pending.append(text)
+            if self.log_file is not None:
+                self.log_file.write(text)
+
+    def _take_pending(self, final: bool) -> Optional[str]:
+        """The pending lines without the newline that ends the last one or None if there are none."""
+        text = "".join(self.pending)
+        self.pending.clear()
+        if final:
+            if len(text) == 0:
+                return None
+            return text[:-1] if text.endswith("\n") else text
+        # an incomplete last line stays pending
+        text, newline, rest = text.rpartition("\n")
+        if len(rest) > 0:
+            self.pending.append(rest)
+        return text if newline else None
+
+    @Slot()
+    def flush(self):
+        with self.lock:
+            text = self._take_pending(False)
+        if text is not None:
+            self.text_batch.emit(text)
+
+    @Slot()
+    def close(self):
+        self.timer.stop()
+        # a terminated computation thread may not have released the lock
+        if not self.lock.acquire(timeout=1):
+            return
+        try:
+            text = self._take_pending(True)
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+        finally:
+            self.lock.release()
+        if text is not None:
+            self.text_batch.emit(text)
+
+    text_batch = Signal(str)
+
+
+class LogView(QPlainTextEdit):
+    """A read-only text field that only keeps the last max_lines lines"""
+
+    def __init__(self, text: str = "", max_lines: int = 10000):
+        super().__init__(text)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+
+    @Slot(str)
+    def append_text(self, text: str):
+        self.appendPlainText(text)
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
@@ -6,19 +6,23 @@ from tempfile import TemporaryDirectory
 from zipfile import BadZipFile, ZipFile
 import pickle
 import xml.etree.ElementTree as ET
-from cnapy.flux_vector_container import FluxVectorContainer
+from cnapy.flux_vector_container import FluxVectorContainer, KnockoutScreenContainer, DynamicFBAContainer
 from cnapy.core_gui import model_optimization_with_exceptions, except_likely_community_model_error, get_last_exception_string, has_community_error_substring
 import cobra
 from optlang_enumerator.cobra_cnapy import CNApyModel
-from optlang_enumerator.mcs_computation import flux_variability_analysis
+from cnapy.flux_coupling import flux_coupling_analysis
+from cnapy.fva import flux_variability_analysis
+from cnapy.loopless import loopless_fluxes
+from cnapy.strain_design_file import StrainDesignFile, is_strain_design_file, load_legacy_strain_designs
+from cnapy.strain_design_checkpoint import stop_sd_checkpointing
 from optlang.symbolics import Zero
 import numpy as np
 import cnapy.resources  # Do not delete this import - it seems to be unused but in fact it provides the menu icons
 import matplotlib.pyplot as plt
-from typing import Any, Dict
+from typing import Any, Dict, List
 import openpyxl
 
-from qtpy.QtCore import QFileInfo, Qt, Slot, QTimer, QSignalBlocker, QSize
+from qtpy.QtCore import QFileInfo, Qt, Slot, QTimer, QSignalBlocker, QSize, QThread, Signal
 from qtpy.QtGui import QColor, QIcon, QKeySequence
 from qtpy.QtWidgets import (QAction, QActionGroup, QApplication, QFileDialog, QStyle,
                             QMainWindow, QMessageBox, QToolBar, QShortcut, QStatusBar, QLabel)
@@ -31,13 +35,19 @@ from cnapy.gui_elements.clipboard_calculator import ClipboardCalculator
 from cnapy.gui_elements.config_dialog import ConfigDialog
 from cnapy.gui_elements.download_dialog import DownloadDialog
 from cnapy.gui_elements.config_cobrapy_dialog import ConfigCobrapyDialog
+from cnapy.gui_elements.dynamic_fba_dialog import DynamicFBADialog
 from cnapy.gui_elements.efmtool_dialog import EFMtoolDialog
 from cnapy.gui_elements.flux_feasibility_dialog import FluxFeasibilityDialog
+from cnapy.gui_elements.flux_sampling_dialog import FluxSamplingDialog
+from cnapy.gui_elements.knockout_screen_dialog import KnockoutScreenDialog
+from cnapy.gui_elements.log_view import LogChannel, new_log_file
 from cnapy.gui_elements.map_view import MapView
 from cnapy.gui_elements.escher_map_view import EscherMapView
 from cnapy.gui_elements.mcs_dialog import MCSDialog
 from cnapy.gui_elements.strain_design_dialog import SDDialog, SDComputationViewer, SDViewer, SDComputationThread
 from cnapy.gui_elements.plot_space_dialog import PlotSpaceDialog
+from cnapy.gui_elements.scenario_sweep_dialog import ScenarioSweepDialog
+from cnapy.gui_elements.multi_scenario_dialog import MultiScenarioDialog
 from cnapy.gui_elements.in_out_flux_dialog import InOutFluxDialog
 from cnapy.gui_elements.reactions_list import ReactionListColumn
 from cnapy.gui_elements.rename_map_dialog import RenameMapDialog
@@ -71,6 +81,12 @@ class MainWindow(QMainWindow):
         self.central_widget = CentralWidget(self)
         self.setCentralWidget(self.central_widget)
 
+        self.fva_computation = None
+        self.flux_coupling_computation = None
+        self.thermodynamic_dialogs = []
+        self.fva_update_timer = QTimer(self)
+        self.fva_update_timer.timeout.connect(self.central_widget.update)
+
         self.menu = self.menuBar()
         self.file_menu = self.menu.addMenu("&Project")
 
@@ -349,6 +365,12 @@ class MainWindow(QMainWindow):
         self.auto_fba_action.setCheckable(True)
         self.analysis_menu.addAction(self.auto_fba_action)
 
+        self.loopless_action = QAction("Loopless FBA/FVA", self)
+        self.loopless_action.setToolTip("Remove thermodynamically infeasible loops from FBA solutions and FVA ranges")
+        self.loopless_action.triggered.connect(self.loopless)
+        self.loopless_action.setCheckable(True)
+        self.analysis_menu.addAction(self.loopless_action)
+
         pfba_action = QAction(
             "Parsimonious Flux Balance Analysis (pFBA)", self)
         pfba_action.triggered.connect(self.pfba)
@@ -358,6 +380,26 @@ class MainWindow(QMainWindow):
         fva_action.triggered.connect(self.fva)
         self.analysis_menu.addAction(fva_action)
 
+        fva_map_action = QAction("FVA of the reactions on the current map", self)
+        fva_map_action.triggered.connect(lambda: self.fva(reaction_list=self.reactions_on_current_map()))
+        self.analysis_menu.addAction(fva_map_action)
+
+        fva_selected_action = QAction("FVA of the selected reactions", self)
+        fva_selected_action.triggered.connect(lambda: self.fva(reaction_list=self.selected_reactions()))
+        self.analysis_menu.addAction(fva_selected_action)
+
+        flux_coupling_action = QAction("Flux coupling analysis", self)
+        flux_coupling_action.triggered.connect(self.flux_coupling)
+        self.analysis_menu.addAction(flux_coupling_action)
+
+        flux_sampling_action = QAction("Flux sampling...", self)
+        flux_sampling_action.triggered.connect(self.flux_sampling)
+        self.analysis_menu.addAction(flux_sampling_action)
+
+        knockout_screen_action = QAction("Knock-out screen...", self)
+        knockout_screen_action.triggered.connect(self.knockout_screen)
+        self.analysis_menu.addAction(knockout_screen_action)
+
         make_scenario_feasible_action = QAction("Make scenario feasible...", self)
         make_scenario_feasible_action.triggered.connect(self.make_scenario_feasible)
         self.analysis_menu.addAction(make_scenario_feasible_action)
@@ -410,6 +452,18 @@ class MainWindow(QMainWindow):
         plot_space_action.triggered.connect(self.plot_space)
         self.analysis_menu.addAction(plot_space_action)
 
+        scenario_sweep_action = QAction("Scenario sweep...", self)
+        scenario_sweep_action.triggered.connect(self.scenario_sweep)
+        self.analysis_menu.addAction(scenario_sweep_action)
+
+        multi_scenario_action = QAction("Evaluate multiple scenarios...", self)
+        multi_scenario_action.triggered.connect(self.multi_scenario)
+        self.analysis_menu.addAction(multi_scenario_action)
+
+        dynamic_fba_action = QAction("Dynamic FBA...", self)
+        dynamic_fba_action.triggered.connect(self.dynamic_fba)
+        self.analysis_menu.addAction(dynamic_fba_action)
+
         self.thermodynamic_menu = self.analysis_menu.addMenu("Thermodynamic analyses")
 
         optmdf_action = QAction("OptMDFpathway...", self)
@@ -424,6 +478,15 @@ class MainWindow(QMainWindow):
         bottleneck_action.triggered.connect(self.perform_bottleneck_analysis)
         self.thermodynamic_menu.addAction(bottleneck_action)
 
+        thermodynamic_variability_action = QAction("Thermodynamic variability analysis...", self)
+        thermodynamic_variability_action.triggered.connect(self.perform_thermodynamic_variability_analysis)
+        self.thermodynamic_menu.addAction(thermodynamic_variability_action)
+
+        mode_ranking_action = QAction("Rank modes by OptMDF...", self)
+        mode_ranking_action.setToolTip("Sort and select the EFMs or strain designs in the mode navigator by their OptMDF")
+        mode_ranking_action.triggered.connect(self.perform_mode_ranking)
+        self.thermodynamic_menu.addAction(mode_ranking_action)
+
         self.thermodynamic_menu.addSeparator()
 
         dG0_menu = self.thermodynamic_menu.addMenu("Load dG'° values [in kJ/mol] (replacing all current values)...")
@@ -686,6 +749,18 @@ class MainWindow(QMainWindow):
         self.plot_space = PlotSpaceDialog(self.appdata)
         self.plot_space.show()
 
+    def scenario_sweep(self):
+        self.scenario_sweep_dialog = ScenarioSweepDialog(self.appdata)
+        self.scenario_sweep_dialog.show()
+
+    def multi_scenario(self):
+        self.multi_scenario_dialog = MultiScenarioDialog(self.appdata)
+        self.multi_scenario_dialog.show()
+
+    def dynamic_fba(self):
+        self.dynamic_fba_dialog = DynamicFBADialog(self.appdata, self.centralWidget())
+        self.dynamic_fba_dialog.exec_()
+
     # Strain design computation and viewing functions
     def strain_design(self):
         self.sd_dialog = SDDialog(self.appdata)
@@ -702,8 +777,10 @@ class MainWindow(QMainWindow):
         self.sd_viewer = SDComputationViewer(self, self.appdata, sd_setup)
         self.sd_viewer.show_sd_signal.connect(self.show_strain_designs_with_setup, Qt.QueuedConnection)
         # connect signals to update progress
-        self.sd_computation = SDComputationThread(self.appdata, sd_setup)
-        self.sd_computation.output_connector.connect(self.sd_viewer.receive_progress_text, Qt.QueuedConnection)
+        self.sd_log_channel = LogChannel(new_log_file(self.appdata.computation_log_dir, "strain_design"))
+        self.sd_log_channel.text_batch.connect(self.sd_viewer.receive_progress_text)
+        self.sd_computation = SDComputationThread(self.appdata, sd_setup, self.sd_log_channel)
+        self.sd_computation.finished.connect(self.sd_log_channel.close)
         self.sd_computation.finished_computation.connect(self.sd_viewer.conclude_computation, Qt.QueuedConnection)
         self.sd_viewer.cancel_computation.connect(self.terminate_strain_design_computation)
         # show dialog and launch process
@@ -749,9 +826,12 @@ class MainWindow(QMainWindow):
 
     @Slot()
     def terminate_strain_design_computation(self):
-        self.sd_computation.output_connector.disconnect()
+        self.sd_log_channel.text_batch.disconnect()
         self.sd_computation.finished_computation.disconnect()
         self.sd_computation.terminate()
+        # the terminated thread cannot leave its checkpointing context
+        stop_sd_checkpointing()
+        self.sd_log_channel.close()
 
     @Slot(bytes)
     def show_strain_designs_with_setup(self, solutions_with_setup):
@@ -770,8 +850,19 @@ class MainWindow(QMainWindow):
             directory=self.appdata.work_directory, filter="*.sds")[0]
         if not filename or len(filename) == 0 or not os.path.exists(filename):
             return
-        with open(filename,'rb') as f:
-            solutions = f.read()
+        try:
+            if is_strain_design_file(filename):
+                solutions = StrainDesignFile(filename)
+            else: # pickled SDSolutions of earlier versions
+                solutions = load_legacy_strain_designs(filename)
+        except Exception:
+            QMessageBox.critical(
+                self,
+                'Could not open file',
+                "File could not be opened as it does not seem to be a valid strain design results file. "
+                "Maybe the file got the .sds ending for other reasons than being a strain design results file or the file is corrupted."
+            )
+            return
         self.show_strain_designs(solutions)
 
     @Slot()
@@ -902,6 +993,7 @@ class MainWindow(QMainWindow):
         self.centralWidget().reaction_list.pin_multiple(self.appdata.project.scen_values.pinned_reactions)
 
         self.appdata.project.fva_values.clear()
+        self.appdata.project.flux_coupling = None
         self.central_widget.tabs.widget(ModelTabIndex.Scenario).recreate_scenario_items()
         self.appdata.project.update_reaction_id_lists()
 
@@ -936,7 +1028,10 @@ class MainWindow(QMainWindow):
         if not filename or len(filename) == 0 or not os.path.exists(filename):
             return
 
-        self.appdata.project.modes = FluxVectorContainer(filename)
+        if DynamicFBAContainer.is_dynamic_fba_file(filename):
+            self.appdata.project.modes = DynamicFBAContainer(filename)
+        else:
+            self.appdata.project.modes = FluxVectorContainer(filename)
         self.centralWidget().mode_navigator.current = 0
 
         self.centralWidget().mode_navigator.set_to_efm()
@@ -950,7 +1045,10 @@ class MainWindow(QMainWindow):
         if not filename or len(filename) == 0 or not os.path.exists(filename):
             return
 
-        self.appdata.project.modes = FluxVectorContainer(filename)
+        if KnockoutScreenContainer.is_knockout_screen_file(filename):
+            self.appdata.project.modes = KnockoutScreenContainer(filename)
+        else:
+            self.appdata.project.modes = FluxVectorContainer(filename)
         self.centralWidget().mode_navigator.current = 0
         self.centralWidget().mode_navigator.set_to_mcs()
         self.centralWidget().update_mode()
@@ -1209,6 +1307,7 @@ class MainWindow(QMainWindow):
         self.appdata.project.comp_values.clear()
         self.appdata.project.comp_values_type = 0
         self.appdata.project.fva_values.clear()
+        self.appdata.project.flux_coupling = None
         self.appdata.project.conc_values.clear()
         self.appdata.project.df_values.clear()
         self.appdata.project.high = 0
@@ -1219,6 +1318,7 @@ class MainWindow(QMainWindow):
     def load_default_scenario(self):
         self.appdata.project.comp_values.clear()
         self.appdata.project.fva_values.clear()
+        self.appdata.project.flux_coupling = None
         self.appdata.project.scen_values.clear()
         self.update_scenario_file_name()
         self.central_widget.tabs.widget(ModelTabIndex.Scenario).recreate_scenario_items_needed = True
@@ -1248,6 +1348,7 @@ class MainWindow(QMainWindow):
         self.close_project_dialogs()
 
         self.appdata.project.scen_values.clear()
+        self.appdata.project.flux_coupling = None
         self.appdata.scenario_past.clear()
         self.appdata.scenario_future.clear()
 
@@ -1329,6 +1430,7 @@ class MainWindow(QMainWindow):
                 self.appdata.project.maps = maps
                 self.appdata.project.meta_data = meta_data
                 self.appdata.project.cobra_py_model = cobra_py_model
+                self.appdata.project.flux_coupling = None
                 self.set_current_filename(filename)
                 self.recreate_maps()
                 self.centralWidget().mode_navigator.clear()
@@ -1664,10 +1766,22 @@ class MainWindow(QMainWindow):
         else:
             self.appdata.auto_fba = False
 
+    def loopless(self):
+        self.appdata.loopless = self.loopless_action.isChecked()
+        if self.appdata.auto_fba:
+            self.fba()
+
+    def remove_loops_from_solution(self, model):
+        # only LPs with the model from which the solution came, see CycleFreeLP
+        solution = self.appdata.project.solution
+        if self.appdata.loopless and solution is not None and solution.status == 'optimal':
+            solution.fluxes = loopless_fluxes(model, solution.fluxes)
+
     def fba(self):
         with self.appdata.project.cobra_py_model as model:
             self.appdata.project.load_scenario_into_model(model)
             self.appdata.project.solution = model_optimization_with_exceptions(model)
+            self.remove_loops_from_solution(model)
         self.process_fba_solution()
 
     def process_fba_solution(self, update=True):
@@ -1712,6 +1826,7 @@ class MainWindow(QMainWindow):
             else:
                 model.objective.direction = 'max'
             self.appdata.project.solution = model_optimization_with_exceptions(model)
+            self.remove_loops_from_solution(model)
         self.process_fba_solution()
 
     def pfba(self):
@@ -1868,7 +1983,16 @@ class MainWindow(QMainWindow):
         self.appdata.project.comp_values_type = 1
         self.centralWidget().update()
 
-    def fva(self, fraction_of_optimum=0.0, zero_objective_with_zero_fraction_of_optimum=True):
+    def fva(self, fraction_of_optimum=0.0, zero_objective_with_zero_fraction_of_optimum=True, reaction_list=None):
+        # reaction_list restricts the FVA to these reactions
+        if self.fva_computation is not None and self.fva_computation.isRunning():
+            QMessageBox.information(self, 'FVA is running',
+                                    'Please wait until the current FVA has finished.')
+            return
+        if reaction_list is not None and len(reaction_list) == 0:
+            QMessageBox.information(self, 'No reactions',
+                                    'There are no reactions for which FVA can be performed.')
+            return
         self.setCursor(Qt.BusyCursor)
         with self.appdata.project.cobra_py_model as model:
             self.appdata.project.load_scenario_into_model(model)
@@ -1898,34 +2022,104 @@ class MainWindow(QMainWindow):
                     fva_hash.update(pickle.dumps(sorted(self.appdata.project.scen_values.constraints)))
             else:
                 fva_hash = None
-            try:
-                solution = flux_variability_analysis(model, fraction_of_optimum=fraction_of_optimum,
-                    results_cache_dir=self.appdata.results_cache_dir if self.appdata.use_results_cache else None,
-                    fva_hash= fva_hash,
-                    print_func=lambda *txt: self.statusBar().showMessage(' '.join(list(txt))))
-            except cobra.exceptions.Infeasible:
-                QMessageBox.information(
-                    self, 'No solution', 'The scenario is infeasible')
-            except Exception:
-                exstr = get_last_exception_string()
-                # Check for substrings of Gurobi and CPLEX community edition errors
-                if has_community_error_substring(exstr):
-                    except_likely_community_model_error()
-                else:
-                    print(exstr)
-                    utils.show_unknown_error_box(exstr)
-            else:
-                minimum = solution.minimum.to_dict()
-                maximum = solution.maximum.to_dict()
-                for i in minimum:
-                    self.appdata.project.comp_values[i] = (
-                        minimum[i], maximum[i])
-                self.appdata.project.fva_values = self.appdata.project.comp_values.copy()
-                self.appdata.project.comp_values_type = 1
+            if reaction_list is not None:
+                reaction_list = [r for r in reaction_list if model.reactions.has_id(r)]
+            # the FVA runs in the background on a copy so that the project model remains usable
+            fva_model = model.copy()
 
+        self.appdata.project.comp_values.clear()
+        self.appdata.project.fva_values.clear()
+        self.appdata.project.comp_values_type = 1
+        self.fva_computation = FVAComputationThread(fva_model, fraction_of_optimum, reaction_list,
+            self.appdata.results_cache_dir if self.appdata.use_results_cache else None, fva_hash,
+            self.appdata.project.fva_state, self.appdata.loopless)
+        self.fva_computation.send_reaction_result.connect(self.receive_fva_reaction_result)
+        self.fva_computation.send_progress_text.connect(self.statusBar().showMessage)
+        self.fva_computation.finished_computation.connect(self.conclude_fva)
+        # the views are refreshed periodically while the results come in
+        self.fva_update_timer.start(500)
+        self.fva_computation.start()
+
+    @Slot(str, float, float)
+    def receive_fva_reaction_result(self, reaction: str, minimum: float, maximum: float):
+        self.appdata.project.comp_values[reaction] = (minimum, maximum)
+        self.appdata.project.fva_values[reaction] = (minimum, maximum)
+
+    @Slot()
+    def conclude_fva(self):
+        self.fva_update_timer.stop()
+        if self.fva_computation.infeasible:
+            QMessageBox.information(
+                self, 'No solution', 'The scenario is infeasible')
+        elif self.fva_computation.exception is not None:
+            exstr = self.fva_computation.exception
+            # Check for substrings of Gurobi and CPLEX community edition errors
+            if has_community_error_substring(exstr):
+                except_likely_community_model_error()
+            else:
+                print(exstr)
+                utils.show_unknown_error_box(exstr)
+        elif self.fva_computation.solution is not None:
+            minimum = self.fva_computation.solution.minimum.to_dict()
+            maximum = self.fva_computation.solution.maximum.to_dict()
+            for i in minimum:
+                self.appdata.project.comp_values[i] = (
+                    minimum[i], maximum[i])
+            self.appdata.project.fva_values = self.appdata.project.comp_values.copy()
         self.centralWidget().update()
         self.setCursor(Qt.ArrowCursor)
 
+    def flux_coupling(self):
+        if self.flux_coupling_computation is not None and self.flux_coupling_computation.isRunning():
+            QMessageBox.information(self, 'Flux coupling analysis is running',
+                                    'Please wait until the current flux coupling analysis has finished.')
+            return
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            # the analysis runs in the background on a copy which is pickled for the worker processes
+            model = model.copy()
+        model._stoichiometry_hash_object = None
+        self.setCursor(Qt.BusyCursor)
+        self.flux_coupling_computation = FluxCouplingThread(model)
+        self.flux_coupling_computation.send_progress_text.connect(self.statusBar().showMessage)
+        self.flux_coupling_computation.finished_computation.connect(self.conclude_flux_coupling)
+        self.flux_coupling_computation.start()
+
+    @Slot()
+    def conclude_flux_coupling(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.flux_coupling_computation.exception is not None:
+            utils.show_unknown_error_box(self.flux_coupling_computation.exception)
+        elif self.flux_coupling_computation.result is not None:
+            result = self.flux_coupling_computation.result
+            self.appdata.project.flux_coupling = result
+            classes = result.fully_coupled_class[result.fully_coupled_class >= 0]
+            num_classes = np.sum(np.unique(classes, return_counts=True)[1] > 1)
+            self.statusBar().showMessage(str(result.num_blocked())+" blocked reactions, "+str(num_classes)
+                                         +" groups of fully coupled reactions (same color in the reaction list)")
+            self.centralWidget().update()
+
+    def reactions_on_current_map(self) -> List[str]:
+        idx = self.centralWidget().map_tabs.currentIndex()
+        if idx < 0:
+            return []
+        mmap = self.appdata.project.maps[self.centralWidget().map_tabs.tabText(idx)]
+        if mmap.get("view", "cnapy") == "escher":
+            if len(mmap.get("escher_map_data", "")) == 0:
+                return []
+            return [r["bigg_id"] for r in json.loads(mmap["escher_map_data"])[1]["reactions"].values()]
+        return list(mmap["boxes"].keys())
+
+    def selected_reactions(self) -> List[str]:
+        # reaction boxes selected on the current map, otherwise the reaction selected in the list
+        view = self.centralWidget().map_tabs.currentWidget()
+        selected = []
+        if isinstance(view, MapView):
+            selected = [item.id for item in view.scene.selectedItems()]
+        if len(selected) == 0:
+            selected = [item.reaction.id for item in self.centralWidget().reaction_list.reaction_list.selectedItems()]
+        return selected
+
     # def efm(self):
     #     self.efm_dialog = EFMDialog(
     #         self.appdata, self.centralWidget())
@@ -2069,6 +2263,16 @@ class MainWindow(QMainWindow):
             self.appdata, self.centralWidget())
         self.efmtool_dialog.exec_()
 
+    def flux_sampling(self):
+        self.flux_sampling_dialog = FluxSamplingDialog(
+            self.appdata, self.centralWidget())
+        self.flux_sampling_dialog.exec_()
+
+    def knockout_screen(self):
+        self.knockout_screen_dialog = KnockoutScreenDialog(
+            self.appdata, self.centralWidget())
+        self.knockout_screen_dialog.exec_()
+
     def mcs(self):
         if self.mcs_dialog is None:
             self.mcs_dialog = MCSDialog(self.appdata, self.centralWidget())
@@ -2163,35 +2367,37 @@ class MainWindow(QMainWindow):
         self.solver_status_symbol.setStyleSheet("color: black")
         self.solver_status_symbol.setText("?")
 
+    def show_thermodynamic_dialog(self, analysis_type: ThermodynamicAnalysisTypes):
+        # the dialogs are not modal so that several thermodynamic computations can run concurrently;
+        # they have to be kept in self to keep their computation threads
+        self.thermodynamic_dialogs = [d for d in self.thermodynamic_dialogs if d.isVisible() or d.is_running()]
+        dialog = ThermodynamicDialog(self.appdata, self.centralWidget(), analysis_type=analysis_type)
+        self.thermodynamic_dialogs.append(dialog)
+        dialog.show()
+
     @Slot()
     def perform_optmdfpathway(self):
-        # Has to be in self to keep computation thread
-        self.optmdfpathway_dialog = ThermodynamicDialog(
-            self.appdata,
-            self.centralWidget(),
-            analysis_type=ThermodynamicAnalysisTypes.OPTMDFPATHWAY
-        )
-        self.optmdfpathway_dialog.exec_()
+        self.show_thermodynamic_dialog(ThermodynamicAnalysisTypes.OPTMDFPATHWAY)
 
     @Slot()
     def perform_thermodynamic_fba(self):
-        # Has to be in self to keep computation thread
-        self.thermodynamic_fba_dialog = ThermodynamicDialog(
-            self.appdata,
-            self.centralWidget(),
-            analysis_type=ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA
-        )
-        self.thermodynamic_fba_dialog.exec_()
+        self.show_thermodynamic_dialog(ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA)
 
     @Slot()
     def perform_bottleneck_analysis(self):
-        # Has to be in self to keep computation thread
-        self.bottleneck_dialog = ThermodynamicDialog(
-            self.appdata,
-            self.centralWidget(),
-            analysis_type=ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS
-        )
-        self.bottleneck_dialog.exec_()
+        self.show_thermodynamic_dialog(ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS)
+
+    @Slot()
+    def perform_thermodynamic_variability_analysis(self):
+        self.show_thermodynamic_dialog(ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS)
+
+    @Slot()
+    def perform_mode_ranking(self):
+        if len(self.appdata.project.modes) == 0 or self.centralWidget().mode_navigator.mode_type == 1:
+            QMessageBox.information(self, "No modes to rank",
+                                    "Compute or load elementary modes or strain designs first.")
+            return
+        self.show_thermodynamic_dialog(ThermodynamicAnalysisTypes.MODE_RANKING)
 
     def _load_json(self) -> Dict[Any, Any]:
         dialog = QFileDialog(self)
@@ -2462,3 +2668,55 @@ class MainWindow(QMainWindow):
     @Slot()
     def reload_scenario(self):
         self.load_scenario_file(self.appdata.project.scen_values.file_name)
+
+
+class FVAComputationThread(QThread):
+    def __init__(self, model, fraction_of_optimum, reaction_list, results_cache_dir, fva_hash, state, loopless):
+        super().__init__()
+        self.model = model
+        self.fraction_of_optimum = fraction_of_optimum
+        self.reaction_list = reaction_list
+        self.results_cache_dir = results_cache_dir
+        self.fva_hash = fva_hash
+        self.state = state
+        self.loopless = loopless
+        self.solution = None
+        self.infeasible = False
+        self.exception = None
+
+    def run(self):
+        try:
+            self.solution = flux_variability_analysis(self.model, fraction_of_optimum=self.fraction_of_optimum,
+                results_cache_dir=self.results_cache_dir, fva_hash=self.fva_hash,
+                print_func=lambda *txt: self.send_progress_text.emit(' '.join(list(txt))),
+                state=self.state, reaction_list=self.reaction_list, loopless=self.loopless,
+                result_callback=self.send_reaction_result.emit)
+        except cobra.exceptions.Infeasible:
+            self.infeasible = True
+        except Exception:
+            self.exception = get_last_exception_string()
+        self.finished_computation.emit()
+
+    # the results are passed as signals because the Qt widgets must only be updated on the main thread
+    send_reaction_result = Signal(str, float, float)
+    send_progress_text = Signal(str)
+    finished_computation = Signal()
+
+
+class FluxCouplingThread(QThread):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.result = None
+        self.exception = None
+
+    def run(self):
+        try:
+            self.result = flux_coupling_analysis(self.model,
+                print_func=lambda *txt: self.send_progress_text.emit(' '.join(list(txt))))
+        except Exception:
+            self.exception = get_last_exception_string()
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    finished_computation = Signal()
@@ -3,7 +3,7 @@
 import io
 import scipy
 
-from qtpy.QtCore import Qt, Slot
+from qtpy.QtCore import Qt, QThread, Signal, Slot
 from qtpy.QtWidgets import (QButtonGroup, QCheckBox, QComboBox, QCompleter,
                             QDialog, QGroupBox, QHBoxLayout, QHeaderView,
                             QLabel, QLineEdit, QMessageBox, QPushButton,
@@ -15,6 +15,9 @@ from cnapy.appdata import AppData
 import cnapy.utils as utils
 from cnapy.utils import QComplReceivLineEdit
 from cnapy.flux_vector_container import FluxVectorContainer
+from cnapy.core import NoTargetModes, mcs_from_efms
+from cnapy.mcs_enumeration import parallel_mcs_computation
+from cnapy.blocked_reactions import get_blocked_reactions, referenced_reactions, remove_blocked_reactions
 from cnapy.core_gui import except_likely_community_model_error, get_last_exception_string, has_community_error_substring
 
 
@@ -165,6 +168,21 @@ class MCSDialog(QDialog):
         self.mcs_continuous_search = QRadioButton("continuous search")
         s34.addWidget(self.mcs_continuous_search)
         self.bg2.addButton(self.mcs_continuous_search)
+
+        # Search type: smallest first in worker processes, checkpointed so that it can be resumed
+        self.mcs_parallel = QRadioButton("smallest first (parallel, resumable)")
+        self.mcs_parallel.setToolTip("Enumerates the MCS in background processes, cardinality by cardinality.\n"
+                                     "Repeating the computation with the same setup continues from the MCS that\n"
+                                     "were found before, e.g. after an abort or with a larger max. size.")
+        s34.addWidget(self.mcs_parallel)
+        self.bg2.addButton(self.mcs_parallel)
+
+        # Search type: minimal hitting sets of the currently loaded EFMs
+        self.mcs_from_efms = QRadioButton("from current EFMs")
+        s34.addWidget(self.mcs_from_efms)
+        self.bg2.addButton(self.mcs_from_efms)
+        self.mcs_from_efms.setEnabled(self.central_widget.mode_navigator.mode_type == 0 and
+                                      len(self.appdata.project.modes) > 0)
         g4.setLayout(s34)
 
         s3.addWidget(g4)
@@ -176,6 +194,10 @@ class MCSDialog(QDialog):
         self.consider_scenario = QCheckBox(
             "Consider constraint given by scenario")
         s4.addWidget(self.consider_scenario)
+        self.remove_blocked = QCheckBox(
+            "Remove blocked reactions before the computation")
+        self.remove_blocked.setChecked(True)
+        s4.addWidget(self.remove_blocked)
         self.layout.addItem(s4)
 
         buttons = QHBoxLayout()
@@ -309,6 +331,15 @@ class MCSDialog(QDialog):
                     r.upper_bound = cobra.Configuration().upper_bound
                     r.set_hash_value()
                     update_stoichiometry_hash = True
+            # the EFMs refer to the full network and are therefore not pruned
+            if self.remove_blocked.isChecked() and not self.mcs_from_efms.isChecked():
+                blocked = get_blocked_reactions(model, results_cache_dir=self.appdata.results_cache_dir
+                                                if self.appdata.use_results_cache else None)
+                regions_text = " ".join(table.cellWidget(i, 1).text() for table in (self.target_list, self.desired_list)
+                                        for i in range(table.rowCount()))
+                if len(remove_blocked_reactions(model, blocked,
+                                             protected=referenced_reactions(regions_text, blocked))) > 0:
+                    update_stoichiometry_hash = True
             if self.appdata.use_results_cache and update_stoichiometry_hash:
                 model.set_stoichiometry_hash_object()
             reac_id = model.reactions.list_attr("id")
@@ -379,28 +410,96 @@ class MCSDialog(QDialog):
                     )
                     return
 
-            self.setCursor(Qt.BusyCursor)
-            try:
-                mcs, err_val = mcs_computation.compute_mcs(model,
-                                targets=targets, desired=desired, enum_method=enum_method,
-                                max_mcs_size=max_mcs_size, max_mcs_num=max_mcs_num, timeout=timeout,
-                                exclude_boundary_reactions_as_cuts=self.exclude_boundary.isChecked(),
-                                results_cache_dir=self.appdata.results_cache_dir
-                                if self.appdata.use_results_cache else None)
-            except mcs_computation.InfeasibleRegion as e:
-                QMessageBox.warning(self, 'Cannot calculate MCS', str(e))
+            if self.mcs_parallel.isChecked():
+                if self.appdata.use_results_cache:
+                    checkpoint_dir = str(self.appdata.results_cache_dir)
+                else:
+                    checkpoint_dir = self.appdata.work_directory
+                # the thread works on a copy because the scenario is only loaded within this context
+                self.mcs_computation = MCSComputationThread(cobra.io.from_json(cobra.io.to_json(model)),
+                                                            targets, desired, max_mcs_size, max_mcs_num, timeout,
+                                                            self.exclude_boundary.isChecked(), checkpoint_dir)
+                self.setCursor(Qt.BusyCursor)
+                self.compute_mcs.setText("Abort computation")
+                self.compute_mcs.clicked.disconnect(self.compute)
+                self.compute_mcs.clicked.connect(self.mcs_computation.activate_abort)
+                self.rejected.connect(self.mcs_computation.activate_abort)
+                self.cancel.setEnabled(False)
+                self.mcs_computation.finished_computation.connect(
+                    lambda: self.conclude_parallel_computation(reac_id))
+                self.mcs_computation.start()
                 return targets, desired
-            except Exception:
-                exstr = get_last_exception_string()
-                if has_community_error_substring(exstr):
-                    except_likely_community_model_error()
-                    return
+
+            self.setCursor(Qt.BusyCursor)
+            if self.mcs_from_efms.isChecked():
+                if self.exclude_boundary.isChecked():
+                    cuttable = [r.id for r in model.reactions if not r.boundary]
+                else:
+                    cuttable = None
+                try:
+                    mcs = mcs_from_efms(self.appdata.project.modes, targets, desired, reac_id,
+                                        max_mcs_size=max_mcs_size, cuttable=cuttable)
+                except NoTargetModes as e:
+                    QMessageBox.warning(self, 'No target modes', str(e))
+                    return targets, desired
+                except Exception:
+                    exstr = get_last_exception_string()
+                    print(exstr)
+                    utils.show_unknown_error_box(exstr)
+                    return targets, desired
+                finally:
+                    self.setCursor(Qt.ArrowCursor)
+                if max_mcs_num < len(mcs):
+                    mcs = mcs[:int(max_mcs_num)]
+                err_val = 0
+            else:
+                try:
+                    mcs, err_val = mcs_computation.compute_mcs(model,
+                                    targets=targets, desired=desired, enum_method=enum_method,
+                                    max_mcs_size=max_mcs_size, max_mcs_num=max_mcs_num, timeout=timeout,
+                                    exclude_boundary_reactions_as_cuts=self.exclude_boundary.isChecked(),
+                                    results_cache_dir=self.appdata.results_cache_dir
+                                    if self.appdata.use_results_cache else None)
+                except mcs_computation.InfeasibleRegion as e:
+                    QMessageBox.warning(self, 'Cannot calculate MCS', str(e))
+                    return targets, desired
+                except Exception:
+                    exstr = get_last_exception_string()
+                    if has_community_error_substring(exstr):
+                        except_likely_community_model_error()
+                        return
+                    print(exstr)
+                    utils.show_unknown_error_box(exstr)
+                    return targets, desired
+                finally:
+                    self.setCursor(Qt.ArrowCursor)
+
+        self.show_mcs(mcs, err_val, reac_id)
+
+    def conclude_parallel_computation(self, reac_id):
+        self.setCursor(Qt.ArrowCursor)
+        self.compute_mcs.setText("Compute MCS")
+        self.compute_mcs.clicked.disconnect(self.mcs_computation.activate_abort)
+        self.compute_mcs.clicked.connect(self.compute)
+        self.rejected.disconnect(self.mcs_computation.activate_abort)
+        self.cancel.setEnabled(True)
+        if self.mcs_computation.exception_string is not None:
+            exstr = self.mcs_computation.exception_string
+            if "InfeasibleRegion" in exstr:
+                QMessageBox.warning(self, 'Cannot calculate MCS', exstr.strip().split('\n')[-1])
+            elif has_community_error_substring(exstr):
+                except_likely_community_model_error()
+            else:
                 print(exstr)
                 utils.show_unknown_error_box(exstr)
-                return targets, desired
-            finally:
-                self.setCursor(Qt.ArrowCursor)
+        elif self.mcs_computation.abort:
+            QMessageBox.information(self, 'Computation aborted',
+                                    str(len(self.mcs_computation.mcs))+' MCS have been saved and the '
+                                    'computation can be resumed later.')
+        else:
+            self.show_mcs(self.mcs_computation.mcs, self.mcs_computation.err_val, reac_id)
 
+    def show_mcs(self, mcs, err_val, reac_id):
         print(err_val)
         if err_val == 1:
             QMessageBox.warning(self, "Enumeration stopped abnormally",
@@ -413,7 +512,7 @@ class MCSDialog(QDialog):
         if len(mcs) == 0:
             QMessageBox.information(self, 'No cut sets',
                                           'Cut sets have not been calculated or do not exist.')
-            return targets, desired
+            return
 
         # omcs = [{reac_id[i]: -1.0 for i in m} for m in mcs]
         omcs = scipy.sparse.lil_matrix((len(mcs), len(reac_id)))
@@ -452,3 +551,39 @@ class MCSDialog(QDialog):
                 errors += self.check_right_mcs_equation(desired_right)
 
         return errors
+
+
+class MCSComputationThread(QThread):
+    def __init__(self, model, targets, desired, max_mcs_size, max_mcs_num, timeout,
+                 exclude_boundary, checkpoint_dir):
+        super().__init__()
+        self.model = model
+        self.targets = targets
+        self.desired = desired
+        self.max_mcs_size = max_mcs_size
+        self.max_mcs_num = max_mcs_num
+        self.timeout = timeout
+        self.exclude_boundary = exclude_boundary
+        self.checkpoint_dir = checkpoint_dir
+        self.abort = False
+        self.mcs = []
+        self.err_val = 0
+        self.exception_string = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.mcs, self.err_val = parallel_mcs_computation(self.model, self.targets, self.desired,
+                                        self.max_mcs_size, max_mcs_num=self.max_mcs_num, timeout=self.timeout,
+                                        exclude_boundary_reactions_as_cuts=self.exclude_boundary,
+                                        checkpoint_dir=self.checkpoint_dir, abort_callback=self.do_abort)
+        except Exception:
+            self.exception_string = get_last_exception_string()
+        self.finished_computation.emit()
+
+    finished_computation = Signal()
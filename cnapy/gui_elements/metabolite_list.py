@@ -108,9 +108,15 @@ class MetaboliteList(QWidget):
         item.setText(MetaboliteListColumn.Id, metabolite.id)
         item.setText(MetaboliteListColumn.Name, metabolite.name)
         if metabolite.id in self.appdata.project.conc_values.keys():
-            item.setText(MetaboliteListColumn.Concentration, str(self.appdata.project.conc_values[metabolite.id]))
+            item.setText(MetaboliteListColumn.Concentration, self.concentration_text(metabolite.id))
         item.setData(3, 0, metabolite)
 
+    def concentration_text(self, metabolite_id: str) -> str:
+        concentration = self.appdata.project.conc_values[metabolite_id]
+        if isinstance(concentration, tuple): # range from a thermodynamic variability analysis
+            return str(concentration[0])+", "+str(concentration[1])
+        return str(concentration)
+
     def on_context_menu(self, point):
         if len(self.appdata.project.cobra_py_model.metabolites) > 0:
             self.pop_menu.exec_(self.mapToGlobal(point))
@@ -128,7 +134,7 @@ class MetaboliteList(QWidget):
                 item.setText(MetaboliteListColumn.Id, metabolite.id)
                 item.setText(MetaboliteListColumn.Name, metabolite.name)
                 if metabolite.id in self.appdata.project.conc_values.keys():
-                    item.setText(MetaboliteListColumn.Concentration, str(self.appdata.project.conc_values[metabolite.id]))
+                    item.setText(MetaboliteListColumn.Concentration, self.concentration_text(metabolite.id))
                 break
 
         self.last_selected = self.metabolite_mask.id.text()
@@ -4,13 +4,14 @@ from copy import deepcopy
 import matplotlib.pyplot as plt
 
 from qtpy.QtCore import Qt, Signal, Slot, QStringListModel
-from qtpy.QtGui import QIcon, QBrush, QColor
+from qtpy.QtGui import QIcon
 from qtpy.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QLabel, QPushButton,
                             QVBoxLayout, QWidget, QCompleter, QLineEdit, QMessageBox, QToolButton)
 
 
 from cnapy.appdata import AppData
-from cnapy.flux_vector_container import FluxVectorContainer
+from cnapy.flux_vector_container import FluxVectorContainer, FluxSampleMemmap, KnockoutScreenContainer, DynamicFBAContainer
+from cnapy.strain_design_file import save_strain_designs
 from cnapy.utils import QComplReceivLineEdit
 import zipfile
 import os
@@ -46,6 +47,8 @@ class ModeNavigator(QWidget):
         self.mode_type = 0 # EFM or some sort of flux vector
         self.scenario = {}
         self.modified_scenario = None
+        self.mode_mdf = None # OptMDF of the modes when they were ranked
+        self.order = None # order in which the modes are navigated, None for their original order
         self.setFixedHeight(70)
         self.layout = QVBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -65,6 +68,12 @@ class ModeNavigator(QWidget):
         self.size_histogram_button = QPushButton("Size histogram")
         self.normalization_button = QPushButton("Normalize to...")
         self.normalization_button.setVisible(False)
+        self.sample_ranges_button = QPushButton("Sample ranges")
+        self.sample_ranges_button.setToolTip("Show the range between the 5% and 95% quantiles of the flux samples")
+        self.sample_ranges_button.setVisible(False)
+        self.time_course_button = QPushButton("Time course")
+        self.time_course_button.setToolTip("Plot biomass and concentrations of the dynamic FBA")
+        self.time_course_button.setVisible(False)
 
         l1 = QHBoxLayout()
         self.title = QLabel("Mode Navigation")
@@ -94,6 +103,8 @@ class ModeNavigator(QWidget):
         l2.addWidget(self.reaction_participation_button)
         l2.addWidget(self.size_histogram_button)
         l2.addWidget(self.normalization_button)
+        l2.addWidget(self.sample_ranges_button)
+        l2.addWidget(self.time_course_button)
 
         self.layout.addLayout(l1)
         self.layout.addLayout(l2)
@@ -107,6 +118,7 @@ class ModeNavigator(QWidget):
         self.selector.findChild(QToolButton).triggered.connect(self.reset_selection) # findChild(QToolButton) retrieves the clear button
         self.size_histogram_button.clicked.connect(self.size_histogram)
         self.normalization_button.clicked.connect(self.normalization)
+        self.time_course_button.clicked.connect(self.time_course)
         self.central_widget.broadcastReactionID.connect(self.selector.receive_input)
 
     def update(self):
@@ -125,6 +137,13 @@ class ModeNavigator(QWidget):
                     txt = txt + " unbounded"
                 else:
                     txt = txt + " bounded"
+        if isinstance(self.appdata.project.modes, (KnockoutScreenContainer, DynamicFBAContainer)):
+            txt = txt + " " + self.appdata.project.modes.description(self.current)
+        if self.mode_mdf is not None:
+            if numpy.isnan(self.mode_mdf[self.current]):
+                txt = txt + " OptMDF: infeasible"
+            else:
+                txt = txt + " OptMDF: " + f"{self.mode_mdf[self.current]:.4g}" + " kJ/mol"
         self.label.setText(txt)
 
     def save_mcs(self):
@@ -160,7 +179,7 @@ class ModeNavigator(QWidget):
             return
         elif len(filename)<=4 or filename[-4:] != '.sds':
             filename += '.sds'
-        self.appdata.project.sd_solutions.save(filename)
+        save_strain_designs(filename, self.appdata.project.sd_solutions)
 
     def update_completion_list(self):
         reac_id = self.appdata.project.cobra_py_model.reactions.list_attr("id")
@@ -169,20 +188,30 @@ class ModeNavigator(QWidget):
     def set_to_mcs(self):
         self.central_widget.mode_normalization_reaction = ""
         self.mode_type = 1
-        self.title.setText("MCS Navigation")
         if self.save_button_connection is not None:
             self.save_button.clicked.disconnect(self.save_button_connection)
         self.save_button_connection = self.save_button.clicked.connect(self.save_mcs)
-        self.save_button.setToolTip("save minimal cut sets")
-        self.clear_button.setToolTip("clear minimal cut sets")
+        if isinstance(self.appdata.project.modes, KnockoutScreenContainer):
+            self.title.setText("Knock-out Navigation")
+            self.save_button.setToolTip("save knock-out screen")
+            self.clear_button.setToolTip("clear knock-out screen")
+        else:
+            self.title.setText("MCS Navigation")
+            self.save_button.setToolTip("save minimal cut sets")
+            self.clear_button.setToolTip("clear minimal cut sets")
         self.apply_button.setVisible(True)
         self.normalization_button.setVisible(False)
+        self.sample_ranges_button.setVisible(False)
+        self.time_course_button.setVisible(False)
         self.select_all()
         self.update_completion_list()
 
     def set_to_efm(self):
         self.mode_type = 0 # EFM or some sort of flux vector
-        self.title.setText("Mode Navigation")
+        if isinstance(self.appdata.project.modes, DynamicFBAContainer):
+            self.title.setText("Time Course Navigation")
+        else:
+            self.title.setText("Mode Navigation")
         if self.save_button_connection is not None:
             self.save_button.clicked.disconnect(self.save_button_connection)
         self.save_button_connection = self.save_button.clicked.connect(self.save_efm)
@@ -190,6 +219,8 @@ class ModeNavigator(QWidget):
         self.clear_button.setToolTip("clear modes")
         self.apply_button.setVisible(False)
         self.normalization_button.setVisible(True)
+        self.sample_ranges_button.setVisible(isinstance(self.appdata.project.modes, FluxSampleMemmap))
+        self.time_course_button.setVisible(isinstance(self.appdata.project.modes, DynamicFBAContainer))
         self.select_all()
         self.update_completion_list()
 
@@ -202,6 +233,8 @@ class ModeNavigator(QWidget):
         self.save_button.setToolTip("save strain designs")
         self.clear_button.setToolTip("clear strain designs")
         self.apply_button.setVisible(True)
+        self.sample_ranges_button.setVisible(False)
+        self.time_course_button.setVisible(False)
         self.select_all()
         self.update_completion_list()
 
@@ -226,29 +259,21 @@ class ModeNavigator(QWidget):
         self.appdata.modes_coloring = False
 
     def prev(self):
-        while True:
-            if self.current == 0:
-                self.current = len(self.appdata.project.modes)-1
-            else:
-                self.current -= 1
-            if self.selection[self.current]:
-                break
-        self.display_mode()
+        self.move(-1)
 
     def next(self):
+        self.move(1)
+
+    def move(self, step):
+        num_modes = len(self.appdata.project.modes)
+        position = self.current if self.order is None else self.rank[self.current]
         while True:
-            if self.current == len(self.appdata.project.modes)-1:
-                self.current = 0
-            else:
-                self.current += 1
+            position = (position + step) % num_modes
+            self.current = position if self.order is None else self.order[position]
             if self.selection[self.current]:
                 break
         self.display_mode()
 
-        for i in range (len(self.appdata.project.modes)):
-            values = self.appdata.project.modes[i]
-            print(values)
-
     def apply(self):
         self.appdata.scen_values_set_multiple(list(self.current_flux_values.keys()),
                                               list(self.current_flux_values.values()))
@@ -262,6 +287,27 @@ class ModeNavigator(QWidget):
         self.selection = numpy.ones(len(self.appdata.project.modes), dtype=numpy.bool)
         self.num_selected = len(self.appdata.project.modes)
         self.selector.setText("")
+        self.mode_mdf = None
+        self.order = None
+
+    def set_mode_mdf(self, mode_mdf: numpy.ndarray, min_mdf: float):
+        # navigate the modes by decreasing OptMDF and select those that reach min_mdf
+        self.mode_mdf = mode_mdf
+        self.order = numpy.argsort(-numpy.nan_to_num(mode_mdf, nan=-numpy.inf), kind="stable")
+        self.rank = numpy.empty_like(self.order)
+        self.rank[self.order] = numpy.arange(len(self.order))
+        self.selector.setText("")
+        self.selection = mode_mdf >= min_mdf # False where NaN
+        self.num_selected = numpy.sum(self.selection)
+        if self.num_selected == 0:
+            QMessageBox.information(self, "No mode selected", "No mode reaches the given MDF, therefore all modes remain selected.")
+            self.selection[:] = True
+            self.num_selected = len(self.appdata.project.modes)
+        self.current = self.order[0]
+        if self.selection[self.current]:
+            self.display_mode()
+        else:
+            self.next()
 
     def reset_selection(self):
         self.selector.accept_signal_input = False
@@ -290,7 +336,7 @@ class ModeNavigator(QWidget):
                 QMessageBox.information(self, "Selection not applied", "This selection is empty and was therefore not applied.")
                 self.reset_selection()
             else:
-                self.current = 0
+                self.current = 0 if self.order is None else self.order[0]
                 if self.selection[self.current]:
                     self.display_mode()
                 else:
@@ -325,31 +371,27 @@ class ModeNavigator(QWidget):
                         if selected and r in s and not numpy.any(numpy.isnan(s[r])) or numpy.all((s[r] == 0)):
                             self.selection[i] = False
             if self.appdata.window.sd_sols and self.appdata.window.sd_sols.__weakref__: # if dialog exists
-                for i in range(self.appdata.window.sd_sols.sd_table.rowCount()):
-                    r_sd_idx = int(self.appdata.window.sd_sols.sd_table.item(i,0).text())-1
-                    if self.selection[r_sd_idx]:
-                        self.appdata.window.sd_sols.sd_table.item(i,0).setForeground(QBrush(QColor(0, 0, 0)))
-                        self.appdata.window.sd_sols.sd_table.item(i,1).setForeground(QBrush(QColor(0, 0, 0)))
-                        if self.appdata.window.sd_sols.sd_table.columnCount() == 3:
-                            self.appdata.window.sd_sols.sd_table.item(i,2).setForeground(QBrush(QColor(0, 0, 0)))
-                    else:
-                        self.appdata.window.sd_sols.sd_table.item(i,0).setForeground(QBrush(QColor(200, 200, 200)))
-                        self.appdata.window.sd_sols.sd_table.item(i,1).setForeground(QBrush(QColor(200, 200, 200)))
-                        if self.appdata.window.sd_sols.sd_table.columnCount() == 3:
-                            self.appdata.window.sd_sols.sd_table.item(i,2).setForeground(QBrush(QColor(200, 200, 200)))
+                self.appdata.window.sd_sols.sd_table_model.set_selection(self.selection)
         self.num_selected = numpy.sum(self.selection)
 
     def size_histogram(self):
         if self.appdata.window.centralWidget().mode_navigator.mode_type <=1:
-            sizes = numpy.sum(self.appdata.project.modes.fv_mat[self.selection, :] != 0, axis=1)
-            if isinstance(sizes, numpy.matrix): # numpy.sum returns a matrix with one row when fv_mat is scipy.sparse
-                sizes = sizes.A1 # flatten into 1D array
+            sizes = []
+            for block in self.appdata.project.modes.row_blocks(self.selection):
+                block_sizes = numpy.sum(block != 0, axis=1)
+                if isinstance(block_sizes, numpy.matrix): # numpy.sum returns a matrix with one row when fv_mat is scipy.sparse
+                    block_sizes = block_sizes.A1 # flatten into 1D array
+                sizes.append(block_sizes)
+            sizes = numpy.concatenate(sizes)
         elif self.appdata.window.centralWidget().mode_navigator.mode_type == 2:
             sizes = [numpy.sum([not numpy.any(numpy.isnan(v)) or numpy.all((v == 0)) \
                                 for v in self.appdata.project.modes[i].values()]) for i,s in enumerate(self.selection) if s]
         plt.hist(sizes, bins="auto")
         plt.show()
 
+    def time_course(self):
+        self.appdata.project.modes.plot()
+
     def normalization(self):
         dialog = NormalizationDialog(self.appdata, self)
         dialog.exec_()
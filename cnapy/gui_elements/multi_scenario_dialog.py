@@ -0,0 +1,238 @@
+"""The cnapy dialog for the evaluation of multiple scenario files"""
+import os
+
+import numpy
+from qtpy.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, Signal, Slot
+from qtpy.QtWidgets import (QCheckBox, QComboBox, QDialog, QFileDialog, QHBoxLayout, QLabel, QMessageBox,
+                            QProgressBar, QPushButton, QTableView, QVBoxLayout, QTextEdit)
+
+from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
+from cnapy.multi_scenario import read_scenario_files, evaluate_scenarios, MultiScenarioResult, FBA, PFBA, FVA
+import cnapy.utils as utils
+
+
+class MultiScenarioTableModel(QAbstractTableModel):
+    """
+    Reactions x scenarios view of a MultiScenarioResult where the values that differ from the
+    reference scenario (or, without reference, the reactions that differ between the scenarios)
+    are highlighted. Only the visible cells are formatted which keeps large tables responsive.
+    """
+
+    def __init__(self, result: MultiScenarioResult, appdata: AppData):
+        super().__init__()
+        self.result = result
+        self.appdata = appdata
+        self.rows = numpy.arange(len(result.reac_id))
+        self.differs = None
+
+    def set_view(self, only_differing: bool, reference: int = None):
+        self.beginResetModel()
+        differs = self.result.differing(reference=reference)
+        if reference is None: # mark the whole row
+            differs = numpy.repeat(differs[:, None], len(self.result.scenario_names), axis=1)
+        self.rows = numpy.where(differs.any(axis=1))[0] if only_differing else numpy.arange(len(self.result.reac_id))
+        self.differs = differs
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.result.scenario_names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            lower = self.result.lower[row, column]
+            if numpy.isnan(lower):
+                return "-"
+            upper = self.result.upper[row, column]
+            if self.result.analysis == FVA:
+                return self.appdata.format_flux_value(lower)+", "+self.appdata.format_flux_value(upper)
+            return self.appdata.format_flux_value(lower)
+        if role == Qt.BackgroundRole and self.differs is not None and self.differs[row, column]:
+            return self.appdata.special_color_1
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            if role == Qt.DisplayRole:
+                return self.result.scenario_names[section]
+            if role == Qt.ToolTipRole:
+                return "Status: "+self.result.status[section]+"\nObjective value: "+ \
+                    self.appdata.format_flux_value(self.result.objective_values[section]) \
+                    if self.result.status[section] == 'optimal' else "Status: "+self.result.status[section]
+        elif role == Qt.DisplayRole:
+            return self.result.reac_id[self.rows[section]]
+        return None
+
+
+class MultiScenarioDialog(QDialog):
+    """A dialog to run FBA, pFBA or FVA for several scenario files and compare the results"""
+
+    def __init__(self, appdata: AppData):
+        QDialog.__init__(self)
+        self.setWindowTitle("Evaluate multiple scenarios")
+        self.resize(900, 600)
+
+        self.appdata = appdata
+        self.file_names = []
+        self.result = None
+
+        self.layout = QVBoxLayout()
+        l1 = QHBoxLayout()
+        self.select_files = QPushButton("Select scenario files...")
+        self.files_label = QLabel("No scenario files selected")
+        l1.addWidget(self.select_files)
+        l1.addWidget(self.files_label)
+        l1.addWidget(QLabel("Analysis"))
+        self.analysis = QComboBox()
+        self.analysis.addItems([FBA, PFBA, FVA])
+        l1.addWidget(self.analysis)
+        self.layout.addItem(l1)
+
+        self.text_field = QTextEdit("*** Multiple scenario evaluation output ***")
+        self.text_field.setReadOnly(True)
+        self.text_field.setMaximumHeight(100)
+        self.layout.addWidget(self.text_field)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        l2 = QHBoxLayout()
+        self.only_differing = QCheckBox("Only differing reactions")
+        self.only_differing.setChecked(True)
+        l2.addWidget(self.only_differing)
+        l2.addWidget(QLabel("Highlight differences to"))
+        self.reference = QComboBox()
+        l2.addWidget(self.reference)
+        self.layout.addItem(l2)
+        self.table = QTableView()
+        self.layout.addWidget(self.table)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.button.setEnabled(False)
+        self.save_button = QPushButton("Save as CSV...")
+        self.save_button.setEnabled(False)
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.save_button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+
+        self.setLayout(self.layout)
+
+        self.select_files.clicked.connect(self.choose_files)
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+        self.save_button.clicked.connect(self.save)
+        self.only_differing.stateChanged.connect(self.update_view)
+        self.reference.currentIndexChanged.connect(self.update_view)
+
+    def choose_files(self):
+        dialog = QFileDialog(self)
+        file_names: str = dialog.getOpenFileNames(
+            directory=self.appdata.last_scen_directory, filter="*.scen *.val")[0]
+        if len(file_names) > 0:
+            self.file_names = file_names
+            self.files_label.setText(str(len(file_names))+" scenario files selected")
+            self.button.setEnabled(True)
+
+    def compute(self):
+        reac_id = self.appdata.project.cobra_py_model.reactions.list_attr("id")
+        try:
+            scenarios = read_scenario_files(self.file_names, reac_id, print_func=self.text_field.append)
+        except Exception:
+            QMessageBox.warning(self, 'Could not read scenario files', get_last_exception_string())
+            return
+        model = self.appdata.project.cobra_py_model.copy()
+        model._stoichiometry_hash_object = None # not needed and cannot be pickled for the worker processes
+        self.setCursor(Qt.BusyCursor)
+        self.progress_bar.setMaximum(len(scenarios))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.evaluation = MultiScenarioThread(model, scenarios, [os.path.basename(f) for f in self.file_names],
+                                              self.analysis.currentText())
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.evaluation.activate_abort)
+        self.rejected.connect(self.evaluation.activate_abort) # for the X button of the window frame
+        self.evaluation.send_progress_text.connect(self.receive_progress_text)
+        self.evaluation.send_progress.connect(self.progress_bar.setValue)
+        self.evaluation.finished_computation.connect(self.conclude_computation)
+        self.evaluation.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        self.button.setText("Compute")
+        self.button.clicked.disconnect(self.evaluation.activate_abort)
+        self.button.clicked.connect(self.compute)
+        self.rejected.disconnect(self.evaluation.activate_abort)
+        self.progress_bar.hide()
+        if self.evaluation.abort:
+            self.text_field.append("Computation aborted.")
+        elif self.evaluation.result is None:
+            if self.evaluation.exception is not None:
+                utils.show_unknown_error_box(self.evaluation.exception)
+        else:
+            self.result = self.evaluation.result
+            self.table_model = MultiScenarioTableModel(self.result, self.appdata)
+            self.reference.blockSignals(True)
+            self.reference.clear()
+            self.reference.addItem("(differences between all scenarios)")
+            self.reference.addItems(self.result.scenario_names)
+            self.reference.blockSignals(False)
+            self.update_view()
+            self.table.setModel(self.table_model)
+            self.save_button.setEnabled(True)
+
+    def update_view(self):
+        if self.result is not None:
+            reference = self.reference.currentIndex() - 1
+            self.table_model.set_view(self.only_differing.isChecked(), reference if reference >= 0 else None)
+
+    def save(self):
+        dialog = QFileDialog(self)
+        filename: str = dialog.getSaveFileName(directory=self.appdata.work_directory, filter="*.csv")[0]
+        if not filename or len(filename) == 0:
+            return
+        self.result.to_dataframe().to_csv(filename)
+
+    @Slot(str)
+    def receive_progress_text(self, text):
+        self.text_field.append(text)
+
+
+class MultiScenarioThread(QThread):
+    def __init__(self, model, scenarios, scenario_names, analysis):
+        super().__init__()
+        self.model = model
+        self.scenarios = scenarios
+        self.scenario_names = scenario_names
+        self.analysis = analysis
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.result = evaluate_scenarios(self.model, self.scenarios, self.scenario_names, analysis=self.analysis,
+                                             print_func=self.send_progress_text.emit,
+                                             progress_callback=self.send_progress.emit, abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+            self.send_progress_text.emit(self.exception)
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
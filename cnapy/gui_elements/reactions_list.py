@@ -13,6 +13,7 @@ from qtpy.QtWidgets import (QHBoxLayout, QTreeWidget, QLabel, QLineEdit,
                             QAbstractItemView)
 
 from cnapy.appdata import AppData, ModelItemType
+from cnapy.flux_coupling import FluxCouplingResult
 from cnapy.gui_elements.annotation_widget import AnnotationWidget
 from cnapy.utils import SignalThrottler, turn_red, turn_white, update_selected
 from cnapy.utils_for_cnapy_api import check_identifiers_org_entry, check_in_identifiers_org
@@ -62,6 +63,7 @@ class ReactionListItem(QTreeWidgetItem):
         self.ub_val = float('inf')
         self.df_val = -float("inf")
         self.pin_at_top = False
+        self.coupling_shown = False # the background of the Id column shows the flux coupling
 
     def set_flux_data(self, text, value):
         self.setText(ReactionListColumn.Flux, text)
@@ -211,8 +213,44 @@ class ReactionList(QWidget):
         item.setBackground(ReactionListColumn.Scenario, scen_background_color)
         item.setText(ReactionListColumn.Scenario, scen_text)
         if item.reaction.id in self.appdata.project.df_values.keys():
-            item.setText(ReactionListColumn.DF, str(self.appdata.project.df_values[item.reaction.id]))
-            item.df_val = self.appdata.project.df_values[item.reaction.id]
+            df_value = self.appdata.project.df_values[item.reaction.id]
+            if isinstance(df_value, tuple): # range from a thermodynamic variability analysis
+                item.setText(ReactionListColumn.DF, str(df_value[0])+", "+str(df_value[1]))
+                item.df_val = df_value[0]
+            else:
+                item.setText(ReactionListColumn.DF, str(df_value))
+                item.df_val = df_value
+        self.set_coupling_color(item)
+
+    def set_coupling_color(self, item: ReactionListItem):
+        # reactions that are fully coupled get the same color, blocked reactions the default color
+        coupling = self.appdata.project.flux_coupling
+        if coupling is None and not item.coupling_shown:
+            return # leave the background as it is
+        item.coupling_shown = coupling is not None
+        if coupling is None:
+            item.update_tooltips() # remove the coupling information
+        background_color = QColor(75, 75, 75) if self.appdata.is_in_dark_mode else Qt.white
+        if coupling is not None and item.reaction.id in coupling.reac_idx:
+            c = coupling.fully_coupled_class[coupling.reac_idx[item.reaction.id]]
+            if c < 0:
+                background_color = self.appdata.default_color
+            elif coupling.class_size[c] > 1:
+                background_color = QColor.fromHsv((137*c) % 360, 80, 255)
+            item.update_tooltips()
+            text = item.toolTip(ReactionListColumn.Id) + "\n"
+            if c < 0:
+                text += "\nBlocked"
+            labels = {FluxCouplingResult.FULLY: "Fully coupled with: ",
+                      FluxCouplingResult.PARTIALLY: "Partially coupled with: ",
+                      FluxCouplingResult.DIRECTIONALLY: "Flux implies flux through: ",
+                      FluxCouplingResult.DIRECTIONALLY_REVERSE: "Flux is implied by flux through: "}
+            for coupling_type, reactions in coupling.coupled_reactions(item.reaction.id).items():
+                if len(reactions) > 0:
+                    text += "\n" + labels[coupling_type] + ", ".join(reactions[:10]) \
+                            + (", ..." if len(reactions) > 10 else "")
+            item.setToolTip(ReactionListColumn.Id, text)
+        item.setBackground(ReactionListColumn.Id, background_color)
 
     def set_flux_value(self, item: ReactionListItem):
         key = item.reaction.id
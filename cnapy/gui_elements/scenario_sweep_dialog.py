@@ -0,0 +1,216 @@
+"""The cnapy scenario sweep dialog"""
+from qtpy.QtCore import Qt, QThread, Signal, Slot
+from qtpy.QtWidgets import (QCheckBox, QComboBox, QDialog, QFileDialog, QGridLayout, QHBoxLayout, QLabel,
+                            QLineEdit, QMessageBox, QProgressBar, QPushButton, QVBoxLayout, QTextEdit)
+from straindesign import linexpr2dict
+
+from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
+from cnapy.scenario_sweep import scenario_sweep, FIXED, LOWER, UPPER
+import cnapy.utils as utils
+from cnapy.utils import QComplReceivLineEdit
+
+
+class ScenarioSweepDialog(QDialog):
+    """A dialog to scan the objective or the maximal yield over the bounds of one or two reactions"""
+
+    def __init__(self, appdata: AppData):
+        QDialog.__init__(self)
+        self.setWindowTitle("Scenario sweep")
+
+        self.appdata = appdata
+        self.reac_ids = self.appdata.project.cobra_py_model.reactions.list_attr("id")
+        self.result = None
+
+        self.layout = QVBoxLayout()
+        axes_layout = QGridLayout()
+        for column, text in enumerate(["", "Reaction", "Bound", "From", "To", "Points"]):
+            axes_layout.addWidget(QLabel(text), 0, column)
+        self.axes = []
+        for row in (1, 2):
+            use = QCheckBox("Axis "+str(row))
+            use.setChecked(row == 1)
+            use.setEnabled(row == 2)
+            reaction = QComplReceivLineEdit(self, self.reac_ids, check=False)
+            kind = QComboBox()
+            kind.addItems([FIXED, LOWER, UPPER])
+            kind.setToolTip("Fix the flux to the grid value or only set its lower/upper bound")
+            first = QLineEdit("0")
+            last = QLineEdit("10")
+            points = QLineEdit("11")
+            for column, widget in enumerate([use, reaction, kind, first, last, points]):
+                axes_layout.addWidget(widget, row, column)
+            self.axes.append((use, reaction, kind, first, last, points))
+        self.layout.addItem(axes_layout)
+
+        l1 = QHBoxLayout()
+        self.problem = QComboBox()
+        self.problem.addItems(["Objective of the scenario", "Maximal yield"])
+        self.problem.currentIndexChanged.connect(self.problem_changed)
+        l1.addWidget(self.problem)
+        self.numerator = QComplReceivLineEdit(self, self.reac_ids, check=True)
+        self.numerator.setPlaceholderText("numerator (e.g. 1.0 r_product)")
+        self.denominator = QComplReceivLineEdit(self, self.reac_ids, check=True)
+        self.denominator.setPlaceholderText("denominator (e.g. 1.0 r_substrate)")
+        l1.addWidget(self.numerator)
+        l1.addWidget(self.denominator)
+        self.layout.addItem(l1)
+        self.problem_changed()
+
+        l2 = QHBoxLayout()
+        l2.addWidget(QLabel("Record fluxes of"))
+        self.outputs = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        self.outputs.setPlaceholderText("Comma-separated reaction IDs (optional)")
+        l2.addWidget(self.outputs)
+        self.layout.addItem(l2)
+
+        self.text_field = QTextEdit("*** Scenario sweep output ***")
+        self.text_field.setReadOnly(True)
+        self.layout.addWidget(self.text_field)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.plot_button = QPushButton("Plot")
+        self.plot_button.setEnabled(False)
+        self.save_button = QPushButton("Save...")
+        self.save_button.setEnabled(False)
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.plot_button)
+        lx.addWidget(self.save_button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+
+        self.setLayout(self.layout)
+
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+        self.plot_button.clicked.connect(self.plot)
+        self.save_button.clicked.connect(self.save)
+
+    def problem_changed(self):
+        is_yield = self.problem.currentIndex() == 1
+        self.numerator.setVisible(is_yield)
+        self.denominator.setVisible(is_yield)
+
+    def compute(self):
+        try:
+            axes = []
+            for (use, reaction, kind, first, last, points) in self.axes:
+                if use.isChecked():
+                    if reaction.text().strip() not in self.reac_ids:
+                        raise ValueError("Unknown reaction ID: "+reaction.text())
+                    axes.append((reaction.text().strip(), float(first.text()), float(last.text()),
+                                 int(points.text()), kind.currentText()))
+                    if axes[-1][3] < 1:
+                        raise ValueError("The number of points must be positive.")
+            if len(axes) == 0:
+                raise ValueError("Select at least one axis.")
+            if len(axes) == 2 and axes[0][0] == axes[1][0]:
+                raise ValueError("The two axes must use different reactions.")
+            outputs = [r.strip() for r in self.outputs.text().split(",") if len(r.strip()) > 0]
+            unknown = [r for r in outputs if r not in self.reac_ids]
+            if len(unknown) > 0:
+                raise ValueError("Unknown reaction IDs: "+", ".join(unknown))
+            if self.problem.currentIndex() == 1:
+                numerator = linexpr2dict(self.numerator.text(), self.reac_ids)
+                denominator = linexpr2dict(self.denominator.text(), self.reac_ids)
+            else:
+                numerator = None
+                denominator = None
+        except Exception as e:
+            QMessageBox.warning(self, 'Invalid input', str(e))
+            return
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            model = model.copy() # the sweep runs in the background
+        model._stoichiometry_hash_object = None # not needed and cannot be pickled for the worker processes
+        self.setCursor(Qt.BusyCursor)
+        num_points = 1
+        for axis in axes:
+            num_points *= axis[3]
+        self.progress_bar.setMaximum(num_points)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.sweep = ScenarioSweepThread(model, axes, outputs, numerator, denominator)
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.sweep.activate_abort)
+        self.rejected.connect(self.sweep.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.sweep.send_progress_text.connect(self.receive_progress_text)
+        self.sweep.send_progress.connect(self.progress_bar.setValue)
+        self.sweep.finished_computation.connect(self.conclude_computation)
+        self.sweep.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        self.button.setText("Compute")
+        self.button.clicked.disconnect(self.sweep.activate_abort)
+        self.button.clicked.connect(self.compute)
+        self.rejected.disconnect(self.sweep.activate_abort)
+        self.cancel.show()
+        if self.sweep.abort:
+            self.text_field.append("Computation aborted.")
+        elif self.sweep.result is None:
+            if self.sweep.exception is not None:
+                utils.show_unknown_error_box(self.sweep.exception)
+        else:
+            self.result = self.sweep.result
+            self.plot_button.setEnabled(True)
+            self.save_button.setEnabled(True)
+            self.plot()
+
+    def plot(self):
+        self.result.plot()
+
+    def save(self):
+        dialog = QFileDialog(self)
+        filename, selected_filter = dialog.getSaveFileName(
+            directory=self.appdata.work_directory, filter="*.csv;;*.npz")
+        if not filename or len(filename) == 0:
+            return
+        if "npz" in selected_filter:
+            self.result.save(filename)
+        else:
+            self.result.to_dataframe().to_csv(filename, index=False)
+
+    @Slot(str)
+    def receive_progress_text(self, text):
+        self.text_field.append(text)
+
+
+class ScenarioSweepThread(QThread):
+    def __init__(self, model, axes, outputs, numerator, denominator):
+        super().__init__()
+        self.model = model
+        self.axes = axes
+        self.outputs = outputs
+        self.numerator = numerator
+        self.denominator = denominator
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.result = scenario_sweep(self.model, self.axes, outputs=self.outputs, numerator=self.numerator,
+                                         denominator=self.denominator, print_func=self.send_progress_text.emit,
+                                         progress_callback=self.send_progress.emit, abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+            self.send_progress_text.emit(self.exception)
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
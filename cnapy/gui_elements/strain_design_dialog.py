@@ -4,29 +4,35 @@ from contextlib import redirect_stdout, redirect_stderr
 import io
 import json
 import os
-from typing import Dict
+from typing import Dict, List
 import pickle
 import traceback
 import numpy as np
-from qtpy.QtGui import QPalette
+from qtpy.QtGui import QColor, QPalette
 from straindesign import SDModule, lineqlist2str, linexprdict2str, compute_strain_designs, \
                                     linexpr2dict, select_solver
 from straindesign.names import *
 from straindesign.strainDesignSolutions import SDSolutions
 from random import randint
-from qtpy.QtCore import Qt, Slot, Signal, QThread
+from qtpy.QtCore import Qt, Slot, Signal, QThread, QAbstractTableModel, QModelIndex
 from qtpy.QtWidgets import (QButtonGroup, QCheckBox, QComboBox, QCompleter,
                             QDialog, QGroupBox, QHBoxLayout, QHeaderView, QAbstractButton,
                             QLabel, QLineEdit, QMessageBox, QPushButton, QApplication,
-                            QRadioButton, QTableWidget, QVBoxLayout, QSplitter,
-                            QWidget, QFileDialog, QTextEdit, QLayout, QScrollArea)
+                            QRadioButton, QTableWidget, QTableView, QVBoxLayout, QSplitter,
+                            QWidget, QFileDialog, QLayout, QScrollArea, QProgressBar)
 import optlang_enumerator.mcs_computation as mcs_computation
 import cobra
 from cobra.util.solver import interface_to_str
 from cnapy.appdata import AppData
+from cnapy.gui_elements.log_view import LogChannel, LogView
 from cnapy.gui_elements.solver_buttons import get_solver_buttons
 from cnapy.utils import QTableCopyable, QComplReceivLineEdit, QTableItem, show_unknown_error_box
 from cnapy.core_gui import get_last_exception_string, has_community_error_substring, except_likely_community_model_error
+from cnapy.blocked_reactions import get_blocked_reactions, network_hash, referenced_reactions, remove_blocked_reactions
+from cnapy.strain_design_file import (InterventionRows, StrainDesignFile, equivalence_classes,
+                                      save_strain_designs)
+from cnapy.strain_design_checkpoint import SDCheckpoint, checkpoint_file_name, sd_checkpointing
+from cnapy.strain_design_validation import validate_strain_designs
 import logging
 
 PROTECT_STR = 'Protect (MCS)'
@@ -291,6 +297,10 @@ class SDDialog(QDialog):
         " Use scenario")
         checkboxes_layout.addWidget(self.use_scenario)
 
+        self.remove_blocked = QCheckBox(" Remove blocked reactions")
+        self.remove_blocked.setChecked(True)
+        checkboxes_layout.addWidget(self.remove_blocked)
+
         max_solutions_layout = QHBoxLayout()
         l = QLabel(" Max. Solutions")
         self.max_solutions = QLineEdit("3")
@@ -1168,6 +1178,7 @@ class SDDialog(QDialog):
         # other parameters
         sd_setup.update({'gene_kos' : self.gen_kos.isChecked()})
         sd_setup.update({'use_scenario' : self.use_scenario.isChecked()})
+        sd_setup.update({'remove_blocked' : self.remove_blocked.isChecked()})
         sd_setup.update({MAX_SOLUTIONS : self.max_solutions.text()})
         sd_setup.update({MAX_COST : self.max_cost.text()})
         sd_setup.update({TIME_LIMIT : self.time_limit.text()})
@@ -1282,6 +1293,7 @@ class SDDialog(QDialog):
         # update checkboxes
         self.gen_kos.setChecked(sd_setup['gene_kos'])
         self.use_scenario.setChecked(sd_setup['use_scenario'])
+        self.remove_blocked.setChecked(sd_setup.get('remove_blocked', True))
         self.max_solutions.setText(sd_setup[MAX_SOLUTIONS])
         self.max_cost.setText(sd_setup[MAX_COST])
         self.time_limit.setText(sd_setup[TIME_LIMIT])
@@ -1547,7 +1559,7 @@ class SDComputationViewer(QDialog):
         self.setWindowTitle("Strain Design Computation")
         self.setMinimumWidth(620)
         self.layout = QVBoxLayout()
-        self.textbox = QTextEdit("Strain design computation progress:")
+        self.textbox = LogView("Strain design computation progress:")
         self.layout.addWidget(self.textbox)
 
         buttons_layout = QHBoxLayout()
@@ -1580,8 +1592,7 @@ class SDComputationViewer(QDialog):
     def receive_progress_text(self,txt):
         txt = txt.strip("\n\t\r ")
         if txt != "":
-            self.textbox.append(txt)
-            self.textbox.verticalScrollBar().setValue(self.textbox.verticalScrollBar().maximum())
+            self.textbox.append_text(txt)
 
     @Slot()
     def open_strain_design_dialog(self):
@@ -1604,15 +1615,17 @@ class SDComputationViewer(QDialog):
     cancel_computation = Signal()
 
 class SDComputationThread(QThread):
-    def __init__(self, appdata, sd_setup):
+    def __init__(self, appdata, sd_setup, log_channel: LogChannel):
         super().__init__()
         self.appdata = appdata
+        self.log_channel = log_channel
         self.abort = False
         self.sd_setup = json.loads(sd_setup)
         self.curr_threadID = self.currentThread()
         self.sd_setup.pop(MODEL_ID)
         adv = self.sd_setup.pop('advanced')
         self.gkos = self.sd_setup.pop('gene_kos')
+        self.remove_blocked = self.sd_setup.pop('remove_blocked', True)
         if not adv and self.gkos: # ensure that gene-kos are computed, even when the
             self.sd_setup[GKOCOST] = None # advanced-button wasn't clicked
         # for debugging purposes write computation setup to file
@@ -1631,11 +1644,36 @@ class SDComputationThread(QThread):
                     logger.setLevel('INFO')
                     if self.sd_setup.pop('use_scenario'):
                         self.appdata.project.load_scenario_into_model(model)
-                    
-                    sd_solutions = compute_strain_designs(
-                        model,
-                        **self.sd_setup,
-                    )
+                    if self.remove_blocked:
+                        # reactions that are referenced in the setup are kept even if they are blocked
+                        blocked = get_blocked_reactions(model, results_cache_dir=self.appdata.results_cache_dir
+                                                        if self.appdata.use_results_cache else None)
+                        removed = remove_blocked_reactions(
+                            model, blocked, protected=referenced_reactions(json.dumps(self.sd_setup), blocked))
+                        print("Removed", len(removed), "blocked reactions from the network.")
+
+                    checkpoint = None
+                    if self.appdata.use_sd_checkpoints:
+                        # a terminated or crashed computation of the same setup is resumed from its checkpoint
+                        key = network_hash(model, json.dumps(self.sd_setup, sort_keys=True).encode())
+                        try:
+                            directory = self.appdata.sd_checkpoint_directory()
+                        except OSError:
+                            print("Cannot create the checkpoint directory, the computation runs without checkpoint.")
+                        else:
+                            checkpoint = SDCheckpoint(os.path.join(directory, checkpoint_file_name(key)), key)
+                            if checkpoint.load():
+                                print("Found a checkpoint of this strain design computation in", checkpoint.filename)
+                            else:
+                                print("The checkpoint of this strain design computation is saved in",
+                                      checkpoint.filename)
+                    with sd_checkpointing(checkpoint):
+                        sd_solutions = compute_strain_designs(
+                            model,
+                            **self.sd_setup,
+                        )
+                    if checkpoint is not None:
+                        checkpoint.discard()
                     self.finished_computation.emit(pickle.dumps(sd_solutions))
             except Exception as e:
                 tb_str = ''.join(traceback.format_exception(None, e, e.__traceback__))
@@ -1647,24 +1685,311 @@ class SDComputationThread(QThread):
         # avoid that other threads use this as an output
         if self.curr_threadID == self.currentThread():
             if isinstance(input,str):
-                self.output_connector.emit(input)
+                self.log_channel.write(input)
             else:
-                self.output_connector.emit(str(input))
+                self.log_channel.write(str(input))
 
     def flush(self):
         pass
 
-    # the output from the strain design computation needs to be passed as a signal because
-    # all Qt widgets must run on the main thread and their methods cannot be safely called
-    # from other threads
-    output_connector = Signal(str)
+    # the output from the strain design computation is passed on in batches by the log channel
+    # because all Qt widgets must run on the main thread and their methods cannot be safely
+    # called from other threads
     finished_computation = Signal(bytes)
 
+def intervention_text(interventions: Dict[str, float]) -> str:
+    """The interventions as text: +r for knock-ins, -r for knock-outs and ∅r for knock-ins that were not made"""
+    return ", ".join(("+" if v > 0 else "-" if v < 0 else u'∅')+k for k, v in interventions.items())
+
+class SDTableModel(QAbstractTableModel):
+    """
+    The strain designs with their equivalence classes of reaction-phenotype interventions and the
+    validation results. The interventions are only formatted for the rows that are shown; texts that
+    are needed for sorting or filtering are cached. Sorting and filtering permute the rows.
+    """
+
+    def __init__(self, solutions, format_value):
+        super().__init__()
+        self.format_value = format_value
+        self.is_gene_sd = solutions.is_gene_sd
+        if self.is_gene_sd:
+            self.interventions = [solutions.gene_sd, solutions.reaction_sd]
+            self.labels = ["Equiv. class", "Intervention set", "Reaction-phenotype interventions"]
+            if isinstance(solutions, StrainDesignFile):
+                self.equiv_class = np.asarray(solutions.equiv_class)
+            else: # same classes as SDSolutions.get_gene_reac_sd_assoc_mark_no_ki() but without its quadratic search
+                self.equiv_class = equivalence_classes(solutions.reaction_sd)
+        else:
+            self.interventions = [solutions.reaction_sd]
+            self.labels = ["Equiv. class", "Intervention set"]
+            self.equiv_class = np.arange(len(solutions.reaction_sd))
+        # the first design of each class represents it
+        self.representative = np.unique(self.equiv_class, return_index=True)[1]
+        self.num_base_columns = len(self.labels)
+        self.texts = [None] * len(self.interventions)
+        self.order = np.arange(len(self.equiv_class))
+        self.rows = self.order
+        self.filter_terms = []
+        self.validation_labels = []
+        self.validation = np.zeros((len(self.representative), 0))
+        self.current = None
+        self.selection = None
+
+    def intervention_texts(self, column: int) -> List[str]:
+        if self.texts[column] is None:
+            self.texts[column] = [intervention_text(s) for s in self.interventions[column]]
+        return self.texts[column]
+
+    def text(self, design: int, column: int) -> str:
+        if column == 0:
+            return str(self.equiv_class[design]+1)
+        if column < self.num_base_columns:
+            if self.texts[column-1] is not None:
+                return self.texts[column-1][design]
+            return intervention_text(self.interventions[column-1][design])
+        value = self.validation[self.equiv_class[design], column-self.num_base_columns]
+        return "-" if np.isnan(value) else self.format_value(value)
+
+    def mode_index(self, row: int) -> int:
+        return int(self.equiv_class[self.rows[row]])
+
+    def set_validation(self, mode_indices: List[int], result):
+        """Adds the validation result (a DataFrame) of the equivalence classes with the mode_indices as columns"""
+        self.beginResetModel()
+        self.validation_labels = list(result.columns)
+        self.validation = np.full((len(self.representative), len(result.columns)), np.nan)
+        self.validation[mode_indices, :] = result.values
+        self.endResetModel()
+
+    def set_filter(self, text: str):
+        """Only the designs whose interventions contain all comma or space-separated terms of the text are shown."""
+        self.filter_terms = [t.lower() for t in text.replace(",", " ").split()]
+        self.update_rows()
+
+    def update_rows(self):
+        self.layoutAboutToBeChanged.emit()
+        if len(self.filter_terms) == 0:
+            self.rows = self.order
+        else:
+            texts = [" ".join(t).lower() for t in zip(*(self.intervention_texts(c) for c in range(len(self.texts))))]
+            shown = np.array([all(term in t for term in self.filter_terms) for t in texts], dtype=bool)
+            self.rows = self.order[shown[self.order]]
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0:
+            return
+        if column == 0 or column >= self.num_base_columns:
+            if column == 0:
+                keys = self.equiv_class.astype(float)
+            else:
+                keys = self.validation[self.equiv_class, column-self.num_base_columns]
+            self.order = np.argsort(keys, kind='stable')
+            num_nan = int(np.sum(np.isnan(keys))) # sorted to the end in both directions
+            if order == Qt.DescendingOrder:
+                self.order[:len(keys)-num_nan] = self.order[:len(keys)-num_nan][::-1]
+        else:
+            texts = self.intervention_texts(column-1)
+            self.order = np.array(sorted(range(len(texts)), key=texts.__getitem__,
+                                            reverse=order == Qt.DescendingOrder), dtype=int)
+        self.update_rows()
+
+    def set_current(self, current: int):
+        self.current = current
+        self.highlighting_changed()
+
+    def set_selection(self, selection: np.ndarray):
+        self.selection = selection
+        self.highlighting_changed()
+
+    def highlighting_changed(self):
+        if len(self.rows) > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows)-1, self.columnCount()-1),
+                                  [Qt.ForegroundRole, Qt.BackgroundRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return self.num_base_columns + len(self.validation_labels)
+
+    def data(self, index, role=Qt.DisplayRole):
+        design = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self.text(design, index.column())
+        if role == Qt.TextAlignmentRole:
+            if index.column() == 0:
+                return Qt.AlignCenter
+            if index.column() >= self.num_base_columns:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+        elif role == Qt.ForegroundRole:
+            if self.selection is not None and not self.selection[self.equiv_class[design]]:
+                return QColor(200, 200, 200)
+            return QColor(0, 0, 0)
+        elif role == Qt.BackgroundRole:
+            if self.equiv_class[design] == self.current:
+                return QColor(230, 230, 230)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return (self.labels + self.validation_labels)[section]
+        return None
+
+
+class SDTableView(QTableView):
+    """A table view from which the selected cells can be copied with Ctrl+C"""
+
+    def keyPressEvent(self, event):
+        super().keyPressEvent(event)
+        if event.key() == Qt.Key_C and (event.modifiers() & Qt.ControlModifier):
+            copied_cells = sorted(self.selectedIndexes(), key=lambda c: (c.row(), c.column()))
+            if len(copied_cells) == 0:
+                return
+            max_column = max(c.column() for c in copied_cells)
+            copy_text = ''
+            for c in copied_cells:
+                copy_text += str(self.model().data(c))
+                copy_text += '\n' if c.column() == max_column else '\t'
+            QApplication.clipboard().setText(copy_text)
+
+class SDValidationThread(QThread):
+    def __init__(self, model: cobra.Model, designs, product, substrate, fva_reactions):
+        super().__init__()
+        self.model = model
+        self.designs = designs
+        self.product = product
+        self.substrate = substrate
+        self.fva_reactions = fva_reactions
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def run(self):
+        try:
+            self.result = validate_strain_designs(self.model, self.designs, self.product, self.substrate,
+                                                  self.fva_reactions, print_func=self.send_progress_text.emit,
+                                                  progress_callback=self.send_progress.emit,
+                                                  abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
+
+class SDValidationDialog(QDialog):
+    """A dialog to compute growth, product yields and flux ranges of the strain designs"""
+    def __init__(self, appdata: AppData, viewer):
+        super().__init__()
+        self.setWindowTitle("Validate strain designs")
+        self.appdata = appdata
+        self.viewer = viewer
+        self.reac_ids = self.appdata.project.cobra_py_model.reactions.list_attr("id")
+
+        self.layout = QVBoxLayout()
+        self.layout.addWidget(QLabel("The growth rate is the optimum of the model objective. The yields are the "
+                                     "minimal yields at maximal growth and overall."))
+        l1 = QHBoxLayout()
+        l1.addWidget(QLabel("Product"))
+        self.product = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        self.product.setPlaceholderText("Flux expression (optional)")
+        l1.addWidget(self.product)
+        l1.addWidget(QLabel("Substrate"))
+        self.substrate = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        self.substrate.setPlaceholderText("e.g. -EX_glc__D_e (optional)")
+        l1.addWidget(self.substrate)
+        self.layout.addItem(l1)
+        l2 = QHBoxLayout()
+        l2.addWidget(QLabel("Flux ranges of"))
+        self.fva_reactions = QComplReceivLineEdit(self, self.reac_ids, check=False)
+        self.fva_reactions.setPlaceholderText("Comma-separated reaction IDs (optional)")
+        l2.addWidget(self.fva_reactions)
+        self.layout.addItem(l2)
+        self.only_selected = QCheckBox("Only the designs selected in the mode navigator")
+        self.layout.addWidget(self.only_selected)
+        self.use_scenario = QCheckBox("Use current scenario")
+        self.use_scenario.setChecked(True)
+        self.layout.addWidget(self.use_scenario)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
+        lx = QHBoxLayout()
+        self.button = QPushButton("Compute")
+        self.cancel = QPushButton("Close")
+        lx.addWidget(self.button)
+        lx.addWidget(self.cancel)
+        self.layout.addItem(lx)
+        self.setLayout(self.layout)
+
+        self.cancel.clicked.connect(self.reject)
+        self.button.clicked.connect(self.compute)
+
+    def compute(self):
+        try:
+            product = linexpr2dict(self.product.text(), self.reac_ids) if self.product.text().strip() else {}
+            substrate = linexpr2dict(self.substrate.text(), self.reac_ids) if self.substrate.text().strip() else {}
+        except Exception:
+            QMessageBox.warning(self, 'Invalid input', 'The product or substrate is not a valid flux expression.')
+            return
+        if len(substrate) > 0 and len(product) == 0:
+            QMessageBox.warning(self, 'Invalid input', 'A substrate requires a product.')
+            return
+        fva_reactions = [r.strip() for r in self.fva_reactions.text().split(",") if len(r.strip()) > 0]
+        unknown = [r for r in fva_reactions if r not in self.reac_ids]
+        if len(unknown) > 0:
+            QMessageBox.warning(self, 'Invalid input', 'Unknown reaction IDs: '+", ".join(unknown))
+            return
+        mode_navigator = self.appdata.window.centralWidget().mode_navigator
+        self.mode_indices = [i for i in range(len(self.appdata.project.modes))
+                             if not self.only_selected.isChecked() or mode_navigator.selection[i]]
+        with self.appdata.project.cobra_py_model as model:
+            if self.use_scenario.isChecked():
+                self.appdata.project.load_scenario_into_model(model)
+            model = model.copy() # the validation runs in the background
+        model._stoichiometry_hash_object = None # not needed and cannot be pickled for the worker processes
+        self.setCursor(Qt.BusyCursor)
+        self.progress_bar.setMaximum(len(self.mode_indices))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.validation = SDValidationThread(model, [self.appdata.project.modes[i] for i in self.mode_indices],
+                                             product, substrate, fva_reactions)
+        self.button.setText("Abort computation")
+        self.button.clicked.disconnect(self.compute)
+        self.button.clicked.connect(self.validation.activate_abort)
+        self.rejected.connect(self.validation.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.validation.send_progress_text.connect(self.appdata.window.statusBar().showMessage)
+        self.validation.send_progress.connect(self.progress_bar.setValue)
+        self.validation.finished_computation.connect(self.conclude_computation)
+        self.validation.start()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.validation.abort:
+            self.accept()
+        elif self.validation.result is None:
+            self.button.hide()
+            self.cancel.show()
+            if self.validation.exception is not None:
+                show_unknown_error_box(self.validation.exception)
+        else:
+            self.accept()
+            self.viewer.show_validation(self.mode_indices, self.validation.result)
+
 class SDViewer(QDialog):
     """A dialog that shows the results of the strain design computation"""
     def __init__(self, appdata: AppData, solutions, with_setup: bool):
         super().__init__()
-        if isinstance(solutions, SDSolutions):
+        if isinstance(solutions, (SDSolutions, StrainDesignFile)):
             self.solutions = solutions
             self.sd_setup = self.solutions.sd_setup
         else:
@@ -1691,15 +2016,30 @@ class SDViewer(QDialog):
 
         self.layout = QVBoxLayout()
 
-        if self.solutions.is_gene_sd:
-            self.sd_table = QTableCopyable(0, 3)
-        else:
-            self.sd_table = QTableCopyable(0, 2)
+        self.sd_table_model = SDTableModel(self.solutions, appdata.format_flux_value)
+        self.sd_table = SDTableView()
+        self.sd_table.setModel(self.sd_table_model)
         palette = QPalette()
         palette.setColor(QPalette.Text, Qt.black) # Text color in widgets
         self.sd_table.setPalette(palette)
         self.sd_table.verticalHeader().setDefaultSectionSize(20)
         self.sd_table.verticalHeader().setVisible(False)
+        self.sd_table.setMinimumWidth(320)
+        self.sd_table.setMinimumHeight(150)
+        self.sd_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
+        self.sd_table.horizontalHeader().resizeSection(0, 90)
+        if self.solutions.is_gene_sd:
+            self.sd_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Interactive)
+            self.sd_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        else:
+            self.sd_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.sd_table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        self.sd_table.setSortingEnabled(True)
+        self.filter = QLineEdit()
+        self.filter.setPlaceholderText("Filter interventions, e.g. -PFK +EX_o2_e")
+        self.filter.setClearButtonEnabled(True)
+        self.filter.textChanged.connect(self.sd_table_model.set_filter)
+        self.layout.addWidget(self.filter)
         self.layout.addWidget(self.sd_table)
 
         buttons_layout = QHBoxLayout()
@@ -1709,6 +2049,9 @@ class SDViewer(QDialog):
         self.savetsv = QPushButton("Save as tsv (tab separated values)")
         self.savetsv.clicked.connect(self.savesdtsv)
         self.savetsv.setMaximumWidth(230)
+        self.validate = QPushButton("Validate designs...")
+        self.validate.clicked.connect(self.open_validation_dialog)
+        self.validate.setMaximumWidth(130)
         self.edit = QPushButton("Discard solutions and edit setup")
         self.edit.clicked.connect(self.open_strain_design_dialog)
         self.edit.setMaximumWidth(200)
@@ -1717,94 +2060,22 @@ class SDViewer(QDialog):
         self.close_button.setMaximumWidth(75)
         buttons_layout.addWidget(self.savesds)
         buttons_layout.addWidget(self.savetsv)
+        buttons_layout.addWidget(self.validate)
         buttons_layout.addWidget(self.edit)
         buttons_layout.addWidget(self.close_button)
         self.layout.addItem(buttons_layout)
 
-        if self.solutions.is_gene_sd:
-            (rsd,self.assoc,gsd) = self.solutions.get_gene_reac_sd_assoc_mark_no_ki()
-        else:
-            rsd = self.solutions.get_reaction_sd_mark_no_ki()
-            self.assoc = [i for i in range(len(rsd))]
         itv_bounds = self.solutions.get_reaction_sd_bnds()
-        appdata.project.modes = [itv_bounds[self.assoc.index(i)] for i in set(self.assoc)]
+        if isinstance(itv_bounds, InterventionRows):
+            appdata.project.modes = itv_bounds.subset(self.sd_table_model.representative)
+        else:
+            appdata.project.modes = [itv_bounds[i] for i in self.sd_table_model.representative]
         central_widget = appdata.window.centralWidget()
         central_widget.mode_navigator.current = 0
         central_widget.mode_navigator.set_to_strain_design()
         central_widget.update_mode()
+        self.sd_table_model.current = 0
 
-        # prepare strain designs
-        if self.solutions.is_gene_sd:
-            self.sd_table.setMinimumWidth(320)
-            self.sd_table.setMinimumHeight(150)
-            self.sd_table.setHorizontalHeaderLabels(["Equiv. class","Intervention set",\
-                                                     "Reaction-phenotype interventions"])
-            self.sd_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
-            self.sd_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Interactive)
-            self.sd_table.horizontalHeader().resizeSection(0, 90)
-            self.sd_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-            self.rsd = ["" for _ in range(len(rsd))]
-            for i,s in enumerate(rsd):
-                for k,v in s.items():
-                    if v > 0:
-                        self.rsd[i] += "+"+k
-                    elif v < 0:
-                        self.rsd[i] += "-"+k
-                    elif v == 0:
-                        self.rsd[i] += u'\u2205'+k
-                    self.rsd[i] += ", "
-                self.rsd[i] = self.rsd[i][0:-2]
-            self.gsd = ["" for _ in range(len(gsd))]
-            for i,s in enumerate(gsd):
-                for k,v in s.items():
-                    if v > 0:
-                        self.gsd[i] += "+"+k
-                    elif v < 0:
-                        self.gsd[i] += "-"+k
-                    elif v == 0:
-                        self.gsd[i] += u'\u2205'+k
-                    self.gsd[i] += ", "
-                self.gsd[i] = self.gsd[i][0:-2]
-            for i,a,g in zip(range(len(self.gsd)), self.assoc, self.gsd):
-                self.sd_table.insertRow(i)
-                item = QTableItem(str(a+1))
-                item.setEditable(False)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.sd_table.setItem(i, 0, item)
-                # set non-editable
-                item = QTableItem(g)
-                item.setEditable(False)
-                self.sd_table.setItem(i, 1, item)
-                item = QTableItem(self.rsd[a])
-                item.setEditable(False)
-                self.sd_table.setItem(i, 2, item)
-        else:
-            self.rsd = ["" for _ in range(len(rsd))]
-            for i,s in enumerate(rsd):
-                for k,v in s.items():
-                    if v > 0:
-                        self.rsd[i] += "+"+k
-                    elif v < 0:
-                        self.rsd[i] += "-"+k
-                    elif v == 0:
-                        self.rsd[i] += u'\u2205'+k
-                    self.rsd[i] += ", "
-                self.rsd[i] = self.rsd[i][0:-2]
-            self.sd_table.setMinimumWidth(320)
-            self.sd_table.setMinimumHeight(150)
-            self.sd_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Fixed)
-            self.sd_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-            self.sd_table.horizontalHeader().resizeSection(0, 90)
-            self.sd_table.setHorizontalHeaderLabels(["Equiv. class","Intervention set"])
-            for i,s in enumerate(self.rsd):
-                self.sd_table.insertRow(i)
-                item = QTableItem(str(i+1))
-                item.setEditable(False)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.sd_table.setItem(i, 0, item)
-                item = QTableItem(s)
-                item.setEditable(False)
-                self.sd_table.setItem(i, 1, item)
         self.sd_table.doubleClicked.connect(self.clicked_row)
         self.setLayout(self.layout)
         self.show()
@@ -1815,10 +2086,21 @@ class SDViewer(QDialog):
                                          "in the network map. Please refer to table.")
     def clicked_row(self,cell):
         row = cell.row()
-        selection = int(self.sd_table.item(row,0).text())-1
+        selection = self.sd_table_model.mode_index(row)
         self.appdata.window.centralWidget().mode_navigator.current = selection
         self.appdata.window.centralWidget().update_mode()
 
+    @Slot()
+    def open_validation_dialog(self):
+        dialog = SDValidationDialog(self.appdata, self)
+        dialog.exec_()
+
+    def show_validation(self, mode_indices, result):
+        """Shows the validation result of the designs with the mode_indices as additional, sortable columns"""
+        self.sd_table_model.set_validation(mode_indices, result)
+        for j in range(self.sd_table_model.num_base_columns, self.sd_table_model.columnCount()):
+            self.sd_table.horizontalHeader().setSectionResizeMode(j, QHeaderView.ResizeToContents)
+
     def closediag(self):
         self.appdata.window.sd_sols = None
         self.deleteLater()
@@ -1834,10 +2116,12 @@ class SDViewer(QDialog):
         elif len(filename)<=4 or filename[-4:] != '.tsv':
             filename += '.tsv'
         # save strain design list to Excel file
+        rsd = self.sd_table_model.intervention_texts(-1)
         if self.solutions.is_gene_sd:
-            sd_string = "\n".join(["\t".join([str(a),g,self.rsd[a]]) for a,g in zip(self.assoc, self.gsd)])
+            gsd = self.sd_table_model.intervention_texts(0)
+            sd_string = "\n".join(["\t".join([str(a),g,r]) for a,g,r in zip(self.sd_table_model.equiv_class, gsd, rsd)])
         else:
-            sd_string = "\n".join(self.rsd)
+            sd_string = "\n".join(rsd)
         with open(filename,'w') as fs:
             fs.write(sd_string)
 
@@ -1850,7 +2134,7 @@ class SDViewer(QDialog):
             return
         elif len(filename)<=4 or filename[-4:] != '.sds':
             filename += '.sds'
-        self.solutions.save(filename)
+        save_strain_designs(filename, self.solutions)
 
     @Slot()
     def open_strain_design_dialog(self):
@@ -1,35 +1,31 @@
 """The CNApy OptMDFpathway dialog"""
+import copy
 import cobra
 import cobra.util.solver
 from numpy import exp
-from qtpy.QtCore import Qt, Slot
+from qtpy.QtCore import Qt, QThread, Signal, Slot
 from qtpy.QtWidgets import (
     QDialog,
     QHBoxLayout,
     QLabel,
     QLineEdit,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QVBoxLayout,
     QGroupBox,
 )
 
 from cnapy.appdata import AppData
+from cnapy.core_gui import get_last_exception_string
 from cnapy.gui_elements.central_widget import CentralWidget
 from cnapy.gui_elements.solver_buttons import get_solver_buttons
-from enum import Enum
+import cnapy.utils as utils
 from cobrak.constants import LNCONC_VAR_PREFIX, DF_VAR_PREFIX, MDF_VAR_ID, ALL_OK_KEY, OBJECTIVE_VAR_NAME, TERMINATION_CONDITION_KEY
-from cobrak.dataclasses import ExtraLinearConstraint, Solver
-from cobrak.lps import perform_lp_optimization, perform_lp_thermodynamic_bottleneck_analysis
-from cobrak.io import load_annotated_cobrapy_model_as_cobrak_model
-from cobrak.cobrapy_model_functionality import get_fullsplit_cobra_model
-
-
-
-class ThermodynamicAnalysisTypes(Enum):
-    OPTMDFPATHWAY = 1
-    THERMODYNAMIC_FBA = 2
-    BOTTLENECK_ANALYSIS = 3
+from cnapy.thermodynamics import (FWD_SUFFIX, REV_SUFFIX, ThermodynamicAnalysisTypes, flux_vector_restrictions,
+                                  scenario_constraints_to_cobrak, strain_design_restrictions,
+                                  thermodynamic_analysis_in_worker, thermodynamic_mode_ranking,
+                                  thermodynamic_variability_analysis, variability_targets)
 
 
 class ThermodynamicDialog(QDialog):
@@ -38,8 +34,8 @@ class ThermodynamicDialog(QDialog):
     def __init__(
         self, appdata: AppData, central_widget: CentralWidget, analysis_type: ThermodynamicAnalysisTypes
     ) -> None:
-        self.FWDID = "_FWDCNAPY"
-        self.REVID = "_REVCNAPY"
+        self.FWDID = FWD_SUFFIX
+        self.REVID = REV_SUFFIX
 
         QDialog.__init__(self)
         if analysis_type == ThermodynamicAnalysisTypes.OPTMDFPATHWAY:
@@ -48,11 +44,16 @@ class ThermodynamicDialog(QDialog):
             window_title = "Perform OptMDFpathway bottleneck analysis"
         elif analysis_type == ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA:
             window_title = "Perform thermodynamic FBA"
+        elif analysis_type == ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS:
+            window_title = "Perform thermodynamic variability analysis"
+        elif analysis_type == ThermodynamicAnalysisTypes.MODE_RANKING:
+            window_title = "Rank modes by OptMDF"
         self.setWindowTitle(window_title)
 
         self.appdata = appdata
         self.central_widget = central_widget
         self.analysis_type = analysis_type
+        self.computation = None
 
         self.reac_ids = self.appdata.project.cobra_py_model.reactions.list_attr("id")
         self.metabolite_ids = self.appdata.project.cobra_py_model.metabolites.list_attr(
@@ -80,9 +81,23 @@ class ThermodynamicDialog(QDialog):
                     "ranges have to be given in relevant annotations.\nThe minimal amount of bottlenecks and their IDs "
                     "to reach the given minimal MDF will be shown in the console afterwards."
                 )
+            case ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS:
+                label = QLabel(
+                    "Perform thermodynamic variability analysis. Determines the ranges of the driving forces and metabolite "
+                    "concentrations at which the MDF is at least the given value.\nFor this analysis, ΔG'° values and "
+                    "metabolite concentration ranges have to be given in relevant annotations.\nThe ranges will be shown "
+                    "in the reaction and metabolite lists."
+                )
+            case ThermodynamicAnalysisTypes.MODE_RANKING:
+                label = QLabel(
+                    "Compute the OptMDF of every elementary mode or strain design in the mode navigator. The modes "
+                    "are then navigated in the order of decreasing OptMDF\nand only those that reach the given MDF "
+                    "remain selected. For this analysis, ΔG'° values and metabolite concentration ranges have to be "
+                    "given in relevant annotations."
+                )
         self.layout.addWidget(label)
 
-        if (analysis_type == ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS) or (analysis_type == ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA):
+        if analysis_type != ThermodynamicAnalysisTypes.OPTMDFPATHWAY:
             lineedit_text = QLabel("MDF to reach [in kJ/mol]:")
 
             min_mdf_layout = QHBoxLayout()
@@ -119,6 +134,10 @@ class ThermodynamicDialog(QDialog):
         solver_group.setLayout(solver_buttons_layout)
         self.layout.addWidget(solver_group)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        self.layout.addWidget(self.progress_bar)
+
         l3 = QHBoxLayout()
         self.button_optmdf = QPushButton("Compute")
         self.cancel = QPushButton("Close")
@@ -181,32 +200,6 @@ class ThermodynamicDialog(QDialog):
     def compute_optmdf(self):
         self.setCursor(Qt.BusyCursor)
 
-        # Decouple models ("with" and "deepcopy" do not work) so that no
-        # extra COBRA-k annotation spills into the original model
-        modelstr = cobra.io.to_json(self.appdata.project.cobra_py_model)
-        model = cobra.io.from_json(modelstr)
-
-        self.appdata.project.load_scenario_into_model(model)
-
-        extra_linear_constraints: list[ExtraLinearConstraint] = []
-        for constraint in self.appdata.project.scen_values.constraints:
-            # e.g., [({'EDD': 1.0}, '>=', 1.0)]
-            extra_linear_constraint = ExtraLinearConstraint(
-                stoichiometries={key: value for key, value in constraint[0].items()},
-            )
-
-            direction = constraint[1]
-            rhs = constraint[2]
-            if direction == ">=":
-                extra_linear_constraint.lower_value = rhs
-            elif direction == "<=":
-                extra_linear_constraint.upper_value = rhs
-            else:  # == "="
-                extra_linear_constraint.lower_value = rhs
-                extra_linear_constraint.upper_value = rhs
-
-            extra_linear_constraints.append(extra_linear_constraint)
-
         solver_name = self.solver_buttons["group"].checkedButton().property("cobrak_name")
 
         if self.analysis_type == ThermodynamicAnalysisTypes.OPTMDFPATHWAY:
@@ -221,17 +214,26 @@ class ThermodynamicDialog(QDialog):
                     "The given minimal OptMDF could not be converted into a valid number (such as, e.g., 1.231)."
                     "Aborting calculation...",
                 )
+                self.setCursor(Qt.ArrowCursor)
                 return
 
-        match self.analysis_type:
-            case ThermodynamicAnalysisTypes.OPTMDFPATHWAY:
-                objective = {MDF_VAR_ID: 1}
-                direction = +1
-            case ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS:
-                objective = {"bottleneck_z_sum": 1}
-                direction = -1
-            case ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA:
-                objective = {}
+        try:
+            default_min_conc = float(self.min_default_conc.text())
+            default_max_conc = float(self.max_default_conc.text())
+        except ValueError:
+            QMessageBox.warning(
+                self,
+                "Invalid default concentration",
+                "The given default Cmin or Cmax could not be converted into a valid number (such as, e.g., 1e-6)."
+                "Aborting calculation...",
+            )
+            self.setCursor(Qt.ArrowCursor)
+            return
+
+        with self.appdata.project.cobra_py_model as model:
+            self.appdata.project.load_scenario_into_model(model)
+            objective = {}
+            if self.analysis_type == ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA:
                 for (
                     reaction,
                     coefficient,
@@ -241,22 +243,13 @@ class ThermodynamicDialog(QDialog):
                         objective[reaction.id + self.REVID] = -coefficient
                     else:
                         objective[reaction.id] = coefficient
-                direction = +1
-
-        cobrak_model = load_annotated_cobrapy_model_as_cobrak_model(
-            get_fullsplit_cobra_model(
+            # the prepared COBRA-k model is reused as long as only thermodynamic parameters change
+            cobrak_model = self.appdata.project.cobrak_model_cache.get(
                 model,
-                fwd_suffix=self.FWDID,
-                rev_suffix=self.REVID,
-                add_cobrak_sbml_annotation=True,
-                cobrak_default_min_conc=float(self.min_default_conc.text()),
-                cobrak_default_max_conc=float(self.max_default_conc.text()),
-                cobrak_extra_linear_constraints=extra_linear_constraints,
-                cobrak_kinetic_ignored_metabolites=[],
-                cobrak_no_extra_versions=True,
-                reac_lb_ub_cap=1_000.0,
+                scenario_constraints_to_cobrak(self.appdata.project.scen_values.constraints),
+                default_min_conc,
+                default_max_conc,
             )
-        )
 
         if all(cobrak_model.reactions[reac_id].dG0 is None for reac_id in cobrak_model.reactions):
             QMessageBox.warning(
@@ -267,32 +260,71 @@ class ThermodynamicDialog(QDialog):
             )
             self.setCursor(Qt.ArrowCursor)
             return
-        if self.analysis_type in (ThermodynamicAnalysisTypes.OPTMDFPATHWAY, ThermodynamicAnalysisTypes.THERMODYNAMIC_FBA):
-            solution = perform_lp_optimization(
-                cobrak_model=cobrak_model,
-                objective_target=objective,
-                objective_sense=direction,
-                with_enzyme_constraints=False,
-                with_thermodynamic_constraints=True,
-                with_loop_constraints=False,
-                min_mdf=min_mdf,
-                solver=Solver(name=solver_name),
-                verbose=True,
-            )
-        elif self.analysis_type == ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS:
-            bottlenecks, solution = perform_lp_thermodynamic_bottleneck_analysis(
-                cobrak_model=cobrak_model,
-                with_enzyme_constraints=False,
-                min_mdf=min_mdf,
-                solver=Solver(name=solver_name),
-                verbose=True,
-            )
-            if solution != {}:
-                solution[ALL_OK_KEY] = True
-        self.get_solution_from_thread(solution)
-    # except Exception:
-    #    self.send_solution.emit(pickle.dumps("ERROR"))
-    #    self.finished_computation.emit()
+
+        reac_id = restrictions = None
+        if self.analysis_type == ThermodynamicAnalysisTypes.MODE_RANKING:
+            if self.central_widget.mode_navigator.mode_type == 0:
+                reac_id = self.appdata.project.modes.reac_id
+                restrictions = flux_vector_restrictions(self.appdata.project.modes)
+            else:
+                reac_id = self.reac_ids
+                restrictions = strain_design_restrictions(self.appdata.project.modes, reac_id)
+
+        # the cached model is updated by the next dialog, therefore the computation gets its own copy
+        self.computation = ThermodynamicAnalysisThread(copy.deepcopy(cobrak_model), self.analysis_type, min_mdf, solver_name, objective,
+                                                       dict(self.appdata.project.cobrak_model_cache.reaction_map),
+                                                       reac_id, restrictions)
+        self.button_optmdf.setText("Abort computation")
+        self.button_optmdf.clicked.disconnect(self.compute_optmdf)
+        self.button_optmdf.clicked.connect(self.computation.activate_abort)
+        self.rejected.connect(self.computation.activate_abort) # for the X button of the window frame
+        self.cancel.hide()
+        self.computation.send_progress_text.connect(self.receive_progress_text)
+        self.computation.send_progress.connect(self.progress_bar.setValue)
+        self.computation.finished_computation.connect(self.conclude_computation)
+        if self.analysis_type == ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS:
+            self.progress_bar.setMaximum(self.computation.num_targets())
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+        elif self.analysis_type == ThermodynamicAnalysisTypes.MODE_RANKING:
+            self.progress_bar.setMaximum(len(restrictions))
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+        self.computation.start()
+
+    def is_running(self) -> bool:
+        return self.computation is not None and self.computation.isRunning()
+
+    def conclude_computation(self):
+        self.setCursor(Qt.ArrowCursor)
+        if self.computation.abort:
+            self.receive_progress_text(self.windowTitle()+": computation aborted.")
+            self.accept()
+        elif self.computation.result is None:
+            self.accept()
+            if self.computation.exception is not None:
+                utils.show_unknown_error_box(self.computation.exception)
+        elif self.analysis_type == ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS:
+            self.set_ranges(*self.computation.result)
+            self.accept()
+        elif self.analysis_type == ThermodynamicAnalysisTypes.MODE_RANKING:
+            self.central_widget.mode_navigator.set_mode_mdf(self.computation.result, self.computation.min_mdf)
+            self.accept()
+        else:
+            self.get_solution_from_thread(self.computation.result)
+
+    @Slot(str)
+    def receive_progress_text(self, text: str):
+        self.central_widget.kernel_client.execute("print("+repr(text)+")")
+        self.central_widget.show_bottom_of_console()
+
+    def set_ranges(self, df_ranges: dict[str, tuple[float, float]], conc_ranges: dict[str, tuple[float, float]]):
+        for reac_id, (df_min, df_max) in df_ranges.items():
+            self.appdata.project.df_values[reac_id] = (round(float(df_min), self.appdata.rounding),
+                                                       round(float(df_max), self.appdata.rounding))
+        for met_id, (conc_min, conc_max) in conc_ranges.items():
+            self.appdata.project.conc_values[met_id] = (round(float(conc_min), 9), round(float(conc_max), 9))
+        self.central_widget.update()
 
     def set_boxes(self, solution: dict[str, float]):
         # Combine FWD and REV flux solutions
@@ -353,3 +385,55 @@ class ThermodynamicDialog(QDialog):
         console_text += "')"
         self.central_widget.kernel_client.execute(console_text)
         self.central_widget.show_bottom_of_console()
+
+
+class ThermodynamicAnalysisThread(QThread):
+    def __init__(self, cobrak_model, analysis_type, min_mdf, solver_name, objective, reaction_map,
+                 reac_id=None, restrictions=None):
+        super().__init__()
+        self.cobrak_model = cobrak_model
+        self.analysis_type = analysis_type
+        self.min_mdf = min_mdf
+        self.solver_name = solver_name
+        self.objective = objective
+        self.reaction_map = reaction_map
+        self.reac_id = reac_id
+        self.restrictions = restrictions
+        self.abort = False
+        self.result = None
+        self.exception = None
+
+    def do_abort(self):
+        return self.abort
+
+    def activate_abort(self):
+        self.abort = True
+
+    def num_targets(self) -> int:
+        return 2*len(variability_targets(self.cobrak_model, self.reaction_map))
+
+    def run(self):
+        try:
+            if self.analysis_type == ThermodynamicAnalysisTypes.VARIABILITY_ANALYSIS:
+                self.result = thermodynamic_variability_analysis(self.cobrak_model, self.reaction_map, self.min_mdf,
+                                                                 self.solver_name, print_func=self.send_progress_text.emit,
+                                                                 progress_callback=self.send_progress.emit,
+                                                                 abort_callback=self.do_abort)
+            elif self.analysis_type == ThermodynamicAnalysisTypes.MODE_RANKING:
+                self.result = thermodynamic_mode_ranking(self.cobrak_model, self.reaction_map, self.reac_id,
+                                                         self.restrictions, self.solver_name,
+                                                         print_func=self.send_progress_text.emit,
+                                                         progress_callback=self.send_progress.emit,
+                                                         abort_callback=self.do_abort)
+            else:
+                self.result = thermodynamic_analysis_in_worker(self.cobrak_model, self.analysis_type, self.min_mdf,
+                                                               self.solver_name, self.objective,
+                                                               print_func=self.send_progress_text.emit,
+                                                               abort_callback=self.do_abort)
+        except Exception:
+            self.exception = get_last_exception_string()
+        self.finished_computation.emit()
+
+    send_progress_text = Signal(str)
+    send_progress = Signal(int)
+    finished_computation = Signal()
@@ -96,11 +96,17 @@ class YieldOptimizationDialog(QDialog):
             solver = re.search('('+'|'.join(avail_solvers)+')',model.solver.interface.__name__)
             if solver is not None:
                 solver = solver[0]
-            sol = yopt(model,
-                       obj_num=self.numerator.text(),
-                       obj_den=self.denominator.text(),
-                       obj_sense=self.sense_combo.currentText(),
-                       solver=solver)
+            # the LPs are set up again only when the model or scenario have changed
+            sol = self.appdata.project.optimization_lp_cache.get_yield_lp(
+                model, self.appdata.project.scen_values.constraints, solver).optimize(
+                self.numerator.text(), self.denominator.text(), self.sense_combo.currentText())
+            if sol is None: # unbounded or undefined, straindesign constructs an example flux vector
+                sol = yopt(model,
+                           obj_num=self.numerator.text(),
+                           obj_den=self.denominator.text(),
+                           obj_sense=self.sense_combo.currentText(),
+                           constraints=[list(c) for c in self.appdata.project.scen_values.constraints],
+                           solver=solver)
             if sol.status == UNBOUNDED and isinf(sol.objective_value):
                 self.set_boxes(sol)
                 QMessageBox.warning(self, sense+' yield is unbounded. ',
@@ -0,0 +1,264 @@
+"""Parallel single and double knock-out screens of reactions or genes"""
+
+import ast
+import itertools
+import multiprocessing
+import time
+from typing import List, Tuple
+
+import numpy
+import scipy.sparse
+import cobra
+from cobra.util import ProcessPool
+
+from cnapy.flux_vector_container import KnockoutScreenContainer
+
+
+def compile_gpr_rules(model: cobra.Model) -> List:
+    """
+    Compiles the GPR rule of each reaction into a function of the gene activities a (indexed like
+    model.genes) that returns whether the reaction is active. Because the rules are compiled with
+    & and | the rows of a can also be boolean arrays which evaluates many deletions at once.
+    Reactions without GPR rule get None.
+    """
+    gene_idx = {g.id: i for i, g in enumerate(model.genes)}
+    def to_source(node) -> str:
+        if isinstance(node, ast.Name):
+            return "a["+str(gene_idx[node.id])+"]"
+        if isinstance(node, ast.BoolOp):
+            op = " & " if isinstance(node.op, ast.And) else " | "
+            return "(" + op.join(to_source(value) for value in node.values) + ")"
+        raise ValueError("Unexpected element in GPR rule: "+ast.dump(node))
+    evaluators = []
+    for r in model.reactions:
+        if r.gpr.body is None:
+            evaluators.append(None)
+        else:
+            evaluators.append(eval("lambda a: "+to_source(r.gpr.body)))
+    return evaluators
+
+
+def gene_knockouts(evaluators: List, gene_reactions: List[List[int]], num_genes: int,
+                   deletions: numpy.ndarray) -> List[Tuple[int]]:
+    """
+    The reactions (indices) that are knocked out by each row of deletions which contains gene indices.
+    All deletions are evaluated together and only the rules of the affected reactions are evaluated.
+    """
+    num_del = deletions.shape[0]
+    active = numpy.ones((num_genes, num_del), dtype=bool)
+    for column in deletions.T:
+        active[column, numpy.arange(num_del)] = False
+    knocked_out = [[] for _ in range(num_del)]
+    for r in sorted(set().union(*(gene_reactions[g] for g in numpy.unique(deletions)))):
+        for row in numpy.where(~evaluators[r](active))[0]:
+            knocked_out[row].append(r)
+    return [tuple(ko) for ko in knocked_out]
+
+
+def _init_worker(model: cobra.Model, product_idx: List[int]):
+    global _model
+    global _flux_vars
+    global _fwd_idx
+    global _rev_idx
+    global _product_idx
+
+    _model = model
+    _flux_vars = [(r.forward_variable, r.reverse_variable) for r in model.reactions]
+    var_idx = {v.name: i for i, v in enumerate(model.variables)}
+    _fwd_idx = numpy.array([var_idx[r.forward_variable.name] for r in model.reactions])
+    _rev_idx = numpy.array([var_idx[r.reverse_variable.name] for r in model.reactions])
+    _product_idx = product_idx
+
+
+def _knockout_step(args):
+    """
+    Solves the LP for each set of knocked out reactions by only changing the bounds of their flux
+    variables so that the solver can start from the basis of the previous LP.
+    Returns the objective value and the product fluxes (NaN if not optimal) and optionally the supports.
+    """
+    (chunk, knockouts, with_support) = args
+    values = numpy.full((len(knockouts), 1 + len(_product_idx)), numpy.nan)
+    support = numpy.zeros((len(knockouts), len(_flux_vars)), dtype=bool) if with_support else None
+    for k, ko in enumerate(knockouts):
+        saved = [(v, v.lb, v.ub) for i in ko for v in _flux_vars[i]]
+        for v, _, _ in saved:
+            v.set_bounds(0, 0)
+        objective_value = _model.slim_optimize()
+        if _model.solver.status == 'optimal':
+            primals = numpy.array(_model.solver._get_primal_values())
+            fluxes = primals[_fwd_idx] - primals[_rev_idx]
+            values[k, 0] = objective_value
+            values[k, 1:] = fluxes[_product_idx]
+            if with_support:
+                support[k, :] = numpy.abs(fluxes) > _model.tolerance
+        for v, lb, ub in saved:
+            v.set_bounds(lb, ub)
+    return chunk, values, support
+
+
+def knockout_screen(model: cobra.Model, genes: bool = False, double: bool = False, targets: List[str] = None,
+                    products: List[str] = (), processes: int = None, min_objective: float = 1e-6,
+                    chunk_size: int = 100, print_func=print, progress_callback=None,
+                    abort_callback=None) -> KnockoutScreenContainer:
+    """
+    Evaluates the single (and with double also the pairwise) deletions of the targets (all reactions or
+    genes by default) in the model (with the scenario that may have been loaded into it) and records
+    the optimal objective value and the fluxes of the products for each deletion.
+    Gene deletions are translated into reaction knock-outs with the compiled GPR rules and each distinct
+    set of knocked out reactions is solved only once. No LP is needed when a previous solution (of the
+    wild type or the corresponding single deletion) carries no flux through the knocked out reactions.
+    Pairs are only formed from the targets whose single deletion has an objective value above min_objective.
+    The rows of the result are sorted by decreasing flux of the first product or, if no products are
+    given, by increasing objective value (infeasible deletions first).
+    progress_callback is called with the number of LPs solved so far and the number of LPs required.
+    Returns None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    reac_id = model.reactions.list_attr("id")
+    product_idx = [reac_id.index(p) for p in products]
+    fixed_zero = numpy.array([r.lower_bound == 0 and r.upper_bound == 0 for r in model.reactions])
+    if genes:
+        gene_id = model.genes.list_attr("id")
+        if targets is None:
+            targets = gene_id
+        target_idx = numpy.array([gene_id.index(g) for g in targets], dtype=int)
+        evaluators = compile_gpr_rules(model)
+        gene_reactions = [[model.reactions.index(r) for r in g.reactions] for g in model.genes]
+        def knockouts(deletions: numpy.ndarray) -> List[Tuple[int]]:
+            return [tuple(i for i in ko if not fixed_zero[i]) for ko in
+                    gene_knockouts(evaluators, gene_reactions, len(gene_id), target_idx[deletions])]
+    else:
+        if targets is None:
+            targets = [r for r, z in zip(reac_id, fixed_zero) if not z]
+        target_idx = numpy.array([reac_id.index(r) for r in targets], dtype=int)
+        def knockouts(deletions: numpy.ndarray) -> List[Tuple[int]]:
+            return [tuple(sorted(set(i for i in target_idx[d] if not fixed_zero[i]))) for d in deletions]
+
+    _init_worker(model, product_idx)
+    _, wt_values, wt_support = _knockout_step((0, [()], True))
+    if numpy.isnan(wt_values[0, 0]):
+        raise ValueError("The wild type has no optimal solution, solver status is "+model.solver.status)
+    wt_values = wt_values[0]
+    wt_support = wt_support[0]
+    print_func("Wild type objective value: "+str(wt_values[0]))
+
+    num_lp = 0
+    num_lp_required = 0
+    last_print = time.monotonic()
+    aborted = False
+    def solve(ko_sets: List[Tuple[int]], with_support: bool):
+        """Solves the LPs for the knock-out sets, returns None if aborted."""
+        nonlocal num_lp, num_lp_required, last_print, aborted
+        values = numpy.zeros((len(ko_sets), 1 + len(product_idx)))
+        support = numpy.zeros((len(ko_sets), len(reac_id)), dtype=bool) if with_support else None
+        steps = [(i, ko_sets[i:i+chunk_size], with_support) for i in range(0, len(ko_sets), chunk_size)]
+        num_lp_required += len(ko_sets)
+        def collect(step_result):
+            nonlocal num_lp, last_print
+            (start, step_values, step_support) = step_result
+            values[start:start+len(step_values)] = step_values
+            if with_support:
+                support[start:start+len(step_values)] = step_support
+            num_lp += len(step_values)
+            if progress_callback is not None:
+                progress_callback(num_lp, num_lp_required)
+            if time.monotonic() - last_print > 5:
+                print_func("Solved "+str(num_lp)+" of "+str(num_lp_required)+" LPs")
+                last_print = time.monotonic()
+        if processes > 1 and len(steps) > 1:
+            results = pool.imap_unordered(_knockout_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        aborted = True
+                        return None
+                except StopIteration:
+                    break
+        else:
+            for step in steps:
+                if abort_callback is not None and abort_callback():
+                    aborted = True
+                    return None
+                collect(_knockout_step(step))
+        return values, support
+
+    def distinct_knockouts(deletions: numpy.ndarray) -> Tuple[List[Tuple[int]], numpy.ndarray]:
+        """The distinct knock-out sets and the index of the knock-out set of each deletion."""
+        ko_sets = {}
+        rows_ko = numpy.zeros(deletions.shape[0], dtype=int)
+        for start in range(0, deletions.shape[0], 10000):
+            for k, ko in enumerate(knockouts(deletions[start:start+10000]), start):
+                rows_ko[k] = ko_sets.setdefault(ko, len(ko_sets))
+        return list(ko_sets), rows_ko
+
+    try:
+        if processes > 1:
+            pool = ProcessPool(processes, initializer=_init_worker, initargs=(model, product_idx))
+        singles = numpy.arange(len(targets)).reshape(-1, 1)
+        ko_sets, rows_ko = distinct_knockouts(singles)
+        ko_values = numpy.tile(wt_values, (len(ko_sets), 1))
+        ko_support = numpy.tile(wt_support, (len(ko_sets), 1))
+        # the wild type solution remains optimal if it has no flux through the knock-outs
+        todo = [s for s, ko in enumerate(ko_sets) if wt_support[list(ko)].any()]
+        print_func(str(len(targets))+" single deletions yield "+str(len(ko_sets))
+                   +" distinct knock-out sets of which "+str(len(todo))+" require an LP")
+        result = solve([ko_sets[s] for s in todo], True)
+        if result is None:
+            return None
+        ko_values[todo] = result[0]
+        ko_support[todo] = result[1]
+        deletions = [singles]
+        row_ko_sets = [[ko_sets[s] for s in rows_ko]]
+        row_values = [ko_values[rows_ko]]
+
+        if double:
+            single_values = ko_values[rows_ko]
+            single_support = ko_support[rows_ko]
+            viable = numpy.where(single_values[:, 0] > min_objective)[0]
+            pairs = numpy.array(list(itertools.combinations(viable, 2)), dtype=int).reshape(-1, 2)
+            ko_sets, rows_ko = distinct_knockouts(pairs)
+            ko_values = numpy.zeros((len(ko_sets), 1 + len(product_idx)))
+            # a solution of one of the single deletions remains optimal if it has no flux through the other knock-outs
+            known = numpy.zeros(len(ko_sets), dtype=bool)
+            for (i, j), s in zip(pairs, rows_ko):
+                if not known[s]:
+                    ko = list(ko_sets[s])
+                    for single in (i, j):
+                        if not single_support[single, ko].any():
+                            ko_values[s] = single_values[single]
+                            known[s] = True
+                            break
+            todo = numpy.where(~known)[0]
+            print_func(str(len(pairs))+" double deletions of "+str(len(viable))+" viable targets yield "
+                       +str(len(ko_sets))+" distinct knock-out sets of which "+str(len(todo))+" require an LP")
+            result = solve([ko_sets[s] for s in todo], False)
+            if result is None:
+                return None
+            ko_values[todo] = result[0]
+            deletions.append(pairs)
+            row_ko_sets.append([ko_sets[s] for s in rows_ko])
+            row_values.append(ko_values[rows_ko])
+    finally:
+        if processes > 1:
+            if aborted:
+                pool.terminate()
+            else:
+                pool.close()
+    print_func("The knock-out screen required "+str(num_lp)+" LPs.")
+
+    values = numpy.vstack(row_values)
+    row_ko_sets = [ko for kos in row_ko_sets for ko in kos]
+    deleted = [tuple(targets[i] for i in d) for dels in deletions for d in dels]
+    if len(product_idx) > 0:
+        order = numpy.argsort(-numpy.nan_to_num(values[:, 1], nan=-numpy.inf), kind='stable')
+    else:
+        order = numpy.argsort(numpy.nan_to_num(values[:, 0], nan=-numpy.inf), kind='stable')
+    indptr = numpy.cumsum([0] + [len(row_ko_sets[i]) for i in order])
+    indices = numpy.array([r for i in order for r in row_ko_sets[i]], dtype=numpy.int32)
+    ko_mat = scipy.sparse.csr_matrix((-numpy.ones(len(indices)), indices, indptr), shape=(len(order), len(reac_id)))
+    return KnockoutScreenContainer(ko_mat, reac_id, deleted=[deleted[i] for i in order],
+                                   values=values[order].astype(numpy.float32),
+                                   value_names=["objective"] + list(products))
@@ -0,0 +1,85 @@
+"""Removal of thermodynamically infeasible loops from flux vectors with LPs only (CycleFreeFlux)"""
+
+from typing import List
+
+import numpy
+import pandas
+import cobra
+from optlang.symbolics import Zero
+
+
+class CycleFreeLP:
+    """
+    Removes the internal loops from flux vectors with the LP of the model: the exchange fluxes are fixed,
+    all other fluxes may only shrink towards zero without changing their sign and the sum of their
+    absolute values is minimized (Desouki et al. 2015). Only variable bounds and objective coefficients
+    are changed for this and restored afterwards so that the LP can be used for many flux vectors.
+    The objective of the model must be zero when remove_loops is called.
+    """
+
+    def __init__(self, model: cobra.Model):
+        self.model = model
+        self.fwd_vars = [r.forward_variable for r in model.reactions]
+        self.rev_vars = [r.reverse_variable for r in model.reactions]
+        var_index = {name: i for i, name in enumerate(model.solver.variables.keys())}
+        self.fwd_idx = numpy.array([var_index[v.name] for v in self.fwd_vars], dtype=int)
+        self.rev_idx = numpy.array([var_index[v.name] for v in self.rev_vars], dtype=int)
+        self.boundary = numpy.array([r.boundary for r in model.reactions], dtype=bool)
+
+    def fluxes(self) -> numpy.ndarray:
+        """The fluxes of the current solution of the LP."""
+        primal = numpy.array(self.model.solver._get_primal_values())
+        return primal[self.fwd_idx] - primal[self.rev_idx]
+
+    def remove_loops(self, fluxes: numpy.ndarray, fixed: List[int] = ()) -> numpy.ndarray:
+        """
+        Returns the loopless flux vector or None if the LP could not be solved. The fluxes of
+        the reactions with the indices in fixed are kept as well as those of the exchange reactions.
+        """
+        old_bounds = [numpy.array([(v.lb, numpy.inf if v.ub is None else v.ub) for v in variables])
+                      for variables in (self.fwd_vars, self.rev_vars)]
+        # reaction bounds from the bounds of the forward and reverse variables
+        lb = old_bounds[0][:, 0] - old_bounds[1][:, 1]
+        ub = old_bounds[0][:, 1] - old_bounds[1][:, 0]
+        keep = self.boundary.copy()
+        keep[list(fixed)] = True
+        lb = numpy.where(keep, fluxes, numpy.maximum(lb, numpy.minimum(fluxes, 0)))
+        ub = numpy.where(keep, fluxes, numpy.minimum(ub, numpy.maximum(fluxes, 0)))
+        new_bounds = [numpy.stack((numpy.maximum(lb, 0), numpy.maximum(ub, 0)), axis=1),
+                      numpy.stack((numpy.maximum(-ub, 0), numpy.maximum(-lb, 0)), axis=1)]
+        self._set_bounds(new_bounds, old_bounds)
+        objective = self.model.solver.objective
+        direction = objective.direction
+        support = numpy.where(~keep & (fluxes != 0))[0]
+        loop_vars = [self.fwd_vars[i] if fluxes[i] > 0 else self.rev_vars[i] for i in support]
+        objective.set_linear_coefficients({v: 1.0 for v in loop_vars})
+        objective.direction = 'min'
+        self.model.slim_optimize()
+        result = self.fluxes() if self.model.solver.status == 'optimal' else None
+        objective.set_linear_coefficients({v: 0.0 for v in loop_vars})
+        objective.direction = direction
+        self._set_bounds(old_bounds, new_bounds)
+        return result
+
+    def _set_bounds(self, bounds, current):
+        # only the bounds that differ are passed to the solver
+        for variables, b, c in zip((self.fwd_vars, self.rev_vars), bounds, current):
+            for i in numpy.where(numpy.any(b != c, axis=1))[0]:
+                variables[i].set_bounds(b[i, 0], None if b[i, 1] == numpy.inf else b[i, 1])
+
+
+def loopless_fluxes(model: cobra.Model, fluxes: pandas.Series) -> pandas.Series:
+    """
+    Removes the loops from an optimal solution of the model; the exchange fluxes and the
+    fluxes of the reactions in the objective are kept.
+    """
+    objective_vars = set(v.name for v in model.solver.objective.variables)
+    fixed = [i for i, r in enumerate(model.reactions)
+             if r.forward_variable.name in objective_vars or r.reverse_variable.name in objective_vars]
+    with model:
+        # replaced through the model so that the objective is restored when the context ends
+        model.objective = model.problem.Objective(Zero)
+        result = CycleFreeLP(model).remove_loops(fluxes[model.reactions.list_attr("id")].values, fixed)
+    if result is None:
+        return fluxes
+    return pandas.Series(result, index=model.reactions.list_attr("id"), name=fluxes.name)
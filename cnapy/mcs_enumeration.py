@@ -0,0 +1,286 @@
+"""Parallel and resumable minimal cut set enumeration"""
+
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from typing import List, Tuple
+
+import numpy
+import cobra
+from cobra.util import ProcessPool
+from cobra.util.solver import interface_to_str, solvers
+from optlang.symbolics import Add
+from swiglpk import GLP_DUAL
+import optlang_enumerator.cMCS_enumerator as cMCS_enumerator
+import optlang_enumerator.mcs_computation as mcs_computation
+
+CHECKPOINT_VERSION = 2
+
+
+def mcs_problem_hash(model_json: str, targets, desired, cuts) -> str:
+    problem_hash = hashlib.md5(model_json.encode())
+    problem_hash.update(pickle.dumps((targets, desired, numpy.asarray(cuts))))
+    return problem_hash.hexdigest()
+
+
+class MCSCheckpoint:
+    """
+    The MCS found so far for a specific problem. complete_size is the cardinality up to which
+    all MCS are known, done_partitions lists the candidate partitions that have already been
+    finished in the enumeration of the MCS with cardinality complete_size + 1 when the
+    candidates are split into num_partitions partitions.
+    The data is stored as JSON with reaction IDs so that it can be safely exchanged.
+    """
+
+    def __init__(self, file_name: str, problem_hash: str, reac_id: List[str]):
+        self.file_name = file_name
+        self.problem_hash = problem_hash
+        self.reac_id = reac_id
+        self.complete_size = 0
+        self.num_partitions = 0
+        self.done_partitions = []
+        self.mcs: List[Tuple[int]] = []
+        if os.path.exists(file_name):
+            try:
+                with open(file_name, 'r') as fp:
+                    data = json.load(fp)
+                if data['version'] <= CHECKPOINT_VERSION and data['problem_hash'] == problem_hash:
+                    self.complete_size = data['complete_size']
+                    # the partitions of a version 1 checkpoint are not known
+                    self.num_partitions = data.get('num_partitions', 0)
+                    if self.num_partitions > 0:
+                        self.done_partitions = data['done_partitions']
+                    idx = {r: i for i, r in enumerate(reac_id)}
+                    self.mcs = [tuple(sorted(idx[r] for r in m)) for m in data['mcs']]
+                    print("Resuming from", len(self.mcs), "MCS in", file_name)
+            except (OSError, ValueError, KeyError):
+                print("Could not read MCS checkpoint", file_name)
+
+    def save(self):
+        data = {'version': CHECKPOINT_VERSION, 'problem_hash': self.problem_hash,
+                'complete_size': self.complete_size, 'num_partitions': self.num_partitions,
+                'done_partitions': self.done_partitions,
+                'mcs': [[self.reac_id[i] for i in m] for m in self.mcs]}
+        tmp_name = self.file_name + ".tmp"
+        with open(tmp_name, 'w') as fp:
+            json.dump(data, fp)
+        os.replace(tmp_name, self.file_name) # do not leave a corrupt checkpoint when interrupted
+
+
+def _prepare_mcs_milp(model: cobra.Model, targets, desired, cuts: numpy.ndarray, fva_tolerance=1e-9):
+    """
+    The preprocessing of compute_mcs without network compression, done once for all partitions:
+    checks that the regions are feasible, integrates the model bounds into them, excludes the blocked
+    reactions and those that are essential in a desired region from the cuts and adds the FVA bounds
+    to the desired regions. Returns the arguments for ConstrainedMinimalCutSetsEnumerator.
+    """
+    targets = copy.deepcopy(targets)
+    desired = copy.deepcopy(desired)
+    cuts = cuts.copy()
+    target_constraints = mcs_computation.get_leq_constraints(model, targets)
+    desired_constraints = mcs_computation.get_leq_constraints(model, desired)
+    for name, constraints in (("Target", target_constraints), ("Desired", desired_constraints)):
+        for i, constraint in enumerate(constraints):
+            with model as feas:
+                feas.objective = model.problem.Objective(0.0)
+                feas.add_cons_vars(constraint)
+                feas.slim_optimize()
+                if feas.solver.status != 'optimal':
+                    raise mcs_computation.InfeasibleRegion(name+' region '+str(i)+' is not feasible; solver status is: '
+                                                           +feas.solver.status)
+    mcs_computation.integrate_model_bounds(model, targets, desired)
+
+    def region_fva(constraints):
+        with model as fva:
+            fva.tolerance = fva_tolerance
+            fva.objective = model.problem.Objective(0.0)
+            if fva.problem.__name__ == 'optlang.glpk_interface':
+                # emulates an optimality tolerance as in compute_mcs
+                fva.solver.configuration._smcp.meth = GLP_DUAL
+                fva.solver.configuration._smcp.tol_dj = fva_tolerance
+            elif fva.problem.__name__ == 'optlang.coinor_cbc_interface':
+                fva.solver.problem.opt_tol = fva_tolerance
+            fva.add_cons_vars(constraints)
+            return mcs_computation.flux_variability_analysis(fva, fraction_of_optimum=0.0, processes=1).values
+
+    fva_res = region_fva([])
+    blocked = (fva_res[:, 0] >= -fva_tolerance) & (fva_res[:, 1] <= fva_tolerance)
+    cuts[blocked] = False
+    print("Found", numpy.count_nonzero(blocked), "blocked reactions.")
+    for i in range(len(desired)):
+        fva_res = region_fva(mcs_computation.get_leq_constraints(model, [desired[i]])[0])
+        fva_res[numpy.abs(fva_res) < fva_tolerance] = 0
+        essential = (fva_res[:, 0] > fva_tolerance) | (fva_res[:, 1] < -fva_tolerance)
+        print(numpy.count_nonzero(essential), "essential reactions in desired region", i)
+        cuts[essential] = False
+        desired[i] = (desired[i][0], desired[i][1], fva_res[:, 0], fva_res[:, 1])
+
+    stoich_mat = cobra.util.array.create_stoichiometric_matrix(model, array_type='lil')
+    reversible = [r.lower_bound < 0 for r in model.reactions]
+    big_m = 0.0 if model.problem.Constraint._INDICATOR_CONSTRAINT_SUPPORT else 1000.0
+    return stoich_mat, reversible, targets, desired, cuts, big_m
+
+
+def _init_worker(solver: str, stoich_mat, reversible, targets, desired, cuts, big_m: float):
+    # the MILP is set up once per worker, the partitions only change some of its bounds and constraints
+    global _enumerator
+    global _cuts
+    global _z_ub
+    global _excluded
+    global _partition_constraint
+
+    interface = solvers[solver]
+    _enumerator = cMCS_enumerator.ConstrainedMinimalCutSetsEnumerator(
+        interface, stoich_mat, reversible, targets, desired=desired, bigM=big_m, threshold=0.1,
+        cuts=cuts.copy(), split_reversible_v=True, irrev_geq=True)
+    configuration = _enumerator.model.configuration
+    if interface.__name__ == 'optlang.glpk_interface':
+        configuration._smcp.tol_dj = 1e-6
+    else:
+        configuration.tolerances.optimality = 1e-6
+    configuration.tolerances.feasibility = 1e-6
+    configuration.tolerances.integrality = 1e-6
+    _cuts = cuts
+    _z_ub = cuts.copy()
+    _excluded = set()
+    _partition_constraint = None
+
+
+def _mcs_partition_step(args):
+    """
+    Enumerates the MCS with cardinality size that contain at least one reaction from the
+    candidates in block, with all earlier candidates excluded as cuts. The partitions of
+    one cardinality are therefore disjoint and because all smaller MCS are excluded
+    the cut sets found are minimal. Already known MCS are excluded as well.
+    """
+    global _partition_constraint
+    (part_idx, size, block, earlier, known_mcs, max_mcs_num) = args
+    e = _enumerator
+    # the MCS found in this worker are already excluded by enumerate_mcs
+    for m in known_mcs:
+        if m not in _excluded:
+            e.add_exclusion_constraint(m)
+            _excluded.add(m)
+    z_ub = _cuts.copy()
+    z_ub[earlier] = False
+    for i in numpy.where(z_ub != _z_ub)[0]:
+        e.z_vars[i].ub = 1 if z_ub[i] else 0
+    _z_ub[:] = z_ub
+    if _partition_constraint is not None:
+        e.model.remove(_partition_constraint)
+    _partition_constraint = e.Constraint(Add(*[e.z_vars[i] for i in block]), lb=1)
+    e.model.add(_partition_constraint)
+    e.model.update()
+    # smaller cut sets contain one of the excluded MCS, therefore only the size is limited
+    e.evs_sz_lb = 1
+    e.evs_sz.ub = size
+    mcs, err_val = e.enumerate_mcs(max_mcs_size=size, max_mcs_num=max_mcs_num, enum_method=1)
+    mcs = [tuple(sorted(m)) for m in mcs]
+    _excluded.update(mcs)
+    return part_idx, mcs, err_val
+
+
+def parallel_mcs_computation(model: cobra.Model, targets, desired, max_mcs_size: int, max_mcs_num=float('inf'),
+                             timeout=None, exclude_boundary_reactions_as_cuts=False, checkpoint_dir: str = None,
+                             processes: int = None, abort_callback=None) -> Tuple[List[Tuple[int]], int]:
+    """
+    Enumerates the MCS cardinality by cardinality. Within each cardinality the candidate
+    reactions are split into disjoint partitions that are processed by a pool of worker processes.
+    The FVAs of the preprocessing are done once here and each worker sets up the MILP only once.
+    If a checkpoint_dir is given the MCS found so far are stored there after each partition
+    so that an interrupted run can be resumed or extended to a larger max_mcs_size later.
+    The timeout applies to the whole run, partitions that are not finished then are recomputed on resume.
+    Returns the MCS as tuples of reaction indices and an error value like compute_mcs.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    reac_id = model.reactions.list_attr("id")
+    cuts = numpy.full(len(reac_id), True, dtype=bool)
+    if exclude_boundary_reactions_as_cuts:
+        cuts[[i for i, r in enumerate(model.reactions) if r.boundary]] = False
+    candidates = numpy.where(cuts)[0]
+    if len(candidates) == 0:
+        print("There are no reactions that can be cut.")
+        return [], 0
+    num_partitions = min(len(candidates), 1 if processes <= 1 else 4*processes)
+    model_json = cobra.io.to_json(model)
+    milp_data = _prepare_mcs_milp(model, targets, desired, cuts)
+
+    checkpoint = None
+    if checkpoint_dir is not None:
+        problem_hash = mcs_problem_hash(model_json, targets, desired, cuts)
+        checkpoint = MCSCheckpoint(os.path.join(checkpoint_dir, "mcs_checkpoint_"+problem_hash+".json"),
+                                   problem_hash, reac_id)
+        all_mcs = checkpoint.mcs
+        size = checkpoint.complete_size + 1
+        done_partitions = set(checkpoint.done_partitions)
+        if len(done_partitions) > 0:
+            # the finished partitions refer to the partitioning of the interrupted run
+            num_partitions = checkpoint.num_partitions
+        checkpoint.num_partitions = num_partitions
+    else:
+        all_mcs = []
+        size = 1
+        done_partitions = set()
+    partitions = numpy.array_split(candidates, num_partitions)
+    partition_start = numpy.cumsum([0] + [len(p) for p in partitions])
+
+    err_val = 0
+    start_time = time.monotonic()
+    with ProcessPool(processes, initializer=_init_worker,
+                     initargs=(interface_to_str(model.problem), *milp_data)) as pool:
+        while size <= max_mcs_size and len(all_mcs) < max_mcs_num and err_val == 0:
+            known_mcs = list(all_mcs) # also excludes MCS of this size found before a resume
+            steps = [(j, size, partitions[j], candidates[:partition_start[j]], known_mcs, max_mcs_num)
+                     for j in range(num_partitions) if j not in done_partitions]
+            print("Enumerating MCS of size", size, "in", len(steps), "partitions")
+            results = pool.imap_unordered(_mcs_partition_step, steps)
+            while True:
+                try:
+                    part_idx, mcs, step_err_val = results.next(timeout=1)
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return _sorted_mcs(all_mcs, max_mcs_size, max_mcs_num), 1
+                    if timeout is not None and time.monotonic() - start_time > timeout:
+                        print('Time limit exceeded, stopping enumeration.')
+                        pool.terminate()
+                        return _sorted_mcs(all_mcs, max_mcs_size, max_mcs_num), 0
+                    continue
+                except StopIteration:
+                    break
+                if step_err_val != 0:
+                    err_val = step_err_val
+                    break
+                all_mcs += mcs
+                if len(mcs) < max_mcs_num: # otherwise this partition may have more MCS
+                    done_partitions.add(part_idx)
+                if checkpoint is not None:
+                    checkpoint.mcs = all_mcs
+                    checkpoint.done_partitions = sorted(done_partitions)
+                    checkpoint.save()
+            if err_val == 0 and len(done_partitions) == num_partitions:
+                if checkpoint is not None:
+                    checkpoint.complete_size = size
+                    checkpoint.done_partitions = []
+                    checkpoint.save()
+                done_partitions = set()
+                size += 1
+            else:
+                break
+        if err_val != 0:
+            pool.terminate()
+
+    return _sorted_mcs(all_mcs, max_mcs_size, max_mcs_num), err_val
+
+
+def _sorted_mcs(all_mcs: List[Tuple[int]], max_mcs_size: int, max_mcs_num) -> List[Tuple[int]]:
+    # a checkpoint may contain larger MCS than requested
+    all_mcs = sorted((m for m in all_mcs if len(m) <= max_mcs_size), key=len)
+    if len(all_mcs) > max_mcs_num:
+        all_mcs = all_mcs[:int(max_mcs_num)]
+    return all_mcs
@@ -0,0 +1,185 @@
+"""Evaluation of many scenario files in parallel"""
+
+import multiprocessing
+import os
+import time
+from typing import List, Tuple
+
+import numpy
+import pandas
+import cobra
+from cobra.util import ProcessPool
+from cobra.util.solver import fix_objective_as_constraint
+from optlang.symbolics import Zero
+
+from cnapy.appdata import Scenario
+from cnapy.fva import fast_flux_variability_analysis
+
+FBA = "FBA"
+PFBA = "pFBA"
+FVA = "FVA"
+
+
+class MultiScenarioResult:
+    """
+    The results of an analysis for several scenarios as reactions x scenarios matrices: for FBA and pFBA
+    lower and upper are the same flux matrix, for FVA they hold the minima and maxima. The columns of
+    scenarios without optimal solution are NaN.
+    """
+
+    def __init__(self, reac_id: List[str], scenario_names: List[str], analysis: str, lower: numpy.ndarray,
+                 upper: numpy.ndarray, objective_values: numpy.ndarray, status: List[str]):
+        self.reac_id = reac_id
+        self.scenario_names = scenario_names
+        self.analysis = analysis
+        self.lower = lower
+        self.upper = upper
+        self.objective_values = objective_values
+        self.status = status
+
+    def differing(self, reference: int = None, tolerance: float = 1e-9) -> numpy.ndarray:
+        """
+        Marks the entries that differ from the reference scenario or, if no reference is given,
+        the reactions whose values are not the same in all scenarios.
+        """
+        if reference is None:
+            with numpy.errstate(invalid='ignore'):
+                row_differs = (numpy.nanmax(self.lower, axis=1) - numpy.nanmin(self.lower, axis=1) > tolerance) | \
+                              (numpy.nanmax(self.upper, axis=1) - numpy.nanmin(self.upper, axis=1) > tolerance)
+            return row_differs
+        return (numpy.abs(self.lower - self.lower[:, [reference]]) > tolerance) | \
+               (numpy.abs(self.upper - self.upper[:, [reference]]) > tolerance) | \
+               (numpy.isnan(self.lower) != numpy.isnan(self.lower[:, [reference]]))
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        if self.analysis == FVA:
+            columns = {}
+            for i, name in enumerate(self.scenario_names):
+                columns[name+" min"] = self.lower[:, i]
+                columns[name+" max"] = self.upper[:, i]
+            return pandas.DataFrame(columns, index=self.reac_id)
+        return pandas.DataFrame(self.lower, index=self.reac_id, columns=self.scenario_names)
+
+
+def read_scenario_files(file_names: List[str], reaction_ids: List[str], print_func=print) -> List[Scenario]:
+    """Parses all scenario files up front so that problems with them are reported before the computation."""
+    scenarios = []
+    for file_name in file_names:
+        scenario = Scenario()
+        flux_values, unknown_ids, incompatible_constraints, _ = scenario.read(file_name, reaction_ids)
+        scenario.update(flux_values)
+        if len(unknown_ids) > 0:
+            print_func(os.path.basename(file_name)+": ignoring unknown reactions "+", ".join(unknown_ids))
+        if len(incompatible_constraints) > 0:
+            print_func(os.path.basename(file_name)+": ignoring "+str(len(incompatible_constraints))
+                       +" incompatible constraints")
+        scenarios.append(scenario)
+    return scenarios
+
+
+def _init_worker(model: cobra.Model, analysis: str):
+    global _model
+    global _analysis
+    global _fwd_idx
+    global _rev_idx
+
+    _model = model
+    _analysis = analysis
+    # variables that a scenario adds come after these ones
+    var_idx = {v.name: i for i, v in enumerate(model.variables)}
+    _fwd_idx = numpy.array([var_idx[r.forward_variable.name] for r in model.reactions])
+    _rev_idx = numpy.array([var_idx[r.reverse_variable.name] for r in model.reactions])
+
+
+def _fluxes() -> numpy.ndarray:
+    primals = numpy.array(_model.solver._get_primal_values())
+    return primals[_fwd_idx] - primals[_rev_idx]
+
+
+def _scenario_step(args) -> Tuple[int, numpy.ndarray, numpy.ndarray, float, str]:
+    """Applies the scenario to the process-local model within a context which reverts it afterwards."""
+    (index, scenario) = args
+    reac_id = _model.reactions.list_attr("id")
+    lower = numpy.full(len(reac_id), numpy.nan)
+    upper = numpy.full(len(reac_id), numpy.nan)
+    with _model as model:
+        scenario.load_into_model(model)
+        objective_value = model.slim_optimize()
+        status = model.solver.status
+        if status == 'optimal':
+            if _analysis == FVA:
+                fva_result = fast_flux_variability_analysis(model, reaction_list=reac_id, processes=1,
+                                                            print_func=lambda *txt: None)
+                lower = fva_result["minimum"].values
+                upper = fva_result["maximum"].values
+            else:
+                if _analysis == PFBA:
+                    # the new objective is only set up through its coefficients which is much faster than an expression
+                    fix_objective_as_constraint(model, fraction=1.0)
+                    model.objective = model.problem.Objective(Zero, direction='min')
+                    flux_vars = [v for r in model.reactions for v in (r.forward_variable, r.reverse_variable)]
+                    model.solver.objective.set_linear_coefficients({v: 1.0 for v in flux_vars})
+                    model.slim_optimize()
+                    status = model.solver.status
+                if status == 'optimal':
+                    lower = _fluxes()
+                    upper = lower
+                if _analysis == PFBA:
+                    # otherwise restoring the previous objective would evaluate this one as expression
+                    model.solver.objective.set_linear_coefficients({v: 0.0 for v in flux_vars})
+    if status != 'optimal':
+        objective_value = numpy.nan
+    return index, lower, upper, objective_value, status
+
+
+def evaluate_scenarios(model: cobra.Model, scenarios: List[Scenario], scenario_names: List[str],
+                       analysis: str = FBA, processes: int = None, print_func=print, progress_callback=None,
+                       abort_callback=None) -> MultiScenarioResult:
+    """
+    Runs FBA, pFBA or FVA for each scenario where each worker applies the scenarios to its own copy
+    of the model. The results only cover the reactions of the model, not those added by a scenario.
+    progress_callback is called with the number of evaluated scenarios.
+    Returns None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    processes = max(1, min(processes, len(scenarios)))
+    reac_id = model.reactions.list_attr("id")
+    lower = numpy.full((len(reac_id), len(scenarios)), numpy.nan)
+    upper = numpy.full((len(reac_id), len(scenarios)), numpy.nan)
+    objective_values = numpy.full(len(scenarios), numpy.nan)
+    status = [""]*len(scenarios)
+    num_done = 0
+    last_print = time.monotonic()
+    def collect(step_result):
+        nonlocal num_done, last_print
+        (index, lower[:, index], upper[:, index], objective_values[index], status[index]) = step_result
+        num_done += 1
+        if progress_callback is not None:
+            progress_callback(num_done)
+        if time.monotonic() - last_print > 5:
+            print_func("Evaluated "+str(num_done)+" of "+str(len(scenarios))+" scenarios")
+            last_print = time.monotonic()
+
+    steps = list(enumerate(scenarios))
+    if processes > 1:
+        with ProcessPool(processes, initializer=_init_worker, initargs=(model, analysis)) as pool:
+            results = pool.imap_unordered(_scenario_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+                except StopIteration:
+                    break
+    else:
+        _init_worker(model, analysis)
+        for step in steps:
+            if abort_callback is not None and abort_callback():
+                return None
+            collect(_scenario_step(step))
+    print_func("Evaluated "+str(len(scenarios))+" scenarios with "+analysis+", "
+               +str(sum(s != 'optimal' for s in status))+" of them without optimal solution.")
+    return MultiScenarioResult(reac_id, scenario_names, analysis, lower, upper, objective_values, status)
@@ -0,0 +1,234 @@
+"""Parameter scans that step the bounds of one or two reactions over a grid"""
+
+import multiprocessing
+import time
+from typing import Dict, List, Tuple
+
+import numpy
+import pandas
+import cobra
+from cobra.util import ProcessPool
+from optlang.symbolics import Zero
+
+FIXED = "fixed"
+LOWER = "lower"
+UPPER = "upper"
+
+
+class SweepResult:
+    """
+    values[i, j, k] is the objective value (k = 0) or the flux of outputs[k-1] at the grid point
+    (grid[0][i], grid[1][j]); there is only one grid axis for a one-dimensional scan.
+    Infeasible grid points have the value NaN.
+    """
+
+    def __init__(self, axes: List[Tuple[str, str]], grid: List[numpy.ndarray], values: numpy.ndarray,
+                 value_names: List[str]):
+        self.axes = axes
+        self.grid = grid
+        self.values = values
+        self.value_names = value_names
+
+    def to_dataframe(self) -> pandas.DataFrame:
+        """One row per grid point with the axis values followed by the results."""
+        points = numpy.meshgrid(*self.grid, indexing='ij')
+        columns = {r+" ("+kind+")": p.ravel() for (r, kind), p in zip(self.axes, points)}
+        for k, name in enumerate(self.value_names):
+            columns[name] = self.values[..., k].ravel()
+        return pandas.DataFrame(columns)
+
+    def save(self, fname: str):
+        numpy.savez_compressed(fname, axes=numpy.array(self.axes), values=self.values,
+                               value_names=self.value_names, **{"grid"+str(i): g for i, g in enumerate(self.grid)})
+
+    def plot(self, column: int = 0):
+        import matplotlib.pyplot as plt
+        labels = [r+" ("+kind+" bound)" if kind != FIXED else r for r, kind in self.axes]
+        fig, ax = plt.subplots()
+        if len(self.grid) == 1:
+            ax.plot(self.grid[0], self.values[:, column], marker='.')
+            ax.set_xlabel(labels[0])
+            ax.set_ylabel(self.value_names[column])
+        else:
+            mesh = ax.pcolormesh(self.grid[0], self.grid[1], self.values[:, :, column].T, shading='nearest')
+            fig.colorbar(mesh, ax=ax, label=self.value_names[column])
+            ax.set_xlabel(labels[0])
+            ax.set_ylabel(labels[1])
+        plt.show()
+
+
+def _init_worker(model: cobra.Model, axes: List[Tuple[str, str]], outputs: List[str],
+                 numerator: Dict[str, float], denominator: Dict[str, float]):
+    global _model
+    global _axes
+    global _fwd_idx
+    global _rev_idx
+    global _output_idx
+    global _numerator
+    global _denominator
+
+    _model = model
+    _axes = [(model.reactions.get_by_id(r), kind) for r, kind in axes]
+    var_idx = {v.name: i for i, v in enumerate(model.variables)}
+    _fwd_idx = numpy.array([var_idx[r.forward_variable.name] for r in model.reactions])
+    _rev_idx = numpy.array([var_idx[r.reverse_variable.name] for r in model.reactions])
+    _output_idx = [model.reactions.index(r) for r in outputs]
+    if denominator is None:
+        _numerator = None
+        _denominator = None
+    else:
+        # replaced through the model so that this is reverted when the model context ends
+        model.objective = model.problem.Objective(Zero, direction='max')
+        reac_idx = {r.id: i for i, r in enumerate(model.reactions)}
+        _numerator = numpy.zeros(len(model.reactions))
+        _denominator = numpy.zeros(len(model.reactions))
+        for coefficients, vector in ((numerator, _numerator), (denominator, _denominator)):
+            for r, c in coefficients.items():
+                vector[reac_idx[r]] = c
+
+
+def _fluxes() -> numpy.ndarray:
+    primals = numpy.array(_model.solver._get_primal_values())
+    return primals[_fwd_idx] - primals[_rev_idx]
+
+
+def _maximize_yield(tolerance: float = 1e-9, max_iterations: int = 50) -> float:
+    """
+    Dinkelbach's method: maximizes numerator - y*denominator where y is the yield of the previous
+    solution until the optimum is zero. Only objective coefficients change between the LPs.
+    """
+    support = numpy.where((_numerator != 0) | (_denominator != 0))[0]
+    flux_vars = [(_model.reactions[i].forward_variable, _model.reactions[i].reverse_variable) for i in support]
+    objective = _model.solver.objective
+    objective.direction = 'max'
+    y = 0.0
+    for _ in range(max_iterations):
+        coefficients = {}
+        for i, (fwd, rev) in zip(support, flux_vars):
+            c = _numerator[i] - y*_denominator[i]
+            coefficients[fwd] = c
+            coefficients[rev] = -c
+        objective.set_linear_coefficients(coefficients)
+        value = _model.slim_optimize()
+        if _model.solver.status != 'optimal':
+            return numpy.nan
+        fluxes = _fluxes()
+        denominator = _denominator @ fluxes
+        if denominator <= tolerance:
+            return numpy.nan # yield undefined
+        if value <= tolerance*max(1.0, abs(y)):
+            return y
+        y = (_numerator @ fluxes)/denominator
+    return y
+
+
+def _sweep_step(args):
+    """
+    Solves the problem at each grid point by only changing the bounds of the axis reactions
+    so that the solver can start from the basis of the previous point.
+    """
+    (start, points) = args
+    values = numpy.full((len(points), 1 + len(_output_idx)), numpy.nan)
+    bounds = [r.bounds for r, _ in _axes]
+    for p, point in enumerate(points):
+        feasible = True
+        for (r, kind), (lb, ub), value in zip(_axes, bounds, point):
+            if kind == FIXED:
+                r.bounds = (value, value)
+            elif kind == LOWER:
+                feasible = feasible and value <= ub
+                r.bounds = (value, max(value, ub))
+            else:
+                feasible = feasible and value >= lb
+                r.bounds = (min(value, lb), value)
+        if not feasible:
+            continue
+        if _denominator is None:
+            value = _model.slim_optimize()
+            if _model.solver.status != 'optimal':
+                continue
+        else:
+            value = _maximize_yield()
+            if numpy.isnan(value):
+                continue
+        values[p, 0] = value
+        values[p, 1:] = _fluxes()[_output_idx]
+    for (r, _), b in zip(_axes, bounds):
+        r.bounds = b
+    return start, values
+
+
+def scenario_sweep(model: cobra.Model, axes: List[Tuple[str, float, float, int, str]], outputs: List[str] = (),
+                   numerator: Dict[str, float] = None, denominator: Dict[str, float] = None,
+                   processes: int = None, print_func=print, progress_callback=None,
+                   abort_callback=None) -> SweepResult:
+    """
+    Steps the bounds of one or two reactions over a grid and optimizes the objective of the model
+    (with the scenario that may have been loaded into it) or, if a denominator is given, the
+    maximal yield numerator/denominator at each grid point.
+    Each axis is given as (reaction ID, first value, last value, number of points, kind) where kind
+    is FIXED (the flux is fixed to the value), LOWER or UPPER (only the lower or upper bound is set).
+    The LP is built once per worker and contiguous parts of the grid are spread over the workers.
+    progress_callback is called with the number of grid points solved so far.
+    Returns None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    if len(axes) not in (1, 2):
+        raise ValueError("A sweep has one or two axes.")
+    if len(axes) == 2 and axes[0][0] == axes[1][0]:
+        raise ValueError("The two axes must use different reactions.")
+    grid = [numpy.linspace(first, last, num_points) for (_, first, last, num_points, _) in axes]
+    axes = [(r, kind) for (r, _, _, _, kind) in axes]
+    points = numpy.stack([p.ravel() for p in numpy.meshgrid(*grid, indexing='ij')], axis=1)
+    # in two dimensions every other row is traversed backwards so that successive points are close
+    if len(grid) == 2:
+        order = numpy.arange(len(points)).reshape(len(grid[0]), len(grid[1]))
+        order[1::2] = order[1::2, ::-1]
+        order = order.ravel()
+    else:
+        order = numpy.arange(len(points))
+    points = points[order]
+    values = numpy.full((len(points), 1 + len(outputs)), numpy.nan)
+    processes = max(1, min(processes, len(points)))
+    num_chunks = processes if processes == 1 else min(4*processes, len(points))
+    steps = [(c[0], points[c]) for c in numpy.array_split(numpy.arange(len(points)), num_chunks)]
+    num_done = 0
+    last_print = time.monotonic()
+    def collect(step_result):
+        nonlocal num_done, last_print
+        (start, step_values) = step_result
+        values[start:start+len(step_values)] = step_values
+        num_done += len(step_values)
+        if progress_callback is not None:
+            progress_callback(num_done)
+        if time.monotonic() - last_print > 5:
+            print_func("Solved "+str(num_done)+" of "+str(len(points))+" grid points")
+            last_print = time.monotonic()
+
+    initargs = (model, axes, list(outputs), numerator, denominator)
+    if processes > 1:
+        with ProcessPool(processes, initializer=_init_worker, initargs=initargs) as pool:
+            results = pool.imap_unordered(_sweep_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+                except StopIteration:
+                    break
+    else:
+        with model as model: # restores the bounds and objective
+            _init_worker(model, *initargs[1:])
+            # single points so that the computation can be aborted in between
+            for start in range(len(points)):
+                if abort_callback is not None and abort_callback():
+                    return None
+                collect(_sweep_step((start, points[start:start+1])))
+    print_func("Solved "+str(len(points))+" grid points, "+str(numpy.sum(numpy.isnan(values[:, 0])))
+               +" of them are infeasible.")
+    values[order] = values.copy()
+    value_names = ["objective" if denominator is None else "yield"] + list(outputs)
+    return SweepResult(axes, grid, values.reshape([len(g) for g in grid] + [len(value_names)]), value_names)
@@ -0,0 +1,237 @@
+"""Checkpoints of strain design computations from which a computation of the same setup can be resumed"""
+
+import importlib
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import List
+
+import numpy
+from scipy import sparse
+from straindesign.names import INFEASIBLE, MAX_SOLUTIONS, OPTIMAL, TIME_LIMIT, TIME_LIMIT_W_SOL
+from straindesign.strainDesignMILP import SDMILP
+
+FORMAT_NAME = "cnapy-strain-design-checkpoint"
+FORMAT_VERSION = 1
+
+
+def checkpoint_file_name(key: str) -> str:
+    return "sd_checkpoint_"+key+".json"
+
+
+class SDCheckpoint:
+    """
+    The strain designs and the exclusion constraints (cuts) that a strain design MILP has found so far
+    together with metadata of the run. It is written to filename at most every interval seconds while the
+    computation runs. When a checkpoint for the same setup key exists, its cuts are added again to the
+    MILP so that the computation continues from there and its designs are included in the result.
+    """
+
+    def __init__(self, filename: str, key: str, interval: float = 10.0, print_func=print):
+        self.filename = filename
+        self.key = key
+        self.interval = interval
+        self.print_func = print_func
+        self.z_names: List[str] = None
+        self.cuts = [] # (indices, values, solution, exact)
+        self.created = time.time()
+        self.elapsed = 0.0 # of the previous runs
+        self.resumed_solutions = []
+        self.run_start = time.time()
+        self.last_save = time.monotonic()
+
+    def load(self) -> bool:
+        """Reads the checkpoint file if it belongs to the same setup; returns whether it has been read."""
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("format") != FORMAT_NAME or data.get("version", 0) > FORMAT_VERSION or data.get("key") != self.key:
+            return False
+        self.z_names = data["z_names"]
+        self.cuts = [(c["indices"], c["values"], c["solution"], c["exact"]) for c in data["cuts"]]
+        self.created = data["created"]
+        self.elapsed = data["elapsed"]
+        return True
+
+    def save(self):
+        """Writes the checkpoint to a temporary file that then replaces the checkpoint file."""
+        data = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "key": self.key,
+                "created": self.created, "updated": time.time(),
+                "elapsed": self.elapsed + time.time() - self.run_start,
+                "num_solutions": self.num_solutions(), "z_names": self.z_names,
+                "cuts": [{"indices": indices, "values": values, "solution": solution, "exact": exact}
+                         for indices, values, solution, exact in self.cuts]}
+        temp_name = self.filename+".tmp"
+        try:
+            with open(temp_name, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_name, self.filename)
+        except OSError:
+            self.print_func("Failed to save the checkpoint to "+self.filename)
+        self.last_save = time.monotonic()
+
+    def discard(self):
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def num_solutions(self) -> int:
+        return sum(1 for c in self.cuts if c[2])
+
+    def attach(self, milp: SDMILP):
+        """Adds the cuts of the checkpoint to the MILP if it has the same intervention variables."""
+        z_names = [str(n) for n in milp.sd2dict(sparse.csr_matrix(numpy.ones((1, milp.num_z))))]
+        self.resumed_solutions = []
+        if self.z_names is not None and self.z_names != z_names:
+            self.print_func("The checkpoint does not match the strain design MILP and is not used.")
+            self.cuts = []
+        self.z_names = z_names
+        if len(self.cuts) > 0:
+            for indices, values, solution, exact in self.cuts:
+                z = sparse.csr_matrix((values, ([0] * len(indices), indices)), shape=(1, milp.num_z))
+                if exact:
+                    SDMILP.add_exclusion_constraints_ineq(milp, z)
+                else:
+                    SDMILP.add_exclusion_constraints(milp, z)
+                if solution:
+                    self.resumed_solutions.append(z)
+            self.print_func("Resuming from the checkpoint with "+str(len(self.resumed_solutions))+" strain designs and "
+                            +str(len(self.cuts) - len(self.resumed_solutions))+" excluded invalid designs.")
+
+    def record(self, z: sparse.csr_matrix, solution: bool, exact: bool):
+        for i in range(z.shape[0]):
+            row = sparse.csr_matrix(z[i])
+            row.eliminate_zeros()
+            self.cuts.append(([int(j) for j in row.indices], [float(v) for v in row.data], solution, exact))
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save()
+
+
+class CheckpointSDMILP(SDMILP):
+    """
+    A strain design MILP that records its cuts in the checkpoint that is active (see sd_checkpointing)
+    when it is set up and that resumes them from it. Without active checkpoint it behaves like SDMILP.
+    The overridden methods are internals of straindesign, see checkpointing_supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.checkpoint: SDCheckpoint = None
+        self.last_valid = None # the last design that has been verified successfully
+        self.requested_solutions = None
+        super().__init__(*args, **kwargs)
+        self.checkpoint = _active_checkpoint
+        if self.checkpoint is not None:
+            self.checkpoint.attach(self)
+
+    def verify_sd(self, sols):
+        valid = super().verify_sd(sols)
+        self.last_valid = sparse.csr_matrix(sols) if sols.shape[0] == 1 and all(valid) else None
+        return valid
+
+    def _is_last_valid(self, z) -> bool:
+        return self.last_valid is not None and z.shape == self.last_valid.shape and (z != self.last_valid).nnz == 0
+
+    def add_exclusion_constraints(self, z):
+        super().add_exclusion_constraints(z)
+        if self.checkpoint is not None:
+            self.checkpoint.record(z, self._is_last_valid(z), False)
+
+    def add_exclusion_constraints_ineq(self, z):
+        super().add_exclusion_constraints_ineq(z)
+        if self.checkpoint is not None:
+            self.checkpoint.record(z, False, True)
+
+    def _remaining(self, kwargs: dict) -> dict:
+        # only the remaining number of designs is searched for
+        if self.checkpoint is not None:
+            self.requested_solutions = kwargs.get(MAX_SOLUTIONS)
+            if self.requested_solutions is not None and not numpy.isinf(self.requested_solutions):
+                kwargs[MAX_SOLUTIONS] = max(0, self.requested_solutions - len(self.checkpoint.resumed_solutions))
+        return kwargs
+
+    def compute(self, **kwargs):
+        return super().compute(**self._remaining(kwargs))
+
+    def compute_optimal(self, **kwargs):
+        return super().compute_optimal(**self._remaining(kwargs))
+
+    def enumerate(self, **kwargs):
+        return super().enumerate(**self._remaining(kwargs))
+
+    def build_sd_solution(self, sd_dict, status, solution_approach):
+        if self.checkpoint is not None:
+            self.max_solutions = numpy.inf if self.requested_solutions is None else self.requested_solutions
+            if len(self.checkpoint.resumed_solutions) > 0:
+                sd_dict = [self.sd2dict(z, self.show_no_ki) for z in self.checkpoint.resumed_solutions] + sd_dict
+                if status == INFEASIBLE:
+                    status = OPTIMAL
+                elif status == TIME_LIMIT:
+                    status = TIME_LIMIT_W_SOL
+            self.checkpoint.save()
+        return super().build_sd_solution(sd_dict, status, solution_approach)
+
+
+# parameters of the SDMILP methods that CheckpointSDMILP overrides or uses
+_SDMILP_SIGNATURES = {"verify_sd": ["self", "sols"], "add_exclusion_constraints": ["self", "z"],
+                      "add_exclusion_constraints_ineq": ["self", "z"], "compute": ["self", "kwargs"],
+                      "compute_optimal": ["self", "kwargs"], "enumerate": ["self", "kwargs"],
+                      "build_sd_solution": ["self", "sd_dict", "status", "solution_approach"],
+                      "sd2dict": ["self", "sol", "args"]}
+
+
+def checkpointing_supported() -> bool:
+    """Whether the installed straindesign has the SDMILP methods on which CheckpointSDMILP relies."""
+    if getattr(_compute_module, "SDMILP", None) not in (SDMILP, CheckpointSDMILP):
+        return False
+    for name, parameters in _SDMILP_SIGNATURES.items():
+        try:
+            if list(inspect.signature(getattr(SDMILP, name)).parameters) != parameters:
+                return False
+        except (AttributeError, TypeError, ValueError):
+            return False
+    return True
+
+
+_active_checkpoint: SDCheckpoint = None
+# compute_strain_designs sets up the MILP with the SDMILP of its module
+_compute_module = importlib.import_module("straindesign.compute_strain_designs")
+
+
+@contextmanager
+def sd_checkpointing(checkpoint: SDCheckpoint):
+    """
+    Records the cuts of the strain design MILPs that compute_strain_designs sets up in this context in the
+    checkpoint and resumes them from it. straindesign offers no callbacks for this, therefore it uses
+    CheckpointSDMILP while the context is active; SDMILP itself is not changed. Only one computation can use
+    a checkpoint at a time. Without checkpoint or if the installed straindesign is not supported nothing is
+    changed.
+    """
+    global _active_checkpoint
+    if checkpoint is None:
+        yield
+        return
+    if not checkpointing_supported():
+        checkpoint.print_func("The installed version of straindesign does not support checkpoints, "
+                              "the computation runs without checkpoint.")
+        yield
+        return
+    if _active_checkpoint is not None:
+        raise RuntimeError("Another strain design computation is already using a checkpoint.")
+    _active_checkpoint = checkpoint
+    _compute_module.SDMILP = CheckpointSDMILP
+    try:
+        yield
+    finally:
+        stop_sd_checkpointing()
+
+
+def stop_sd_checkpointing():
+    """Ends sd_checkpointing; must be called when its computation thread is terminated."""
+    global _active_checkpoint
+    _active_checkpoint = None
+    _compute_module.SDMILP = SDMILP
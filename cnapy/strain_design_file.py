@@ -0,0 +1,204 @@
+"""Compact, versioned files for strain design results whose designs are read lazily"""
+
+import json
+import os
+import pickle
+import struct
+import zipfile
+from collections.abc import Sequence
+from typing import Dict, List
+
+import numpy
+
+FORMAT_NAME = "cnapy-strain-designs"
+FORMAT_VERSION = 1
+_HEADER = "format.json"
+
+
+def equivalence_classes(reaction_sd: Sequence) -> numpy.ndarray:
+    """
+    The index of the class of equal reaction interventions of each design, numbered in the order of first
+    occurrence like SDSolutions.get_gene_reac_sd_assoc_mark_no_ki().
+    """
+    classes = {}
+    return numpy.array([classes.setdefault(json.dumps(s, sort_keys=True), len(classes)) for s in reaction_sd],
+                       dtype=numpy.int64)
+
+
+class InterventionRows(Sequence):
+    """
+    The intervention dicts of the designs in compressed sparse row format. Each row is only
+    turned into a dict when it is accessed; rows restricts the view to a subset of the designs.
+    """
+
+    def __init__(self, names: List[str], indptr: numpy.ndarray, indices: numpy.ndarray, values: numpy.ndarray,
+                 rows: numpy.ndarray = None):
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values # with two columns for bounds
+        self.rows = rows
+
+    @staticmethod
+    def from_dicts(interventions: Sequence, names: Dict[str, int], bounds: bool = False):
+        indptr = numpy.zeros(len(interventions) + 1, dtype=numpy.int64)
+        indices = []
+        values = []
+        for i, s in enumerate(interventions):
+            for k, v in s.items():
+                indices.append(names.setdefault(k, len(names)))
+                values.append(v)
+            indptr[i+1] = len(indices)
+        values = numpy.array(values, dtype=numpy.float64).reshape((-1, 2) if bounds else (-1,))
+        return InterventionRows(None, indptr, numpy.array(indices, dtype=numpy.int32), values)
+
+    def subset(self, rows):
+        return InterventionRows(self.names, self.indptr, self.indices, self.values,
+                                numpy.asarray(rows, dtype=numpy.int64))
+
+    def __len__(self):
+        return len(self.indptr) - 1 if self.rows is None else len(self.rows)
+
+    def __getitem__(self, idx):
+        if self.rows is not None:
+            idx = self.rows[idx]
+        elif idx < 0:
+            idx += len(self)
+        start, end = self.indptr[idx], self.indptr[idx+1]
+        if self.values.ndim == 2:
+            return {self.names[j]: (float(lb), float(ub))
+                    for j, (lb, ub) in zip(self.indices[start:end], self.values[start:end])}
+        return {self.names[j]: float(v) for j, v in zip(self.indices[start:end], self.values[start:end])}
+
+    def clear(self):
+        self.rows = numpy.zeros(0, dtype=numpy.int64)
+
+
+def save_strain_designs(filename: str, solutions):
+    """
+    Saves the designs of the solutions (SDSolutions or StrainDesignFile) as a zip archive: a JSON header with
+    the format version, status, setup and intervention names, and uncompressed .npy members with the
+    interventions as sparse matrices, the bounds of the reaction interventions, the costs and the
+    equivalence classes. The archive can also be read with numpy.load.
+    """
+    names = {}
+    arrays = {}
+    groups = [("reaction_sd", solutions.reaction_sd, False), ("itv_bounds", solutions.get_reaction_sd_bnds(), True)]
+    if solutions.is_gene_sd:
+        groups.append(("gene_sd", solutions.gene_sd, False))
+    for group, interventions, bounds in groups:
+        rows = interventions if isinstance(interventions, InterventionRows) and interventions.rows is None else None
+        if rows is None or rows.names is None:
+            rows = InterventionRows.from_dicts(interventions, names, bounds)
+        else: # renumber the columns
+            renumber = numpy.array([names.setdefault(n, len(names)) for n in rows.names], dtype=numpy.int32)
+            rows = InterventionRows(None, rows.indptr, renumber[rows.indices] if len(renumber) else rows.indices,
+                                    rows.values)
+        arrays[group+"_indptr"] = rows.indptr
+        arrays[group+"_indices"] = rows.indices
+        arrays[group+"_values"] = rows.values
+    arrays["sd_cost"] = numpy.array(solutions.sd_cost, dtype=numpy.float64)
+    equiv_class = getattr(solutions, "equiv_class", None)
+    arrays["equiv_class"] = equivalence_classes(solutions.reaction_sd) if equiv_class is None else equiv_class
+    header = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "status": solutions.status,
+              "is_gene_sd": bool(solutions.is_gene_sd), "has_complex_regul_itv": bool(solutions.has_complex_regul_itv),
+              "sd_setup": solutions.sd_setup, "names": list(names)}
+    with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr(_HEADER, json.dumps(header))
+        for name, array in arrays.items():
+            with zf.open(name+".npy", 'w', force_zip64=True) as f:
+                numpy.lib.format.write_array(f, numpy.ascontiguousarray(array), allow_pickle=False)
+
+
+def is_strain_design_file(filename: str) -> bool:
+    try:
+        with zipfile.ZipFile(filename) as zf:
+            return json.loads(zf.read(_HEADER)).get("format") == FORMAT_NAME
+    except (zipfile.BadZipFile, KeyError, ValueError, OSError):
+        return False
+
+
+def _memmap_member(filename: str, zf: zipfile.ZipFile, name: str) -> numpy.ndarray:
+    # the data of an uncompressed member starts after its local file header
+    info = zf.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("Compressed member "+name)
+    with open(filename, 'rb') as f:
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        offset = info.header_offset + 30 + name_length + extra_length
+        f.seek(offset)
+        version = numpy.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError("Member "+name+" contains objects")
+    if numpy.prod(shape) == 0:
+        return numpy.zeros(shape, dtype=dtype)
+    return numpy.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape,
+                        order='F' if fortran_order else 'C')
+
+
+class StrainDesignFile:
+    """
+    The strain designs of a file written by save_strain_designs with the attributes and methods of SDSolutions
+    that the strain design viewer and the mode navigator use. The arrays are memory mapped so that opening
+    even very large files is immediate; the designs are read when they are accessed.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with zipfile.ZipFile(filename) as zf:
+            header = json.loads(zf.read(_HEADER))
+            if header.get("format") != FORMAT_NAME:
+                raise ValueError("Not a strain design file")
+            if header["version"] > FORMAT_VERSION:
+                raise ValueError("The strain design file has been written by a newer version of CNApy")
+            self.status = header["status"]
+            self.is_gene_sd = header["is_gene_sd"]
+            self.has_complex_regul_itv = header["has_complex_regul_itv"]
+            self.sd_setup = header["sd_setup"]
+            names = header["names"]
+            def rows(group):
+                return InterventionRows(names, *(_memmap_member(filename, zf, group+suffix+".npy")
+                                                 for suffix in ("_indptr", "_indices", "_values")))
+            self.reaction_sd = rows("reaction_sd")
+            self.itv_bounds = rows("itv_bounds")
+            self.gene_sd = rows("gene_sd") if self.is_gene_sd else None
+            self.sd_cost = _memmap_member(filename, zf, "sd_cost.npy")
+            self.equiv_class = _memmap_member(filename, zf, "equiv_class.npy")
+
+    def get_reaction_sd_bnds(self):
+        return self.itv_bounds
+
+    def get_num_sols(self):
+        return len(self.reaction_sd)
+
+    def save(self, filename: str):
+        if os.path.exists(filename) and os.path.samefile(filename, self.filename):
+            return # the memory maps still read from this file
+        save_strain_designs(filename, self)
+
+
+class _SDSolutionsUnpickler(pickle.Unpickler):
+    # only the classes that occur in SDSolutions pickles can be loaded, no other callables
+    allowed = {("straindesign.strainDesignSolutions", "SDSolutions"), ("straindesign.strainDesignModule", "SDModule"),
+               ("numpy", "dtype"), ("numpy", "ndarray"), ("numpy.core.multiarray", "scalar"),
+               ("numpy._core.multiarray", "scalar"), ("numpy.core.multiarray", "_reconstruct"),
+               ("numpy._core.multiarray", "_reconstruct"), ("collections", "OrderedDict"), ("fractions", "Fraction"),
+               ("builtins", "set"), ("builtins", "frozenset"), ("builtins", "complex")}
+
+    def find_class(self, module, name):
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError("Forbidden object "+module+"."+name+" in strain design file")
+        return super().find_class(module, name)
+
+
+def load_legacy_strain_designs(filename: str):
+    """Loads the SDSolutions of a pickled .sds file without executing arbitrary code from it."""
+    with open(filename, 'rb') as f:
+        return _SDSolutionsUnpickler(f).load()
@@ -0,0 +1,191 @@
+"""Parallel in-silico validation of strain designs"""
+
+import multiprocessing
+from math import isinf, isnan
+from typing import Dict, List, Tuple
+
+import numpy
+import pandas
+import cobra
+from cobra.util import ProcessPool
+
+_GROWTH_CONSTRAINT = "cnapy_validation_growth"
+
+
+def _init_worker(model: cobra.Model, product: Dict[str, float], substrate: Dict[str, float], fva_reactions: List[str]):
+    global _model
+    global _flux_vars
+    global _growth
+    global _direction
+    global _growth_expression
+    global _product
+    global _substrate
+    global _fva_vars
+    global _objective_vars
+
+    _model = model
+    _flux_vars = {r.id: (r.forward_variable, r.reverse_variable) for r in model.reactions}
+    objective = model.solver.objective
+    _growth = objective.get_linear_coefficients(objective.variables)
+    _direction = objective.direction
+    _objective_vars = list(_growth)
+    _growth_expression = objective.expression
+    def var_coefficients(expression: Dict[str, float]) -> Dict:
+        coefficients = {}
+        for r, c in expression.items():
+            fwd, rev = _flux_vars[r]
+            coefficients[fwd] = c
+            coefficients[rev] = -c
+        return coefficients
+    _product = var_coefficients(product)
+    _substrate = var_coefficients(substrate)
+    _fva_vars = [var_coefficients({r: 1.0}) for r in fva_reactions]
+
+
+def _optimize(coefficients: Dict, direction: str) -> float:
+    # only the objective coefficients change so that the solver starts from the previous basis
+    global _objective_vars
+    objective = _model.solver.objective
+    objective.set_linear_coefficients({v: 0.0 for v in _objective_vars})
+    objective.set_linear_coefficients(coefficients)
+    objective.direction = direction
+    _objective_vars = list(coefficients)
+    return _model.slim_optimize(error_value=numpy.nan)
+
+
+def _value(coefficients: Dict) -> float:
+    return sum(c * v.primal for v, c in coefficients.items())
+
+
+def _min_yield(max_iterations: int = 50) -> float:
+    """
+    The minimal product yield with Dinkelbach's method: product - λ substrate is minimized with the yield λ of
+    the previous solution until the minimum is zero. NaN if the substrate flux can vanish or an LP fails.
+    Without substrate the minimal product flux is returned.
+    """
+    if len(_substrate) == 0:
+        return _optimize(_product, 'min')
+    if not _optimize(_substrate, 'min') > 1e-9:
+        return numpy.nan
+    yield_value = _value(_product) / _value(_substrate)
+    for _ in range(max_iterations):
+        coefficients = dict(_product)
+        for v, c in _substrate.items():
+            coefficients[v] = coefficients.get(v, 0.0) - yield_value * c
+        if isnan(_optimize(coefficients, 'min')):
+            return numpy.nan
+        product_value = _value(_product)
+        substrate_value = _value(_substrate)
+        if product_value - yield_value * substrate_value >= -1e-9 * max(1.0, abs(yield_value)):
+            break
+        yield_value = product_value / substrate_value
+    return yield_value
+
+
+def _validation_step(args: Tuple[int, List[Dict[str, Tuple[float, float]]]]) -> Tuple[int, numpy.ndarray]:
+    """
+    Applies the intervention bounds of each design to the flux variables, computes the maximal growth rate,
+    the minimal yield at maximal growth, the minimal yield and the flux ranges of the FVA reactions and
+    restores the bounds. Returns the values (NaN if the design is infeasible).
+    """
+    (start, designs) = args
+    num_yield = 2 if len(_product) > 0 else 0
+    values = numpy.full((len(designs), 1 + num_yield + 2*len(_fva_vars)), numpy.nan)
+    for k, design in enumerate(designs):
+        saved = []
+        for r, (lb, ub) in design.items():
+            if r not in _flux_vars:
+                continue
+            if isnan(lb) or isnan(ub): # reaction that is not knocked in
+                lb = ub = 0.0
+            fwd, rev = _flux_vars[r]
+            saved += [(fwd, fwd.lb, fwd.ub), (rev, rev.lb, rev.ub)]
+            for v, (v_lb, v_ub) in ((fwd, (max(lb, 0), max(ub, 0))), (rev, (max(-ub, 0), max(-lb, 0)))):
+                v.set_bounds(v_lb, None if isinf(v_ub) else v_ub)
+        growth = _optimize(_growth, _direction)
+        if not isnan(growth):
+            values[k, 0] = growth
+            if num_yield > 0:
+                values[k, 2] = _min_yield()
+                # the growth rate is fixed at its optimum directly in the solver which is not recorded
+                # by a model context; solvers like Gurobi do not allow to relax it into a free constraint
+                tolerance = 1e-6 * max(1.0, abs(growth))
+                growth_constraint = _model.problem.Constraint(
+                    _growth_expression, name=_GROWTH_CONSTRAINT,
+                    lb=growth - tolerance if _direction == 'max' else None,
+                    ub=growth + tolerance if _direction == 'min' else None)
+                _model.solver.add(growth_constraint)
+                values[k, 1] = _min_yield()
+                _model.solver.remove(growth_constraint)
+            for i, coefficients in enumerate(_fva_vars):
+                values[k, 1 + num_yield + 2*i] = _optimize(coefficients, 'min')
+                values[k, 2 + num_yield + 2*i] = _optimize(coefficients, 'max')
+        for v, lb, ub in reversed(saved):
+            v.set_bounds(lb, ub)
+    return start, values
+
+
+def validate_strain_designs(model: cobra.Model, designs: List[Dict[str, Tuple[float, float]]],
+                            product: Dict[str, float] = None, substrate: Dict[str, float] = None,
+                            fva_reactions: List[str] = (), processes: int = None, chunk_size: int = 10,
+                            print_func=print, progress_callback=None, abort_callback=None) -> pandas.DataFrame:
+    """
+    Evaluates the strain designs, given as the reaction bounds of their interventions like the result of
+    SDSolutions.get_reaction_sd_bnds(), in the model (with the scenario that may have been loaded into it):
+    the optimal value of the model objective (growth), the minimal product yield at maximal growth, the
+    minimal (guaranteed) product yield and the flux ranges of the fva_reactions. product and substrate are
+    linear flux expressions as dicts; without substrate the product flux is used instead of the yield.
+    The designs are distributed over worker processes which each set up the LP once.
+    progress_callback is called with the number of evaluated designs.
+    Returns one row per design or None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    product = {} if product is None else product
+    substrate = {} if substrate is None else substrate
+    columns = ["Growth"]
+    if len(product) > 0:
+        if len(substrate) > 0:
+            columns += ["Yield at max. growth", "Min. yield"]
+        else:
+            columns += ["Product at max. growth", "Min. product"]
+    for r in fva_reactions:
+        columns += [r+" min", r+" max"]
+    values = numpy.full((len(designs), len(columns)), numpy.nan)
+    num_done = 0
+    def collect(step_result):
+        nonlocal num_done
+        (start, step_values) = step_result
+        values[start:start+len(step_values)] = step_values
+        num_done += len(step_values)
+        if progress_callback is not None:
+            progress_callback(num_done)
+
+    steps = [(i, designs[i:i+chunk_size]) for i in range(0, len(designs), chunk_size)]
+    if processes > 1 and len(steps) > 1:
+        with ProcessPool(min(processes, len(steps)), initializer=_init_worker,
+                         initargs=(model, product, substrate, list(fva_reactions))) as pool:
+            results = pool.imap_unordered(_validation_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+                except StopIteration:
+                    break
+    else:
+        with model:
+            # replaced through the model so that the objective is restored when the context ends
+            model.objective = model.problem.Objective(model.solver.objective.expression,
+                                                      direction=model.solver.objective.direction)
+            _init_worker(model, product, substrate, list(fva_reactions))
+            for step in steps:
+                if abort_callback is not None and abort_callback():
+                    return None
+                collect(_validation_step(step))
+
+    print_func("Validated "+str(len(designs))+" strain designs, "+str(int(numpy.sum(numpy.isnan(values[:, 0]))))
+               +" of them are infeasible.")
+    return pandas.DataFrame(values, columns=columns)
@@ -1,10 +1,491 @@
 ''' Tests '''
+import copy
+import json
+import os
+import pickle
+
 import cobra
+import numpy
+import straindesign
+import optlang_enumerator.mcs_computation as mcs_computation
 
+import cnapy.appdata
+import cnapy.blocked_reactions
 import cnapy.core
+import cnapy.dynamic_fba
+import cnapy.flux_coupling
+import cnapy.flux_optimization
+import cnapy.flux_sampling
+import cnapy.flux_vector_container
+import cnapy.fva
+import cnapy.knockout_screen
+import cnapy.loopless
+import cnapy.mcs_enumeration
+import cnapy.multi_scenario
+import cnapy.scenario_sweep
+import cnapy.strain_design_checkpoint
+import cnapy.strain_design_file
+import cnapy.strain_design_validation
+import cnapy.thermodynamics
 
 
 def test_efm_computation():
     model = cobra.Model()
     scen_values = {}
     cnapy.core.efm_computation(model, scen_values, True)
+
+
+def test_kshortest_efm_computation():
+    # A -> B through R1, R2 and the reversible R3 has three pathways and the two cycles R1/R3 and R2/R3
+    model = cobra.Model()
+    model.add_metabolites([cobra.Metabolite("A"), cobra.Metabolite("B")])
+    for r_id, stoichiometry, lower_bound in (("EX_A", {"A": 1}, 0), ("R1", {"A": -1, "B": 1}, 0),
+                                             ("R2", {"A": -1, "B": 1}, 0), ("R3", {"A": -1, "B": 1}, -1000),
+                                             ("EX_B", {"B": -1}, 0)):
+        reaction = cobra.Reaction(r_id, lower_bound=lower_bound, upper_bound=1000)
+        model.add_reactions([reaction])
+        reaction.add_metabolites({model.metabolites.get_by_id(m): c for m, c in stoichiometry.items()})
+    efms, _ = cnapy.core.kshortest_efm_computation(model, {}, False, print_progress_function=lambda text: None)
+    assert sorted(tuple(numpy.sign(v).astype(int)) for v in numpy.asarray(efms.fv_mat)) == \
+        [(0, 0, 1, -1, 0), (0, 1, 0, -1, 0), (1, 0, 0, 1, 1), (1, 0, 1, 0, 1), (1, 1, 0, 0, 1)]
+    model = cobra.io.load_model("textbook")
+    efms, _ = cnapy.core.kshortest_efm_computation(model, {}, False, max_efm_num=10,
+                                                   print_progress_function=lambda text: None)
+    fv_mat = numpy.asarray(efms.fv_mat)
+    stoich_mat = cobra.util.create_stoichiometric_matrix(model)[:, [model.reactions.index(r) for r in efms.reac_id]]
+    assert fv_mat.shape[0] == 10 and numpy.abs(stoich_mat @ fv_mat.T).max() < 1e-6
+    sizes = numpy.sum(fv_mat != 0, axis=1)
+    assert numpy.all(numpy.diff(sizes) >= 0) # in order of increasing support size
+    for v, size in zip(fv_mat, sizes): # support minimal, i.e. elementary
+        assert numpy.linalg.matrix_rank(stoich_mat[:, v != 0]) == size - 1
+    try:
+        cnapy.core.kshortest_efm_computation(model, {}, False, max_efm_num=-1)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_minimal_hitting_sets():
+    # sets {0, 1}, {1, 2} and the superset {0, 1, 2} which does not change the result
+    hitting_sets = cnapy.core.minimal_hitting_sets([0b011, 0b110, 0b111])
+    assert sorted(hitting_sets) == [0b010, 0b101]
+    assert cnapy.core.minimal_hitting_sets([0b011, 0b110], max_size=1) == [0b010]
+
+
+def test_mcs_from_efms():
+    # columns EX_A, R1, R2, EX_B; the second EFM is reversible and only stored in its forward direction
+    efms = cnapy.flux_vector_container.FluxVectorContainer(
+        numpy.array([[1, 1, 0, 1], [1, 0, 1, 1], [0, 1, -1, 0]], dtype=float), reac_id=["EX_A", "R1", "R2", "EX_B"],
+        irreversible=numpy.array([True, False, True]))
+    reac_id = ["EX_A", "R1", "R2", "EX_B"]
+    uptake_of_b = (numpy.array([[0.0, 0.0, 0.0, 1.0]]), numpy.array([-1.0]))
+    mcs = cnapy.core.mcs_from_efms(efms, [uptake_of_b], [], reac_id)
+    assert sorted(mcs) == [[0], [2], [3]]
+    reverse_r1 = (numpy.array([[0.0, 1.0, 0.0, 0.0]]), numpy.array([-1.0]))
+    try:
+        cnapy.core.mcs_from_efms(efms, [reverse_r1], [], reac_id)
+        assert False
+    except cnapy.core.NoTargetModes:
+        pass
+
+
+def test_parallel_mcs_computation(tmp_path):
+    # A -> B through R1 or R2, B -> C through R3 or R4
+    model = cobra.Model()
+    model.add_metabolites([cobra.Metabolite(m) for m in "ABC"])
+    for r_id, stoichiometry in (("EX_A", {"A": 1}), ("R1", {"A": -1, "B": 1}), ("R2", {"A": -1, "B": 1}),
+                                ("R3", {"B": -1, "C": 1}), ("R4", {"B": -1, "C": 1}), ("EX_C", {"C": -1})):
+        reaction = cobra.Reaction(r_id, lower_bound=0, upper_bound=10)
+        model.add_reactions([reaction])
+        reaction.add_metabolites({model.metabolites.get_by_id(m): c for m, c in stoichiometry.items()})
+    model.solver = "glpk"
+    reac_id = model.reactions.list_attr("id")
+    targets = [mcs_computation.relations2leq_matrix(mcs_computation.parse_relations(
+        [("EX_C", ">=", 1.0)], reac_id_symbols=mcs_computation.get_reac_id_symbols(reac_id)), reac_id)]
+    mcs, err_val = cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, targets, [], 3, exclude_boundary_reactions_as_cuts=True, processes=1)
+    assert err_val == 0 and sorted(mcs) == [(1, 2), (3, 4)]
+    # resume a run with one partition per candidate in which only the partition of R1 has been finished
+    cuts = numpy.array([False, True, True, True, True, False])
+    problem_hash = cnapy.mcs_enumeration.mcs_problem_hash(cobra.io.to_json(model), targets, [], cuts)
+    checkpoint = cnapy.mcs_enumeration.MCSCheckpoint(str(tmp_path / ("mcs_checkpoint_"+problem_hash+".json")),
+                                                     problem_hash, reac_id)
+    checkpoint.complete_size = 1
+    checkpoint.num_partitions = 4
+    checkpoint.done_partitions = [0]
+    checkpoint.mcs = [(1, 2)]
+    checkpoint.save()
+    mcs, err_val = cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, targets, [], 3, exclude_boundary_reactions_as_cuts=True, checkpoint_dir=str(tmp_path), processes=1)
+    assert err_val == 0 and sorted(mcs) == [(1, 2), (3, 4)]
+    # the checkpoint is complete up to size 3 now but only the requested MCS are returned
+    mcs, _ = cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, targets, [], 1, exclude_boundary_reactions_as_cuts=True, checkpoint_dir=str(tmp_path), processes=1)
+    assert mcs == []
+    # each MCS is found in exactly one partition
+    mcs, err_val = cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, targets, [], 3, exclude_boundary_reactions_as_cuts=True, processes=2)
+    assert err_val == 0 and sorted(mcs) == [(1, 2), (3, 4)]
+    model.remove_reactions(["R1", "R2", "R3", "R4"])
+    assert cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, [], [], 3, exclude_boundary_reactions_as_cuts=True, processes=1) == ([], 0)
+    # same MCS as compute_mcs with blocked reactions and a desired region
+    model = cobra.io.load_model("textbook")
+    model.solver = "glpk"
+    reac_id = model.reactions.list_attr("id")
+    symbols = mcs_computation.get_reac_id_symbols(reac_id)
+    targets = [mcs_computation.relations2leq_matrix(mcs_computation.parse_relations(
+        [("EX_ac_e", ">=", 1.0)], reac_id_symbols=symbols), reac_id)]
+    desired = [mcs_computation.relations2leq_matrix(mcs_computation.parse_relations(
+        [("Biomass_Ecoli_core", ">=", 0.1)], reac_id_symbols=symbols), reac_id)]
+    reference, _ = mcs_computation.compute_mcs(model, copy.deepcopy(targets), copy.deepcopy(desired), max_mcs_size=2,
+                                               timeout=None, exclude_boundary_reactions_as_cuts=True,
+                                               network_compression=False)
+    mcs, err_val = cnapy.mcs_enumeration.parallel_mcs_computation(
+        model, targets, desired, 2, exclude_boundary_reactions_as_cuts=True, processes=2)
+    assert err_val == 0 and sorted(mcs) == sorted(tuple(sorted(m)) for m in reference)
+
+
+def test_find_blocked_reactions():
+    model = cobra.io.load_model("textbook")
+    # a dead end and a loss of flux through the aerobic respiration
+    model.add_metabolites([cobra.Metabolite("dead_end_c")])
+    model.add_reactions([cobra.Reaction("DEAD_END")])
+    model.reactions.DEAD_END.add_metabolites({model.metabolites.pyr_c: -1, model.metabolites.dead_end_c: 1})
+    for lower_bound in (-1000, 0):
+        model.reactions.EX_o2_e.lower_bound = lower_bound
+        blocked = cnapy.blocked_reactions.find_blocked_reactions(model, print_func=lambda text: None)
+        assert sorted(blocked) == sorted(cobra.flux_analysis.find_blocked_reactions(model))
+    assert set(cnapy.blocked_reactions.find_dead_end_reactions(model)) <= set(blocked)
+    assert "DEAD_END" in blocked
+    # only whole reaction IDs are protected
+    setup = json.dumps({"constraints": "2*O2t - EX_o2_e >= 1", "ko_cost": {"CYTBD_2": 1}})
+    assert cnapy.blocked_reactions.referenced_reactions(setup, blocked) == {"O2t", "EX_o2_e"}
+    with model as model:
+        removed = cnapy.blocked_reactions.remove_blocked_reactions(model, blocked, protected={"O2t", "EX_o2_e"})
+        assert "CYTBD" in removed and "O2t" in model.reactions and "EX_o2_e" in model.reactions
+
+
+def test_fast_flux_variability_analysis():
+    model = cobra.io.load_model("textbook")
+    fva_result = cnapy.fva.fast_flux_variability_analysis(model, fraction_of_optimum=0.9, processes=1)
+    cobra_result = cobra.flux_analysis.flux_variability_analysis(model, fraction_of_optimum=0.9, processes=1)
+    assert (fva_result - cobra_result.loc[fva_result.index]).abs().max().max() < 1e-6
+    # incremental FVA after tightening and relaxing a bound
+    state = cnapy.fva.FVAState()
+    cnapy.fva.fast_flux_variability_analysis(model, processes=1, state=state)
+    for lower_bound in (-5, -20):
+        model.reactions.EX_glc__D_e.lower_bound = lower_bound
+        fva_result = cnapy.fva.fast_flux_variability_analysis(model, processes=1, state=state)
+        cobra_result = cobra.flux_analysis.flux_variability_analysis(model, fraction_of_optimum=0, processes=1)
+        assert (fva_result - cobra_result.loc[fva_result.index]).abs().max().max() < 1e-6
+
+
+def test_optimization_lp_cache():
+    model = cobra.io.load_model("textbook")
+    constraints = [({"EX_o2_e": 1.0}, ">=", -10.0)]
+    cache = cnapy.flux_optimization.OptimizationLPCache()
+    flux_lp = cache.get_flux_lp(model, constraints, "glpk")
+    for obj, sense in (("Biomass_Ecoli_core", "maximize"), ("EX_ac_e", "maximize"), ("PGK", "minimize")):
+        sol = flux_lp.optimize(obj, sense)
+        ref = straindesign.fba(model, obj=obj, obj_sense=sense, constraints=[list(c) for c in constraints], solver="glpk")
+        assert abs(sol.objective_value - ref.objective_value) < 1e-6
+    yield_lp = cache.get_yield_lp(model, constraints, "glpk")
+    assert cache.flux_lp is flux_lp
+    for num in ("EX_ac_e", "EX_etoh_e"):
+        sol = yield_lp.optimize(num, "-1.0 EX_glc__D_e")
+        ref = straindesign.yopt(model, obj_num=num, obj_den="-1.0 EX_glc__D_e",
+                                constraints=[list(c) for c in constraints], solver="glpk")
+        assert abs(sol.objective_value - ref.objective_value) < 1e-6
+    model.reactions.EX_glc__D_e.lower_bound = -5
+    assert cache.get_flux_lp(model, constraints, "glpk") is not flux_lp
+
+
+def test_validate_strain_designs():
+    model = cobra.io.load_model("textbook")
+    designs = [{}, {"ATPS4r": (0.0, 0.0), "FUM": (numpy.nan, numpy.nan)}, {"ENO": (0.0, 0.0)}]
+    result = cnapy.strain_design_validation.validate_strain_designs(
+        model, designs, {"EX_ac_e": 1.0}, {"EX_glc__D_e": -1.0}, ["PGK"], processes=1)
+    assert list(result.columns) == ["Growth", "Yield at max. growth", "Min. yield", "PGK min", "PGK max"]
+    assert abs(result["Growth"][0] - model.slim_optimize()) < 1e-6
+    assert abs(result["Growth"][1] - 0.374230) < 1e-5 and abs(result["Yield at max. growth"][1] - 1.431224) < 1e-5
+    assert abs(result["Min. yield"][1]) < 1e-6 and abs(result["PGK max"][1] - (-4.195)) < 1e-3
+    assert abs(result["Growth"][2]) < 1e-9 # ENO is essential
+    assert len(model.constraints) == len(model.metabolites) and model.reactions.ATPS4r.bounds == (-1000.0, 1000.0)
+
+
+def test_strain_design_file(tmp_path):
+    model = cobra.io.load_model("textbook")
+    module = straindesign.SDModule(model, "suppress", constraints="Biomass_Ecoli_core >= 0.1")
+    solutions = straindesign.compute_strain_designs(model, sd_modules=[module], max_solutions=10, max_cost=2,
+                                                    solver="glpk", gko_cost={g.id: 1 for g in model.genes[:40]})
+    solutions.save(tmp_path / "legacy.sds")
+    legacy = cnapy.strain_design_file.load_legacy_strain_designs(tmp_path / "legacy.sds")
+    filename = str(tmp_path / "designs.sds")
+    cnapy.strain_design_file.save_strain_designs(filename, legacy)
+    assert cnapy.strain_design_file.is_strain_design_file(filename)
+    assert not cnapy.strain_design_file.is_strain_design_file(tmp_path / "legacy.sds")
+    designs = cnapy.strain_design_file.StrainDesignFile(filename)
+    assert designs.is_gene_sd and designs.status == solutions.status and designs.sd_setup == json.loads(json.dumps(solutions.sd_setup))
+    assert list(designs.gene_sd) == solutions.gene_sd and list(designs.reaction_sd) == solutions.reaction_sd
+    assert list(designs.get_reaction_sd_bnds()) == solutions.get_reaction_sd_bnds()
+    assert list(designs.equiv_class) == solutions.get_gene_reac_sd_assoc_mark_no_ki()[1]
+    assert numpy.array_equal(designs.sd_cost, solutions.sd_cost)
+    designs.save(tmp_path / "copy.sds")
+    assert list(cnapy.strain_design_file.StrainDesignFile(tmp_path / "copy.sds").gene_sd) == solutions.gene_sd
+    with open(tmp_path / "malicious.sds", "wb") as f:
+        pickle.dump(os.getcwd, f)
+    try:
+        cnapy.strain_design_file.load_legacy_strain_designs(tmp_path / "malicious.sds")
+        assert False
+    except pickle.UnpicklingError:
+        pass
+
+
+def test_strain_design_checkpoint(tmp_path):
+    model = cobra.io.load_model("textbook")
+    module = straindesign.SDModule(model, "suppress", constraints="Biomass_Ecoli_core >= 0.1")
+    setup = dict(sd_modules=[module], max_cost=2, solver="glpk", solution_approach="any")
+    complete = straindesign.compute_strain_designs(model, **setup)
+    filename = str(tmp_path / cnapy.strain_design_checkpoint.checkpoint_file_name("key"))
+    checkpoint = cnapy.strain_design_checkpoint.SDCheckpoint(filename, "key")
+    with cnapy.strain_design_checkpoint.sd_checkpointing(checkpoint):
+        first = straindesign.compute_strain_designs(model, max_solutions=3, **setup)
+    assert checkpoint.num_solutions() == 3 and first.get_num_sols() < complete.get_num_sols()
+    checkpoint = cnapy.strain_design_checkpoint.SDCheckpoint(filename, "key")
+    assert checkpoint.load() and checkpoint.num_solutions() == 3
+    with cnapy.strain_design_checkpoint.sd_checkpointing(checkpoint):
+        resumed = straindesign.compute_strain_designs(model, **setup)
+    assert set(map(str, first.reaction_sd)) <= set(map(str, resumed.reaction_sd))
+    assert sorted(map(str, resumed.reaction_sd)) == sorted(map(str, complete.reaction_sd))
+    assert not cnapy.strain_design_checkpoint.SDCheckpoint(filename, "other").load()
+    # a terminated computation does not leave its context, its checkpoint must not be used afterwards
+    checkpoint = cnapy.strain_design_checkpoint.SDCheckpoint(filename, "key")
+    context = cnapy.strain_design_checkpoint.sd_checkpointing(checkpoint)
+    context.__enter__()
+    try:
+        with cnapy.strain_design_checkpoint.sd_checkpointing(checkpoint):
+            pass
+        assert False
+    except RuntimeError:
+        pass
+    cnapy.strain_design_checkpoint.stop_sd_checkpointing()
+    straindesign.compute_strain_designs(model, max_solutions=1, **setup)
+    assert len(checkpoint.cuts) == 0
+    # a straindesign version whose SDMILP differs runs without checkpoint
+    signatures = cnapy.strain_design_checkpoint._SDMILP_SIGNATURES
+    signatures["verify_sd"] = ["self", "solutions"]
+    try:
+        assert not cnapy.strain_design_checkpoint.checkpointing_supported()
+        with cnapy.strain_design_checkpoint.sd_checkpointing(checkpoint):
+            straindesign.compute_strain_designs(model, max_solutions=1, **setup)
+    finally:
+        signatures["verify_sd"] = ["self", "sols"]
+    assert len(checkpoint.cuts) == 0 and cnapy.strain_design_checkpoint.checkpointing_supported()
+
+
+def test_flux_sampling():
+    model = cobra.io.load_model("textbook")
+    samples = cnapy.flux_sampling.sample_fluxes(model, 200, thinning=10, processes=1, seed=1)
+    fluxes = numpy.asarray(samples.fv_mat)
+    assert fluxes.shape == (200, len(model.reactions))
+    assert numpy.abs(cobra.util.create_stoichiometric_matrix(model) @ fluxes.T).max() < 1e-6
+    stats = cnapy.flux_sampling.sample_statistics(samples, max_block_bytes=1000)
+    assert numpy.allclose(stats['mean'], fluxes.mean(axis=0))
+    samples.clear()
+    sampler = cnapy.flux_sampling.FluxSampler(model, thinning=10, seed=1, print_func=lambda text: None)
+    assert numpy.all(sampler.validate(sampler.sample(20, fluxes=False).to_numpy()) == 'v')
+
+
+def test_flux_coupling_analysis():
+    model = cobra.io.load_model("textbook")
+    coupling = cnapy.flux_coupling.flux_coupling_analysis(model, processes=1)
+    assert coupling.num_blocked() == 8
+    FCR = cnapy.flux_coupling.FluxCouplingResult
+    assert coupling.coupling_type("ACONTa", "ACONTb") == FCR.FULLY
+    assert coupling.coupling_type("PGK", "PGM") == FCR.PARTIALLY
+    assert coupling.coupling_type("Biomass_Ecoli_core", "GLNS") == FCR.DIRECTIONALLY
+    assert coupling.coupling_type("GLNS", "Biomass_Ecoli_core") == FCR.DIRECTIONALLY_REVERSE
+    assert coupling.coupling_type("PFK", "FBA") == FCR.UNCOUPLED
+
+
+def test_knockout_screen():
+    model = cobra.io.load_model("textbook")
+    screen = cnapy.knockout_screen.knockout_screen(model, genes=True, double=True, processes=1)
+    growth = {frozenset(d): v[0] for d, v in zip(screen.deleted, screen.values)}
+    cobra_result = cobra.flux_analysis.double_gene_deletion(model, gene_list1=["b1723", "b3916", "b2276"], processes=1)
+    for ids, value in zip(cobra_result["ids"], cobra_result["growth"]):
+        assert abs(growth[frozenset(ids)] - value) < 1e-4
+
+
+def test_scenario_sweep():
+    model = cobra.io.load_model("textbook")
+    sweep = cnapy.scenario_sweep.scenario_sweep(model, [("EX_glc__D_e", -10, 0, 6, cnapy.scenario_sweep.LOWER),
+                                                        ("EX_o2_e", -20, 0, 3, cnapy.scenario_sweep.LOWER)], processes=1)
+    assert sweep.values.shape == (6, 3, 1)
+    with model:
+        model.reactions.EX_glc__D_e.lower_bound = -6
+        model.reactions.EX_o2_e.lower_bound = -10
+        assert abs(sweep.values[2, 1, 0] - model.slim_optimize()) < 1e-6
+    sweep = cnapy.scenario_sweep.scenario_sweep(model, [("EX_o2_e", -20, 0, 2, cnapy.scenario_sweep.FIXED)],
+                                                numerator={"EX_ac_e": 1}, denominator={"EX_glc__D_e": -1}, processes=1)
+    assert numpy.allclose(sweep.values[:, 0], [2, 1])
+    try:
+        cnapy.scenario_sweep.scenario_sweep(model, [("EX_o2_e", -20, 0, 2, cnapy.scenario_sweep.LOWER),
+                                                    ("EX_o2_e", -10, 0, 2, cnapy.scenario_sweep.UPPER)], processes=1)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_evaluate_scenarios(tmp_path):
+    model = cobra.io.load_model("textbook")
+    file_names = []
+    for i, uptake in enumerate((-10.0, -5.0)):
+        scenario = cnapy.appdata.Scenario()
+        scenario["EX_glc__D_e"] = (uptake, 1000.0)
+        file_names.append(str(tmp_path / ("glc"+str(i)+".scen")))
+        scenario.save(file_names[-1])
+    scenarios = cnapy.multi_scenario.read_scenario_files(file_names, model.reactions.list_attr("id"))
+    result = cnapy.multi_scenario.evaluate_scenarios(model, scenarios, ["glc10", "glc5"],
+                                                     analysis=cnapy.multi_scenario.PFBA, processes=1)
+    for i, uptake in enumerate((-10.0, -5.0)):
+        with model:
+            model.reactions.EX_glc__D_e.lower_bound = uptake
+            fluxes = cobra.flux_analysis.pfba(model).fluxes
+        assert abs(result.objective_values[i] - fluxes["Biomass_Ecoli_core"]) < 1e-6
+        assert abs(numpy.sum(numpy.abs(result.lower[:, i])) - fluxes.abs().sum()) < 1e-6
+    assert result.differing()[model.reactions.index("EX_glc__D_e")]
+
+
+def test_dynamic_fba():
+    model = cobra.io.load_model("textbook")
+    result = cnapy.dynamic_fba.dynamic_fba(model, "Biomass_Ecoli_core", {"EX_glc__D_e": (10, 10, 0.5)}, 0.01, 10, 200)
+    assert model.reactions.EX_glc__D_e.lower_bound == -10 # restored
+    assert 0 < len(result) < 200 # stops when the glucose is used up
+    glc = result.conc_id.index("EX_glc__D_e")
+    assert numpy.all(numpy.diff(result.biomass) > 0) and numpy.all(numpy.diff(result.concentrations[:, glc]) < 0)
+    # the glucose balance holds in every step, also when the glucose is used up within a long step
+    result = cnapy.dynamic_fba.dynamic_fba(model, "Biomass_Ecoli_core", {"EX_glc__D_e": (10, 10, 0.5)}, 0.01, 10, 20)
+    mu = result.fv_mat[:, model.reactions.index("Biomass_Ecoli_core")]
+    consumed = result.fv_mat[:, model.reactions.index("EX_glc__D_e")] * numpy.diff(result.biomass) / mu
+    assert numpy.allclose(numpy.diff(result.concentrations[:, glc]), consumed, atol=1e-9)
+    with model:
+        model.reactions.EX_glc__D_e.lower_bound = -10*10/10.5
+        assert abs(result.fv_mat[0, model.reactions.index("Biomass_Ecoli_core")] - model.slim_optimize()) < 1e-6
+
+
+def test_loopless():
+    model = cobra.io.load_model("textbook")
+    fva_result = cnapy.fva.fast_flux_variability_analysis(model, processes=1, loopless=True)
+    assert fva_result.loc["SUCDi", "maximum"] < 1000 # the loop with FRD7 is removed
+    reference = cobra.flux_analysis.flux_variability_analysis(model, reaction_list=["SUCDi", "FRD7"],
+                                                              fraction_of_optimum=0.0, loopless="fastSNP")
+    assert numpy.allclose(fva_result.loc[reference.index].values, reference[fva_result.columns].values)
+    with model:
+        model.reactions.SUCDi.bounds = (100, 100)
+        solution = model.optimize()
+        model.reactions.SUCDi.lower_bound = 0
+        fluxes = cnapy.loopless.loopless_fluxes(model, solution.fluxes)
+    assert fluxes["FRD7"] < 1e-9 and abs(fluxes["Biomass_Ecoli_core"] - solution.objective_value) < 1e-9
+
+    # two parallel loops through r: blocking the reactions of the first loop is not enough
+    model = cobra.Model()
+    x, y = cobra.Metabolite("x"), cobra.Metabolite("y")
+    for r_id, stoichiometry, bounds in (("r", {x: -1, y: 1}, (0, 1000)), ("A", {y: -1, x: 1}, (0, 1000)),
+                                        ("B", {y: -1, x: 1}, (0, 1000)), ("EX_x", {x: 1}, (0, 10)),
+                                        ("EX_y", {y: -1}, (0, 1000))):
+        reaction = cobra.Reaction(r_id, lower_bound=bounds[0], upper_bound=bounds[1])
+        reaction.add_metabolites(stoichiometry)
+        model.add_reactions([reaction])
+    fva_result = cnapy.fva.fast_flux_variability_analysis(model, processes=1, loopless=True)
+    reference = cobra.flux_analysis.flux_variability_analysis(model, fraction_of_optimum=0.0, loopless="fastSNP")
+    assert abs(fva_result.loc["r", "maximum"] - 10) < 1e-6
+    assert numpy.allclose(fva_result.loc[reference.index].values, reference[fva_result.columns].values)
+
+
+def test_cobrak_model_cache():
+    model = cobra.io.load_model("textbook")
+    model.reactions.PGK.annotation["dG0"] = "-18.5"
+    cache = cnapy.thermodynamics.CobrakModelCache()
+    cobrak_model = cache.get(model, [], 1e-6, 0.2)
+    pgk = [reac_id for reac_id, (r_id, _) in cache.reaction_map.items() if r_id == "PGK"]
+    assert sorted(cobrak_model.reactions[reac_id].dG0 for reac_id in pgk) == [-18.5, 18.5]
+    assert "cobrak_dG0" not in model.reactions.PGK.annotation # the model is not changed
+    model.reactions.PGK.annotation["dG0"] = "5"
+    model.metabolites.atp_c.annotation["Cmax"] = "0.01"
+    assert cache.get(model, [], 1e-6, 0.2) is cobrak_model # only patched
+    assert sorted(cobrak_model.reactions[reac_id].dG0 for reac_id in pgk) == [-5, 5]
+    assert abs(cobrak_model.metabolites["atp_c"].log_max_conc - numpy.log(0.01)) < 1e-12
+    with model:
+        model.reactions.PGK.lower_bound = 0
+        assert cache.get(model, [], 1e-6, 0.2) is not cobrak_model
+
+
+def test_thermodynamic_analysis_in_worker():
+    model = cobra.io.load_model("textbook")
+    for reaction in model.reactions:
+        if not reaction.boundary:
+            reaction.annotation["dG0"] = "-10"
+    cobrak_model = cnapy.thermodynamics.CobrakModelCache().get(model, [], 1e-6, 0.2)
+    output = []
+    solution = cnapy.thermodynamics.thermodynamic_analysis_in_worker(
+        cobrak_model, cnapy.thermodynamics.ThermodynamicAnalysisTypes.OPTMDFPATHWAY, -float("inf"), "highs",
+        print_func=output.append)
+    assert solution[cnapy.thermodynamics.ALL_OK_KEY] and solution[cnapy.thermodynamics.MDF_VAR_ID] > 0
+    assert len(output) > 0 # the solver output of the worker process
+    assert cnapy.thermodynamics.thermodynamic_analysis_in_worker(
+        cobrak_model, cnapy.thermodynamics.ThermodynamicAnalysisTypes.OPTMDFPATHWAY, -float("inf"), "highs",
+        abort_callback=lambda: True) is None
+
+
+def test_thermodynamic_variability_analysis():
+    model = cobra.Model()
+    a, b, c = (cobra.Metabolite(m, compartment="c", charge=0) for m in ("a", "b", "c"))
+    reactions = {"EX_a": {a: 1}, "R1": {a: -1, b: 1}, "R2": {b: -1, c: 1}, "EX_c": {c: -1}}
+    for r_id, stoichiometry in reactions.items():
+        reaction = cobra.Reaction(r_id, lower_bound=0, upper_bound=10)
+        model.add_reactions([reaction])
+        reaction.add_metabolites(stoichiometry)
+    model.reactions.EX_a.lower_bound = 1 # forces flux through the pathway
+    model.reactions.R1.annotation["dG0"] = "-10"
+    model.reactions.R2.annotation["dG0"] = "2"
+    cache = cnapy.thermodynamics.CobrakModelCache()
+    cobrak_model = cache.get(model, [], 1e-6, 0.01)
+    df_ranges, conc_ranges = cnapy.thermodynamics.thermodynamic_variability_analysis(
+        cobrak_model, cache.reaction_map, 5.0, "highs", processes=1)
+    assert abs(df_ranges["R1"][0] - 5) < 1e-6 and abs(df_ranges["R2"][0] - 5) < 1e-6 # both reactions must be active
+    # R2 needs a concentration ratio c/b of at most exp(-7/RT) which limits b and thereby the driving force of R1
+    rt = cobrak_model.R*cobrak_model.T
+    assert abs(conc_ranges["b"][0] - 1e-6*numpy.exp(7/rt)) < 1e-9
+    assert abs(df_ranges["R1"][1] - (3 + rt*numpy.log(0.01/1e-6))) < 1e-4
+
+
+def test_thermodynamic_mode_ranking():
+    model = cobra.Model()
+    a, b, c = (cobra.Metabolite(m, compartment="c", charge=0) for m in ("a", "b", "c"))
+    reactions = {"EX_a": {a: 1}, "R1": {a: -1, b: 1}, "R2": {b: -1, c: 1}, "R3": {a: -1, c: 1}, "EX_c": {c: -1}}
+    for r_id, stoichiometry in reactions.items():
+        reaction = cobra.Reaction(r_id, lower_bound=0, upper_bound=10)
+        model.add_reactions([reaction])
+        reaction.add_metabolites(stoichiometry)
+    model.reactions.EX_a.lower_bound = 1
+    model.reactions.R2.lower_bound = -10
+    model.reactions.R1.annotation["dG0"] = "-10"
+    model.reactions.R2.annotation["dG0"] = "2"
+    model.reactions.R3.annotation["dG0"] = "-20"
+    cache = cnapy.thermodynamics.CobrakModelCache()
+    cobrak_model = cache.get(model, [], 1e-6, 0.01)
+    reac_id = model.reactions.list_attr("id")
+    rt = cobrak_model.R*cobrak_model.T
+    optmdf = numpy.array([(8 + rt*numpy.log(1e4))/2, 20 + rt*numpy.log(1e4)]) # pathway via R1, R2 and via R3
+    efms = cnapy.flux_vector_container.FluxVectorContainer(numpy.array([[1, 1, 1, 0, 1], [1, 0, 0, 1, 1]]), reac_id)
+    mdf = cnapy.thermodynamics.thermodynamic_mode_ranking(
+        cobrak_model, cache.reaction_map, reac_id, cnapy.thermodynamics.flux_vector_restrictions(efms), "highs",
+        processes=1)
+    assert numpy.allclose(mdf, optmdf)
+    designs = [{"R3": (0.0, 0.0)}, {"R1": (0.0, 0.0)}, {"R1": (0.0, 0.0), "R3": (0.0, 0.0)}]
+    mdf = cnapy.thermodynamics.thermodynamic_mode_ranking(
+        cobrak_model, cache.reaction_map, reac_id, cnapy.thermodynamics.strain_design_restrictions(designs, reac_id),
+        "highs", processes=1)
+    assert numpy.allclose(mdf[:2], optmdf) and numpy.isnan(mdf[2])
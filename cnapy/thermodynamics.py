@@ -0,0 +1,538 @@
+"""Preparation of COBRA-k models for the thermodynamic analyses of CNApy models"""
+
+import hashlib
+import multiprocessing
+import queue
+import sys
+from enum import Enum
+from math import log
+from typing import Dict, List, Tuple
+
+import numpy
+import scipy.sparse
+import cobra
+from cobra.util import ProcessPool
+from pyomo.environ import Objective, TerminationCondition, maximize, minimize, value
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
+from cobrak.constants import ALL_OK_KEY, BIG_M, DF_VAR_PREFIX, LNCONC_VAR_PREFIX, MDF_VAR_ID, QUASI_INF, Z_VAR_PREFIX
+from cobrak.dataclasses import ExtraLinearConstraint, Model, Solver
+from cobrak.lps import get_lp_from_cobrak_model, perform_lp_optimization, perform_lp_thermodynamic_bottleneck_analysis
+from cobrak.pyomo_functionality import get_solver
+from cobrak.io import load_annotated_cobrapy_model_as_cobrak_model
+from cobrak.cobrapy_model_functionality import get_fullsplit_cobra_model
+
+FWD_SUFFIX = "_FWDCNAPY"
+REV_SUFFIX = "_REVCNAPY"
+# the thermodynamic parameters are patched into the cached COBRA-k model instead of rebuilding it
+THERMODYNAMIC_REACTION_ANNOTATIONS = ("dG0", "dG0_uncertainty", "cobrak_dG0", "cobrak_dG0_uncertainty")
+CONCENTRATION_ANNOTATIONS = ("Cmin", "Cmax", "cobrak_Cmin", "cobrak_Cmax")
+_ORIGINAL_ID = "cnapy_original_id" # temporary annotation to trace the split reactions
+# these solvers keep the problem between the solves so that they can start from the previous solution
+PERSISTENT_SOLVERS = {"gurobi_direct": "gurobi_persistent", "cplex_direct": "cplex_persistent"}
+
+
+class ThermodynamicAnalysisTypes(Enum):
+    OPTMDFPATHWAY = 1
+    THERMODYNAMIC_FBA = 2
+    BOTTLENECK_ANALYSIS = 3
+    VARIABILITY_ANALYSIS = 4
+    MODE_RANKING = 5
+
+
+def scenario_constraints_to_cobrak(constraints: List[tuple]) -> List[ExtraLinearConstraint]:
+    """Converts the constraints of a scenario, e.g. [({'EDD': 1.0}, '>=', 1.0)], for COBRA-k."""
+    extra_linear_constraints: List[ExtraLinearConstraint] = []
+    for (stoichiometries, direction, rhs) in constraints:
+        extra_linear_constraint = ExtraLinearConstraint(stoichiometries=dict(stoichiometries))
+        if direction == ">=":
+            extra_linear_constraint.lower_value = rhs
+        elif direction == "<=":
+            extra_linear_constraint.upper_value = rhs
+        else:  # == "="
+            extra_linear_constraint.lower_value = rhs
+            extra_linear_constraint.upper_value = rhs
+        extra_linear_constraints.append(extra_linear_constraint)
+    return extra_linear_constraints
+
+
+def _annotation_value(annotation: dict, keys: Tuple[str, str]):
+    # the plain annotation takes precedence over the COBRA-k one as in get_fullsplit_cobra_model
+    for key in keys:
+        if key in annotation:
+            return float(annotation[key])
+    return None
+
+
+def _copy_annotations(source: dict, target: dict, keys: Tuple[str, ...]):
+    # the COBRA-k model keeps the other annotations as strings
+    for key in keys:
+        if key in source:
+            target[key] = str(source[key])
+        else:
+            target.pop(key, None)
+
+
+class CobrakModelCache:
+    """
+    Keeps the full-split COBRA-k model of the last thermodynamic analysis. It is rebuilt only when
+    the structure of the model, the bounds from the scenario, the scenario constraints or annotations
+    other than the ΔG'° values and concentration ranges change; otherwise only the ΔG'° values and
+    concentration ranges are updated in the cached model. The minimal MDF is a parameter of the
+    analyses themselves and therefore does not affect the prepared model.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.cobrak_model: Model = None
+        # COBRA-k reaction ID -> (CNApy reaction ID, direction)
+        self.reaction_map: Dict[str, Tuple[str, float]] = {}
+
+    def clear(self):
+        self.key = None
+        self.cobrak_model = None
+        self.reaction_map = {}
+
+    @staticmethod
+    def structure_key(model: cobra.Model, extra_linear_constraints: List[ExtraLinearConstraint]) -> str:
+        md5 = hashlib.md5()
+        for r in model.reactions:
+            md5.update(repr((r.id, r.lower_bound, r.upper_bound, r.gene_reaction_rule,
+                             sorted((m.id, c) for m, c in r.metabolites.items()),
+                             sorted((k, str(v)) for k, v in r.annotation.items()
+                                    if k not in THERMODYNAMIC_REACTION_ANNOTATIONS))).encode())
+        for m in model.metabolites:
+            md5.update(repr((m.id, sorted((k, str(v)) for k, v in m.annotation.items()
+                                          if k not in CONCENTRATION_ANNOTATIONS))).encode())
+        md5.update(repr([(c.stoichiometries, c.lower_value, c.upper_value)
+                         for c in extra_linear_constraints]).encode())
+        return md5.hexdigest()
+
+    def get(self, model: cobra.Model, extra_linear_constraints: List[ExtraLinearConstraint],
+            default_min_conc: float, default_max_conc: float) -> Model:
+        """
+        Returns the COBRA-k model for the model into which the scenario has already been loaded.
+        The returned model must not be modified and is changed by the next call, hence a computation
+        that runs in the background needs a copy of it.
+        """
+        key = CobrakModelCache.structure_key(model, extra_linear_constraints)
+        if key != self.key:
+            self.cobrak_model = None # in case the conversion fails
+            self.key = None
+            # decoupled copy so that no COBRA-k annotation spills into the original model
+            model = cobra.io.from_json(cobra.io.to_json(model))
+            for r in model.reactions:
+                r.annotation[_ORIGINAL_ID] = r.id
+            self.cobrak_model = load_annotated_cobrapy_model_as_cobrak_model(
+                get_fullsplit_cobra_model(
+                    model,
+                    fwd_suffix=FWD_SUFFIX,
+                    rev_suffix=REV_SUFFIX,
+                    add_cobrak_sbml_annotation=True,
+                    cobrak_default_min_conc=default_min_conc,
+                    cobrak_default_max_conc=default_max_conc,
+                    cobrak_extra_linear_constraints=extra_linear_constraints,
+                    cobrak_kinetic_ignored_metabolites=[],
+                    cobrak_no_extra_versions=True,
+                    reac_lb_ub_cap=1_000.0,
+                )
+            )
+            self.reaction_map = {}
+            for reac_id, reaction in self.cobrak_model.reactions.items():
+                original_id = reaction.annotation.pop(_ORIGINAL_ID)
+                reversed_direction = reac_id.endswith(REV_SUFFIX) and model.reactions.get_by_id(original_id).lower_bound < 0
+                self.reaction_map[reac_id] = (original_id, -1.0 if reversed_direction else 1.0)
+            self.key = key
+        else:
+            self.update_parameters(model, default_min_conc, default_max_conc)
+        return self.cobrak_model
+
+    def update_parameters(self, model: cobra.Model, default_min_conc: float, default_max_conc: float):
+        """Sets the ΔG'° values and concentration ranges from the model into the cached COBRA-k model."""
+        for reac_id, (original_id, direction) in self.reaction_map.items():
+            annotation = model.reactions.get_by_id(original_id).annotation
+            reaction = self.cobrak_model.reactions[reac_id]
+            dG0 = _annotation_value(annotation, ("dG0", "cobrak_dG0"))
+            reaction.dG0 = None if dG0 is None else direction*dG0
+            uncertainty = _annotation_value(annotation, ("dG0_uncertainty", "cobrak_dG0_uncertainty"))
+            reaction.dG0_uncertainty = None if uncertainty is None else abs(uncertainty)
+            _copy_annotations(annotation, reaction.annotation, ("dG0", "dG0_uncertainty"))
+        for met_id, metabolite in self.cobrak_model.metabolites.items():
+            annotation = model.metabolites.get_by_id(met_id).annotation
+            min_conc = _annotation_value(annotation, ("Cmin", "cobrak_Cmin"))
+            max_conc = _annotation_value(annotation, ("Cmax", "cobrak_Cmax"))
+            metabolite.log_min_conc = log(default_min_conc if min_conc is None else min_conc)
+            metabolite.log_max_conc = log(default_max_conc if max_conc is None else max_conc)
+            _copy_annotations(annotation, metabolite.annotation, ("Cmin", "Cmax"))
+
+
+def thermodynamic_analysis(cobrak_model: Model, analysis_type: ThermodynamicAnalysisTypes, min_mdf: float,
+                           solver_name: str, objective: Dict[str, float] = None, direction: int = +1) -> Dict[str, float]:
+    """
+    Performs OptMDFpathway, thermodynamic FBA with the objective or the bottleneck analysis and
+    returns the COBRA-k solution.
+    """
+    if analysis_type == ThermodynamicAnalysisTypes.BOTTLENECK_ANALYSIS:
+        _, solution = perform_lp_thermodynamic_bottleneck_analysis(
+            cobrak_model=cobrak_model,
+            with_enzyme_constraints=False,
+            min_mdf=min_mdf,
+            solver=Solver(name=solver_name),
+            verbose=True,
+        )
+        solution[ALL_OK_KEY] = len(solution) > 0
+        return solution
+    if analysis_type == ThermodynamicAnalysisTypes.OPTMDFPATHWAY:
+        objective = {MDF_VAR_ID: 1}
+        direction = +1
+    return perform_lp_optimization(
+        cobrak_model=cobrak_model,
+        objective_target=objective,
+        objective_sense=direction,
+        with_enzyme_constraints=False,
+        with_thermodynamic_constraints=True,
+        with_loop_constraints=False,
+        min_mdf=min_mdf,
+        solver=Solver(name=solver_name),
+        verbose=True,
+    )
+
+
+class _QueueWriter:
+    # passes the output of the worker process to the queue
+    def __init__(self, output_queue):
+        self.output_queue = output_queue
+
+    def write(self, text: str):
+        if len(text) > 0:
+            self.output_queue.put(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _init_worker(output_queue):
+    sys.stdout = _QueueWriter(output_queue)
+    sys.stderr = sys.stdout
+
+
+def _collect_output(output_queue) -> str:
+    text = []
+    while True:
+        try:
+            text.append(output_queue.get_nowait())
+        except queue.Empty:
+            return "".join(text)
+
+
+def thermodynamic_analysis_in_worker(cobrak_model: Model, analysis_type: ThermodynamicAnalysisTypes, min_mdf: float,
+                                     solver_name: str, objective: Dict[str, float] = None, direction: int = +1,
+                                     print_func=print, abort_callback=None) -> Dict[str, float]:
+    """
+    Runs thermodynamic_analysis in a separate process so that it can be aborted at any time; the
+    output of the solver is passed in chunks to print_func while the computation is running.
+    Returns None if the computation was aborted.
+    """
+    with multiprocessing.Manager() as manager:
+        output_queue = manager.Queue() # a managed queue can also be passed to the worker on Windows
+        with ProcessPool(1, initializer=_init_worker, initargs=(output_queue,)) as pool:
+            result = pool.apply_async(thermodynamic_analysis,
+                                      (cobrak_model, analysis_type, min_mdf, solver_name, objective, direction))
+            while True:
+                try:
+                    solution = result.get(timeout=0.5)
+                    break
+                except multiprocessing.TimeoutError:
+                    output = _collect_output(output_queue)
+                    if len(output) > 0:
+                        print_func(output.rstrip("\n"))
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+        output = _collect_output(output_queue)
+        if len(output) > 0:
+            print_func(output.rstrip("\n"))
+    return solution
+
+
+def _init_lp_worker(cobrak_model: Model, min_mdf: float, solver_name: str):
+    global _lp
+    global _solver
+
+    _lp = get_lp_from_cobrak_model(cobrak_model, with_enzyme_constraints=False, with_thermodynamic_constraints=True,
+                                   with_loop_constraints=False, min_mdf=min_mdf)
+    _lp.cnapy_objective = Objective(expr=0.0, sense=minimize)
+    _solver = get_solver(Solver(name=PERSISTENT_SOLVERS.get(solver_name, solver_name)))
+    if isinstance(_solver, PersistentSolver):
+        _solver.set_instance(_lp)
+
+
+def _optimize(var, sense: int) -> float:
+    # minimizes (sense -1) or maximizes (sense +1) var with the LP of the worker, NaN if not solved
+    _lp.cnapy_objective.set_value(var)
+    _lp.cnapy_objective.sense = maximize if sense > 0 else minimize
+    if isinstance(_solver, PersistentSolver):
+        _solver.set_objective(_lp.cnapy_objective)
+        solution = _solver.solve(tee=False, load_solutions=False)
+        if solution.solver.termination_condition == TerminationCondition.optimal:
+            _solver.load_vars()
+    else:
+        solution = _solver.solve(_lp, tee=False, load_solutions=False)
+        if solution.solver.termination_condition == TerminationCondition.optimal:
+            _lp.solutions.load_from(solution)
+    if solution.solver.termination_condition == TerminationCondition.optimal:
+        return value(var)
+    return numpy.nan
+
+
+def _variability_step(targets: List[Tuple[str, int]]) -> List[Tuple[str, int, float]]:
+    """
+    Minimizes (sense -1) or maximizes (sense +1) the variables in targets with the thermodynamic LP
+    of the worker; only the objective changes between the solves. An extreme value is taken without
+    solving when the variable is already at its bound in the previous solution.
+    Returns the extreme values, NaN where the problem could not be solved.
+    """
+    result = []
+    for var_name, sense in targets:
+        var = getattr(_lp, var_name)
+        bound = var.ub if sense > 0 else var.lb
+        if bound is not None and var.value is not None and abs(var.value - bound) <= 1e-9:
+            result.append((var_name, sense, bound))
+        else:
+            result.append((var_name, sense, _optimize(var, sense)))
+    return result
+
+
+def variability_targets(cobrak_model: Model, reaction_map: Dict[str, Tuple[str, float]]) -> Dict[str, str]:
+    """
+    The variables of the thermodynamic LP for the logarithmic concentrations of the metabolites and
+    the driving forces of the reactions in forward direction together with their CNApy IDs.
+    """
+    thermodynamic_reactions = [r for r in cobrak_model.reactions.values() if r.dG0 is not None]
+    variables = {LNCONC_VAR_PREFIX+met_id: met_id for met_id in cobrak_model.metabolites
+                 if any(met_id in r.stoichiometries for r in thermodynamic_reactions)}
+    variables.update({DF_VAR_PREFIX+reac_id: original_id for reac_id, (original_id, direction) in reaction_map.items()
+                      if direction > 0 and cobrak_model.reactions[reac_id].dG0 is not None})
+    return variables
+
+
+def thermodynamic_variability_analysis(cobrak_model: Model, reaction_map: Dict[str, Tuple[str, float]], min_mdf: float,
+                                       solver_name: str, processes: int = None, print_func=print,
+                                       progress_callback=None, abort_callback=None) \
+                                       -> Tuple[Dict[str, Tuple[float, float]], Dict[str, Tuple[float, float]]]:
+    """
+    Determines the ranges of the driving forces [kJ/mol] of the reactions with a ΔG'° and of the
+    concentrations [M] of the metabolites that take part in them when the MDF of the active reactions
+    is at least min_mdf. reaction_map maps the reactions of the COBRA-k model to the reactions of the
+    CNApy model and their direction (see CobrakModelCache); the driving forces refer to the direction
+    of the CNApy reactions. The minimizations and maximizations are distributed over worker processes
+    which each set up the LP once. progress_callback is called with the number of solved targets.
+    Returns the driving force and concentration ranges or None if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    variables = variability_targets(cobrak_model, reaction_map)
+    targets = [(var_name, sense) for var_name in variables for sense in (-1, +1)]
+    if len(targets) == 0:
+        return {}, {}
+    extremes = {}
+    def collect(step_result):
+        for var_name, sense, extreme in step_result:
+            extremes[(var_name, sense)] = extreme
+        if progress_callback is not None:
+            progress_callback(len(extremes))
+
+    processes = max(1, min(processes, len(targets)))
+    # neighbouring targets share the worker so that the bounds of one are often attained by the other
+    steps = [list(chunk) for chunk in numpy.array_split(numpy.array(targets, dtype=object), min(4*processes, len(targets)))]
+    if processes > 1:
+        with ProcessPool(processes, initializer=_init_lp_worker,
+                         initargs=(cobrak_model, min_mdf, solver_name)) as pool:
+            results = pool.imap_unordered(_variability_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+                except StopIteration:
+                    break
+    else:
+        _init_lp_worker(cobrak_model, min_mdf, solver_name)
+        for step in steps:
+            if abort_callback is not None and abort_callback():
+                return None
+            collect(_variability_step(step))
+
+    df_ranges = {}
+    conc_ranges = {}
+    for var_name, element_id in variables.items():
+        if var_name.startswith(DF_VAR_PREFIX):
+            df_ranges[element_id] = (extremes[(var_name, -1)], extremes[(var_name, +1)])
+        else:
+            conc_ranges[element_id] = (numpy.exp(extremes[(var_name, -1)]), numpy.exp(extremes[(var_name, +1)]))
+    num_failed = sum(numpy.isnan(extreme) for extreme in extremes.values())
+    print_func("Thermodynamic variability analysis of "+str(len(df_ranges))+" driving forces and "+str(len(conc_ranges))
+               +" concentrations"+(", "+str(num_failed)+" optimizations failed" if num_failed > 0 else ""))
+    return df_ranges, conc_ranges
+
+
+def flux_vector_restrictions(flux_vectors) -> List[tuple]:
+    """
+    The restrictions of the thermodynamic LP for flux vectors such as EFMs (see thermodynamic_mode_ranking):
+    all reactions outside the support are switched off and those in it are active in their direction.
+    """
+    restrictions = []
+    for block in flux_vectors.row_blocks():
+        if scipy.sparse.issparse(block):
+            block = block.toarray()
+        for row in numpy.asarray(block):
+            idx = numpy.nonzero(row)[0]
+            support = row[idx]
+            restrictions.append((True, idx, numpy.where(support < 0, -numpy.inf, 0.0),
+                                 numpy.where(support > 0, numpy.inf, 0.0), numpy.ones(len(idx), dtype=bool)))
+    return restrictions
+
+
+def strain_design_restrictions(designs: List[Dict[str, Tuple[float, float]]], reac_id: List[str]) -> List[tuple]:
+    """
+    The restrictions of the thermodynamic LP for strain designs given as the reaction bounds of their
+    interventions (see thermodynamic_mode_ranking); reactions that are not knocked in (NaN bounds) are switched off.
+    """
+    reac_index = {r: i for i, r in enumerate(reac_id)}
+    restrictions = []
+    for design in designs:
+        interventions = [(reac_index[r], bounds) for r, bounds in design.items() if r in reac_index]
+        idx = numpy.array([i for i, _ in interventions], dtype=int)
+        bounds = numpy.nan_to_num(numpy.array([b for _, b in interventions], dtype=float).reshape(-1, 2), nan=0.0)
+        restrictions.append((False, idx, bounds[:, 0], bounds[:, 1], numpy.zeros(len(idx), dtype=bool)))
+    return restrictions
+
+
+class _ModeLP:
+    """
+    Sets the bounds of the flux variables of the thermodynamic LP of the worker for one mode after
+    another; only the bounds that differ from those of the previous mode are changed.
+    """
+
+    def __init__(self, reaction_map: Dict[str, Tuple[str, float]], reac_id: List[str]):
+        reac_index = {r: i for i, r in enumerate(reac_id)}
+        self.num_reac = len(reac_id) # reactions that are not in reac_id get this index
+        self.flux_vars = [getattr(_lp, cobrak_id) for cobrak_id in reaction_map]
+        self.z_vars = [getattr(_lp, Z_VAR_PREFIX+cobrak_id, None) for cobrak_id in reaction_map]
+        self.var_reac = numpy.array([reac_index.get(original_id, self.num_reac) for original_id, _ in reaction_map.values()],
+                                    dtype=int)
+        self.forward = numpy.array([direction > 0 for _, direction in reaction_map.values()], dtype=bool)
+        self.base_bounds = numpy.array([(v.lb, numpy.inf if v.ub is None else v.ub) for v in self.flux_vars], dtype=float)
+        self.bounds = self.base_bounds.copy()
+        self.active = numpy.zeros(len(self.flux_vars), dtype=bool)
+
+    def set_mode(self, restriction: tuple):
+        others_off, idx, mode_lb, mode_ub, mode_active = restriction
+        restricted = numpy.full(self.num_reac + 1, others_off)
+        lb = numpy.zeros(self.num_reac + 1)
+        ub = numpy.zeros(self.num_reac + 1)
+        active = numpy.zeros(self.num_reac + 1, dtype=bool)
+        restricted[idx] = True
+        lb[idx] = mode_lb
+        ub[idx] = mode_ub
+        active[idx] = mode_active
+        restricted = restricted[self.var_reac]
+        lb = lb[self.var_reac]
+        ub = ub[self.var_reac]
+        # the reaction bounds translated to the forward and reverse variables of the split reactions
+        # replace their bounds, only the flux capacity of the COBRA-k model is kept
+        bounds = numpy.stack((numpy.where(restricted, numpy.where(self.forward, numpy.maximum(lb, 0), numpy.maximum(-ub, 0)),
+                                          self.base_bounds[:, 0]),
+                              numpy.where(restricted, numpy.minimum(self.base_bounds[:, 1],
+                                          numpy.where(self.forward, numpy.maximum(ub, 0), numpy.maximum(-lb, 0))),
+                                          self.base_bounds[:, 1])), axis=1)
+        active = active[self.var_reac] & numpy.where(self.forward, ub > 0, lb < 0)
+        for i in numpy.where(numpy.any(bounds != self.bounds, axis=1))[0]:
+            self.flux_vars[i].setlb(bounds[i, 0])
+            self.flux_vars[i].setub(None if bounds[i, 1] == numpy.inf else bounds[i, 1])
+            if isinstance(_solver, PersistentSolver):
+                _solver.update_var(self.flux_vars[i])
+        for i in numpy.where(active != self.active)[0]:
+            if self.z_vars[i] is not None:
+                self.z_vars[i].setlb(1 if active[i] else 0)
+                if isinstance(_solver, PersistentSolver):
+                    _solver.update_var(self.z_vars[i])
+        self.bounds = bounds
+        self.active = active
+
+
+def _init_mode_worker(cobrak_model: Model, reaction_map: Dict[str, Tuple[str, float]], reac_id: List[str],
+                      solver_name: str):
+    global _mode_lp
+
+    _init_lp_worker(cobrak_model, -QUASI_INF, solver_name)
+    _mode_lp = _ModeLP(reaction_map, reac_id)
+
+
+def _mode_step(step: Tuple[int, List[tuple]]) -> Tuple[int, List[float]]:
+    start, restrictions = step
+    result = []
+    for restriction in restrictions:
+        _mode_lp.set_mode(restriction)
+        mdf = _optimize(getattr(_lp, MDF_VAR_ID), +1)
+        # without an active reaction with a ΔG'° the MDF is only limited by the big M
+        result.append(numpy.inf if mdf >= BIG_M/2 else mdf)
+    return start, result
+
+
+def thermodynamic_mode_ranking(cobrak_model: Model, reaction_map: Dict[str, Tuple[str, float]], reac_id: List[str],
+                               restrictions: List[tuple], solver_name: str, processes: int = None, print_func=print,
+                               progress_callback=None, abort_callback=None) -> numpy.ndarray:
+    """
+    Computes the OptMDF [kJ/mol] of every mode, i.e. the MDF when the reaction bounds are restricted as described
+    in restrictions. Each restriction is a tuple (others_off, idx, lb, ub, active) that replaces the bounds of the
+    reactions reac_id[idx] by lb, ub and switches all other reactions off if others_off; the reactions marked as
+    active always take part in the MDF (see flux_vector_restrictions and strain_design_restrictions).
+    The modes are distributed over worker processes which each set up the LP once and then only change
+    the bounds that differ between consecutive modes. progress_callback is called with the number of scored modes.
+    Returns the OptMDF of the modes (NaN when infeasible, inf when no reaction with a ΔG'° is active) or None
+    if the computation was aborted.
+    """
+    if processes is None:
+        processes = cobra.Configuration().processes
+    mdf = numpy.full(len(restrictions), numpy.nan)
+    if len(restrictions) == 0:
+        return mdf
+    num_scored = 0
+    def collect(step_result):
+        nonlocal num_scored
+        start, values = step_result
+        mdf[start:start+len(values)] = values
+        num_scored += len(values)
+        if progress_callback is not None:
+            progress_callback(num_scored)
+
+    processes = max(1, min(processes, len(restrictions)))
+    # consecutive modes of a step often differ in only a few reactions
+    step_size = max(1, min(100, len(restrictions) // (4*processes)))
+    steps = [(start, restrictions[start:start+step_size]) for start in range(0, len(restrictions), step_size)]
+    if processes > 1:
+        with ProcessPool(processes, initializer=_init_mode_worker,
+                         initargs=(cobrak_model, reaction_map, reac_id, solver_name)) as pool:
+            results = pool.imap_unordered(_mode_step, steps)
+            while True:
+                try:
+                    collect(results.next(timeout=1))
+                except multiprocessing.TimeoutError:
+                    if abort_callback is not None and abort_callback():
+                        pool.terminate()
+                        return None
+                except StopIteration:
+                    break
+    else:
+        _init_mode_worker(cobrak_model, reaction_map, reac_id, solver_name)
+        for step in steps:
+            if abort_callback is not None and abort_callback():
+                return None
+            collect(_mode_step(step))
+
+    print_func("OptMDF of "+str(len(mdf))+" modes: "+str(numpy.sum(mdf > 0))+" thermodynamically feasible, "
+               +str(numpy.sum(numpy.isnan(mdf)))+" infeasible")
+    return mdf